@@ -1,31 +1,149 @@
 # Webmap.py - Super safe version with debug counts
+# python Webmap.py [network] [--scalable]
+#   network     road-network access fields (Acces_net*, from network.py) instead of straight-line
+#   --scalable  for district/national extents: communities as one browser-styled GeoJSON layer per
+#               phase, clustered facilities and roads simplified per zoom band
+# python Webmap.py --server http://127.0.0.1:8765
+#   --server    nothing embedded: roads, communities and facilities are fetched per viewport from a
+#               running serve.py, which also answers nearest-facility clicks
 
-import folium
-import json
+import argparse
 import os
 
-os.chdir(r"E:\QGIS Tutorial for Beginners & Intermediates\GIS\Healthcare_Accessibility_Mampong\python_webmap")
+import folium
+import shapely
+from folium.plugins import FastMarkerCluster
+from folium.utilities import JsCode
+from jinja2 import Template
+from shapely.geometry import mapping, shape
+
+import access
+import geojson_stream
+import instrument
+import layers
+import serve
+
+parser = argparse.ArgumentParser(description='Interactive Phase 1 vs Phase 2 comparison map')
+parser.add_argument('access_mode', nargs='?', default='euclidean', choices=list(access.ACCESS_MODES),
+                    help="straight-line 'euclidean' (default) or road 'network' access")
+parser.add_argument('--scalable', action='store_true', help='compact output for large feature counts')
+parser.add_argument('--server', metavar='URL', help='fetch the layers from a running serve.py instead of embedding them')
+parser.add_argument('-o', '--output', default='Interactive_Comparison_Map.html')
+args = parser.parse_args()
+
+os.chdir(layers.PROJECT_DIR)
+instrument.start_run()  # stage timings, printed at the end (see instrument.py)
+
+color_map = {'Good Access': 'green', 'Moderate Access': 'yellow', 'Poor Access': 'red'}
+
+# --scalable: road layer per zoom band (min zoom, max zoom, simplify tolerance in degrees, 1e-5 ~ 1 m)
+ROAD_ZOOM_BANDS = [(0, 11, 2e-3), (11, 14, 5e-4), (14, 30, 5e-5)]
+COORD_DIGITS = 5  # ~1 m, enough for points on a web map
+
+# Same red plus icon as folium.Icon(color='red', icon='plus', prefix='fa'), built in the browser
+FACILITY_CALLBACK = """
+function (row) {
+    var icon = L.AwesomeMarkers.icon({icon: 'plus', prefix: 'fa', markerColor: 'red', iconColor: 'white'});
+    return L.marker(new L.LatLng(row[0], row[1]), {icon: icon}).bindPopup(row[2]);
+}
+"""
+
+# Community fill color and popup from the feature properties (one script instead of one per marker)
+COMMUNITY_ON_EACH_FEATURE = JsCode("""
+function (feature, layer) {
+    var colors = %s;
+    var level = feature.properties.level;
+    layer.setStyle({fillColor: colors[level] || 'gray'});
+    layer.bindPopup(feature.properties.name + '<br>' + level);
+}
+""" % str(color_map).replace("'", '"'))
 
-# Load files
-with open('mampong_boundary.geojson') as f:
-    boundary_geo = json.load(f)
 
-with open('communities distance phase1.geojson') as f:
-    communities1_geo = json.load(f)
+# Shows only the road layer of the current zoom band
+class ZoomBands(folium.MacroElement):
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this._parent.get_name() }};
+            function showBand() {
+                var z = map.getZoom();
+                {%- for layer, lo, hi in this.bands %}
+                if (z >= {{ lo }} && z < {{ hi }}) { map.addLayer({{ layer.get_name() }}); }
+                else { map.removeLayer({{ layer.get_name() }}); }
+                {%- endfor %}
+            }
+            map.on('zoomend', showBand);
+            showBand();
+        })();
+        {% endmacro %}
+    """)
 
-with open('health facilities Centeroids.geojson') as f:
-    facilities1_geo = json.load(f)
+    def __init__(self, bands):
+        super().__init__()
+        self._name = 'ZoomBands'
+        self.bands = bands
+
+
+# Point features of a layer, streamed one at a time with only the fields the map shows
+# (geojson_stream skips features without usable coordinates and reprojects to WGS84)
+def stream_points(name, field=None):
+    return geojson_stream.iter_features(layers.layer_path(name), ['name', field] if field else ['name'], ('Point',))
+
+
+# One folium.Marker / CircleMarker per feature (default output)
+def add_marker_layers(group, facilities, communities, field):
+    count_fac = 0
+    for feature in facilities:
+        coords = feature['geometry']['coordinates']
+        name = feature['properties'].get('name', 'Facility')
+        folium.Marker([coords[1], coords[0]], icon=folium.Icon(color='red', icon='plus', prefix='fa'), popup=name).add_to(group)
+        count_fac += 1
+
+    count_com = 0
+    for feature in communities:
+        coords = feature['geometry']['coordinates']
+        props = feature['properties']
+        level = props.get(field, 'Unknown')
+        color = color_map.get(level, 'gray')
+        name = props.get('name', 'Community')
+        folium.CircleMarker([coords[1], coords[0]], radius=7, color='black', fill_color=color, fill_opacity=0.8, popup=f"{name}<br>{level}").add_to(group)
+        count_com += 1
+    return count_fac, count_com
 
-with open('communities_distance_phase2.geojson') as f:
-    communities2_geo = json.load(f)
 
-with open('Complete_Healthcare_Facilities_Phase2.geojson') as f:
-    facilities2_geo = json.load(f)
+# Point features -> (lon, lat, name, level) rows with rounded coordinates, no other attributes
+def point_rows(features, field=None, default_name='Community'):
+    for feature in features:
+        x, y = feature['geometry']['coordinates'][:2]
+        name = feature['properties'].get('name')
+        level = feature['properties'].get(field)
+        yield (round(x, COORD_DIGITS), round(y, COORD_DIGITS),
+               name if isinstance(name, str) else default_name,
+               level if isinstance(level, str) else 'Unknown')
 
-roads_geo = None
-if os.path.exists('roads.geojson'):
-    with open('roads.geojson') as f:
-        roads_geo = json.load(f)
+
+# Clustered facilities + one browser-styled GeoJSON layer of communities
+def add_scalable_layers(group, facilities, communities, field):
+    fac_rows = [[y, x, name] for x, y, name, _ in point_rows(facilities, default_name='Facility')]
+    FastMarkerCluster(fac_rows, callback=FACILITY_CALLBACK).add_to(group)
+
+    com_geo = {'type': 'FeatureCollection', 'features': [
+        {'type': 'Feature', 'properties': {'name': name, 'level': level},
+         'geometry': {'type': 'Point', 'coordinates': [x, y]}}
+        for x, y, name, level in point_rows(communities, field)]}
+    folium.GeoJson(
+        com_geo,
+        marker=folium.CircleMarker(radius=7, color='black', weight=1, fill=True, fill_opacity=0.8),
+        on_each_feature=COMMUNITY_ON_EACH_FEATURE,
+    ).add_to(group)
+    return len(fac_rows), len(com_geo['features'])
+
+
+# Layers are streamed feature by feature (WGS84 for Leaflet) rather than loaded whole,
+# so memory follows what is embedded in the map, not the size of the input files
+with instrument.stage('boundary'):
+    boundary_geo = {'type': 'FeatureCollection',
+                    'features': list(geojson_stream.iter_features(layers.layer_path('boundary')))}
 
 # Center
 exterior_coords = boundary_geo['features'][0]['geometry']['coordinates'][0]
@@ -34,71 +152,85 @@ center_lat = sum(point[1] for point in exterior_coords) / len(exterior_coords)
 
 m = folium.Map(location=[center_lat, center_lon], zoom_start=11, tiles="OpenStreetMap")
 
-color_map = {'Good Access': 'green', 'Moderate Access': 'yellow', 'Poor Access': 'red'}
+access_field1 = access.access_field(1, args.access_mode)
+access_field2 = access.access_field(2, args.access_mode)
 
-# Phase 1
-phase1 = folium.FeatureGroup(name="Phase 1: Health Facilities Only (4 Captured)", show=True)
-folium.GeoJson(boundary_geo, style_function=lambda x: {'fillOpacity': 0, 'color': 'black', 'weight': 2}).add_to(phase1)
-if roads_geo:
-    folium.GeoJson(roads_geo, style_function=lambda x: {'color': 'gray', 'weight': 1}).add_to(phase1)
-
-count_fac1 = 0
-for feature in facilities1_geo['features']:
-    geom = feature['geometry']
-    if geom and geom['coordinates'] and len(geom['coordinates']) >= 2:
-        coords = geom['coordinates']
-        name = feature['properties'].get('name', 'Facility')
-        folium.Marker([coords[1], coords[0]], icon=folium.Icon(color='red', icon='plus', prefix='fa'), popup=name).add_to(phase1)
-        count_fac1 += 1
-
-count_com1 = 0
-for feature in communities1_geo['features']:
-    geom = feature['geometry']
-    if geom and geom['coordinates'] and len(geom['coordinates']) >= 2:
-        coords = geom['coordinates']
-        props = feature['properties']
-        level = props.get('Acces_lvl1', 'Unknown')
-        color = color_map.get(level, 'gray')
-        name = props.get('name', 'Community')
-        folium.CircleMarker([coords[1], coords[0]], radius=7, color='black', fill_color=color, fill_opacity=0.8, popup=f"{name}<br>{level}").add_to(phase1)
-        count_com1 += 1
+if args.server:
+    # Layers fetched per viewport from a running serve.py (with its basemap when offline) instead of embedded;
+    # the boundary read above only centres the map
+    serve.use_local_assets(m, args.server)
+    m.add_child(serve.OfflineBasemap(args.server))
+    m.add_child(serve.LiveLayers(args.server, [1, 2], args.access_mode, modes=serve.phase_modes([1, 2])))
+else:
+    # Boundary and roads are the same in both phases: embedded once, always shown
+    base = folium.FeatureGroup(name="Boundary & Roads", control=False)
+    folium.GeoJson(boundary_geo, style_function=lambda x: {'fillOpacity': 0, 'color': 'black', 'weight': 2}).add_to(base)
+    base.add_to(m)
 
-print(f"Phase 1 added: {count_fac1} facilities, {count_com1} communities")
+    # Roads: geometry only (no attributes are shown); with --scalable one simplified copy per zoom band
+    with instrument.stage('roads'):
+        road_features = [[] for _ in ROAD_ZOOM_BANDS] if args.scalable else [[]]
+        road_count = 0
+        road_vertices = 0
+        for feature in geojson_stream.iter_layer(layers.layer_path('roads'), properties=[]):
+            road_count += 1
+            if not args.scalable:
+                road_features[0].append(feature)
+                road_vertices += int(shapely.get_num_coordinates(shape(feature['geometry'])))
+                continue
+            geom = shape(feature['geometry'])
+            for band, (lo, hi, tolerance) in zip(road_features, ROAD_ZOOM_BANDS):
+                simplified = shapely.simplify(geom, tolerance)
+                if not simplified.is_empty:
+                    band.append({'type': 'Feature', 'properties': {}, 'geometry': mapping(simplified)})
+                    road_vertices += int(shapely.get_num_coordinates(simplified))
 
-phase1.add_to(m)
+        road_bands = []
+        if road_count and args.scalable:
+            for features, (lo, hi, tolerance) in zip(road_features, ROAD_ZOOM_BANDS):
+                layer = folium.GeoJson({'type': 'FeatureCollection', 'features': features}, control=False,
+                                       style_function=lambda x: {'color': 'gray', 'weight': 1})
+                layer.add_to(m)
+                road_bands.append((layer, lo, hi))
+        elif road_count:
+            folium.GeoJson({'type': 'FeatureCollection', 'features': road_features[0]},
+                           style_function=lambda x: {'color': 'gray', 'weight': 1}).add_to(base)
 
-# Phase 2 (same safe logic)
-phase2 = folium.FeatureGroup(name="Phase 2: With Private & CHPS Facilities", show=False)
-folium.GeoJson(boundary_geo, style_function=lambda x: {'fillOpacity': 0, 'color': 'black', 'weight': 2}).add_to(phase2)
-if roads_geo:
-    folium.GeoJson(roads_geo, style_function=lambda x: {'color': 'gray', 'weight': 1}).add_to(phase2)
+    # A phase whose communities lack the mode's field (e.g. Acces_fca1 before fca.py has run on
+    # Phase 1) is left out and reported instead of drawn with every community gray
+    add_layers = add_scalable_layers if args.scalable else add_marker_layers
+    available = {p: access.has_access_field(f'communities{p}', p, args.access_mode) for p in (1, 2)}
+    for p, field in ((1, access_field1), (2, access_field2)):
+        if not available[p]:
+            print(f"Phase {p} skipped: communities{p} has no {field} (run "
+                  f"{'network.py' if args.access_mode == 'network' else 'fca.py'} on it)")
 
-count_fac2 = 0
-for feature in facilities2_geo['features']:
-    geom = feature['geometry']
-    if geom and geom['coordinates'] and len(geom['coordinates']) >= 2:
-        coords = geom['coordinates']
-        name = feature['properties'].get('name', 'Facility')
-        folium.Marker([coords[1], coords[0]], icon=folium.Icon(color='red', icon='plus', prefix='fa'), popup=name).add_to(phase2)
-        count_fac2 += 1
-
-count_com2 = 0
-for feature in communities2_geo['features']:
-    geom = feature['geometry']
-    if geom and geom['coordinates'] and len(geom['coordinates']) >= 2:
-        coords = geom['coordinates']
-        props = feature['properties']
-        level = props.get('Acces_lvl2', 'Unknown')
-        color = color_map.get(level, 'gray')
-        name = props.get('name', 'Community')
-        folium.CircleMarker([coords[1], coords[0]], radius=7, color='black', fill_color=color, fill_opacity=0.8, popup=f"{name}<br>{level}").add_to(phase2)
-        count_com2 += 1
+    # Phase 1
+    if available[1]:
+        with instrument.stage('phase 1 layers'):
+            phase1 = folium.FeatureGroup(name="Phase 1: Health Facilities Only (4 Captured)", show=True)
+            count_fac1, count_com1 = add_layers(phase1, stream_points('facilities1'),
+                                                stream_points('communities1', access_field1), access_field1)
+
+            print(f"Phase 1 added: {count_fac1} facilities, {count_com1} communities")
 
-print(f"Phase 2 added: {count_fac2} facilities, {count_com2} communities")
+            phase1.add_to(m)
 
-phase2.add_to(m)
+    # Phase 2 (same safe logic)
+    if available[2]:
+        with instrument.stage('phase 2 layers'):
+            phase2 = folium.FeatureGroup(name="Phase 2: With Private & CHPS Facilities", show=not available[1])
+            count_fac2, count_com2 = add_layers(phase2, stream_points('facilities2'),
+                                                stream_points('communities2', access_field2), access_field2)
 
-folium.LayerControl().add_to(m)
+            print(f"Phase 2 added: {count_fac2} facilities, {count_com2} communities")
+
+            phase2.add_to(m)
+
+    if road_bands:
+        m.add_child(ZoomBands(road_bands))
+
+    folium.LayerControl().add_to(m)
 
 # Title and author (same as before)
 title_html = '''
@@ -117,6 +249,14 @@ author_html = '''
 '''
 m.get_root().html.add_child(folium.Element(author_html))
 
-m.save('Interactive_Comparison_Map.html')
+with instrument.stage('save html'):
+    m.save(args.output)
+
+if not args.server:
+    print(f"Roads: {road_count} features, {road_vertices} vertices embedded"
+          + (f" over {len(road_bands)} zoom bands" if road_bands else ""))
+print(f"Output size: {os.path.getsize(args.output) / 1e6:.2f} MB "
+      f"({'live' if args.server else 'scalable' if args.scalable else 'marker'} mode)")
+print(f"Interactive map saved! Open {args.output}")
 
-print("Interactive map saved! Open Interactive_Comparison_Map.html")
\ No newline at end of file
+instrument.finish_run()
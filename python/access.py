@@ -0,0 +1,150 @@
+# access.py - Nearest-facility distance and access class for every community
+# Replaces the manual QGIS "Distance to nearest hub" step: writes HubName, HubDist (metres)
+# and the Acces_lvl* field that the map scripts read.
+#
+# Example (Phase 2, national HOTOSM facilities):
+#   python access.py "communities_distance_phase2.geojson" ^
+#       ..\data_raw\hotosm_gha_health_facilities_points_shp\hotosm_gha_health_facilities_points_shp.shp ^
+#       --phase 2 -o communities_distance_phase2.geojson
+
+import argparse
+import os
+import time
+
+import numpy as np
+import shapely
+from scipy.sparse import coo_matrix
+from scipy.spatial import cKDTree
+
+import layers
+
+METRIC_CRS = 'EPSG:32630'  # WGS 84 / UTM zone 30N, same CRS as the output/ buffers
+
+# Upper distance (metres) of each class, same thresholds as the 1 km / 3 km buffers
+ACCESS_CLASSES = [(1000, 'Good Access'), (3000, 'Moderate Access')]
+POOR_ACCESS = 'Poor Access'
+
+
+# Access field prefix per mode: straight-line distance (this module), road network (network.py)
+# or supply-demand score class (fca.py)
+ACCESS_MODES = {'euclidean': 'Acces_lvl', 'network': 'Acces_net', 'fca': 'Acces_fca'}
+
+# Distance (metres) behind each mode's class: HubDist from this module, Net_dist from network.py
+DISTANCE_FIELDS = {'euclidean': 'HubDist', 'network': 'Net_dist'}
+
+
+def access_field(phase, mode='euclidean'):
+    return f'{ACCESS_MODES[mode]}{phase}'
+
+
+# Whether project layer `name` (communities<phase>) exists in `folder` and has the phase's access
+# field for `mode`; e.g. the Phase 3 layers from siting.py only carry Acces_lvl3 until network.py /
+# fca.py is run on them. Only the schema (or first feature) is read.
+def has_access_field(name, phase, mode='euclidean', folder=''):
+    path = layers.layer_path(name, folder)
+    return os.path.exists(path) and access_field(phase, mode) in layers.layer_columns(path)
+
+
+# x/y arrays in the metric CRS (centroids for polygons, NaN for missing geometry)
+def metric_xy(gdf, crs=METRIC_CRS):
+    geoms = gdf.geometry
+    if gdf.crs is not None:
+        geoms = geoms.to_crs(crs)
+    centroids = shapely.centroid(np.asarray(geoms.values))
+    return shapely.get_x(centroids), shapely.get_y(centroids)
+
+
+def classify_distance(dist, classes=ACCESS_CLASSES):
+    limits = np.array([limit for limit, _ in classes], dtype=float)
+    labels = np.array([label for _, label in classes] + [POOR_ACCESS], dtype=object)
+    dist = np.asarray(dist, dtype=float)
+    # NaN (no facility / no geometry) sorts past every limit and lands in Poor Access
+    return labels[np.searchsorted(limits, dist, side='left')]
+
+
+# Nearest facility for every community in one batched KD-tree query.
+# Returns (facility positions, distances in metres); -1 / NaN where nothing could be matched.
+def nearest_facility(communities, facilities, crs=METRIC_CRS):
+    cx, cy = metric_xy(communities, crs)
+    fx, fy = metric_xy(facilities, crs)
+
+    fac_ok = ~(np.isnan(fx) | np.isnan(fy))
+    com_ok = ~(np.isnan(cx) | np.isnan(cy))
+    nearest = np.full(len(cx), -1, dtype=np.int64)
+    dist = np.full(len(cx), np.nan)
+    if not fac_ok.any() or not com_ok.any():
+        return nearest, dist
+
+    fac_index = np.flatnonzero(fac_ok)
+    tree = cKDTree(np.column_stack([fx[fac_ok], fy[fac_ok]]))
+    d, i = tree.query(np.column_stack([cx[com_ok], cy[com_ok]]), k=1, workers=-1)
+    nearest[com_ok] = fac_index[i]
+    dist[com_ok] = d
+    return nearest, dist
+
+
+# Sparse matrix (CSR, rows x cols) of straight-line distances between the points of two layers,
+# pairs further than `radius` metres left out (a zero distance is kept as an explicit entry)
+def distance_matrix(rows, cols, radius, crs=METRIC_CRS):
+    rx, ry = metric_xy(rows, crs)
+    cx, cy = metric_xy(cols, crs)
+    rok, cok = ~np.isnan(rx), ~np.isnan(cx)
+    rtree = cKDTree(np.column_stack([rx[rok], ry[rok]]))
+    ctree = cKDTree(np.column_stack([cx[cok], cy[cok]]))
+    pairs = rtree.sparse_distance_matrix(ctree, radius, output_type='coo_matrix')
+    r, c = np.flatnonzero(rok)[pairs.row], np.flatnonzero(cok)[pairs.col]
+    return coo_matrix((pairs.data, (r, c)), shape=(len(rx), len(cx))).tocsr()
+
+
+# Facility name for each nearest-facility position (None where nothing was matched)
+def hub_names(facilities, nearest, name_field='name'):
+    if name_field in facilities.columns:
+        names = facilities[name_field].to_numpy(dtype=object)
+    else:
+        names = facilities.index.to_numpy(dtype=object)
+    result = np.full(len(nearest), None, dtype=object)
+    matched = nearest >= 0
+    result[matched] = names[nearest[matched]]
+    return result
+
+
+# Add HubName, HubDist and Acces_lvl<phase> to a copy of `communities`
+def compute_access(communities, facilities, phase, name_field='name', crs=METRIC_CRS):
+    nearest, dist = nearest_facility(communities, facilities, crs)
+
+    result = communities.copy()
+    result['HubName'] = hub_names(facilities, nearest, name_field)
+    result['HubDist'] = np.round(dist, 1)
+    result[access_field(phase)] = classify_distance(dist)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Nearest-facility distance and access class per community')
+    parser.add_argument('communities', help='communities layer (points or polygons)')
+    parser.add_argument('facilities', help='facilities layer, e.g. the HOTOSM Ghana shapefile')
+    parser.add_argument('--phase', default='2', help='phase number used in the Acces_lvl field name')
+    parser.add_argument('--name-field', default='name', help='facility field copied into HubName')
+    parser.add_argument('-o', '--output', required=True, help='output layer (.parquet, .fgb, .geojson, .gpkg, .shp...)')
+    parser.add_argument('--compat', nargs='+', choices=layers.COMPAT_FORMATS, default=[],
+                        help='also write these formats under the output name, e.g. geojson shp')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    communities = layers.read_layer(args.communities, cache=False)
+    facilities = layers.read_layer(args.facilities, cache=False)
+    loaded = time.perf_counter()
+
+    result = compute_access(communities, facilities, args.phase, name_field=args.name_field)
+    computed = time.perf_counter()
+
+    layers.write_layer(result, args.output, args.compat)
+    field = access_field(args.phase)
+    print(f"{len(result)} communities vs {len(facilities)} facilities: "
+          f"load {loaded - start:.2f}s, nearest + classify {computed - loaded:.2f}s")
+    print(f"{field} counts:", result[field].value_counts().to_dict())
+    print(f"Saved {args.output}")
+
+
+if __name__ == '__main__':
+    main()
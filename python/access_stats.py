@@ -0,0 +1,144 @@
+# access_stats.py - Population-weighted access statistics per GADM unit and phase
+# Communities are assigned to units with one spatial join, then every statistic is a groupby:
+# share of population with Good / Moderate / Poor access, population-weighted mean, median and
+# 90th percentile distance, plus the change from the previous phase. Writes a tidy table
+# (one row per unit and phase) as CSV and, with the unit outlines, as GeoParquet.
+#
+# Examples:
+#   python access_stats.py                                   (project Phase 1 / Phase 2 layers, districts)
+#   python access_stats.py settlements_p1.geojson settlements_p2.geojson --level 1 -o ..\output\region_access
+#   python access_stats.py --mode network
+
+import argparse
+import time
+
+import geopandas as gpd
+import pandas as pd
+
+import access
+import layers
+
+PERCENTILES = [0.5, 0.9]
+CLASS_COLUMNS = {'Good Access': 'pop_good_pct', 'Moderate Access': 'pop_moderate_pct',
+                 access.POOR_ACCESS: 'pop_poor_pct'}
+
+
+# Population-weighted q-quantile of `dist` per `unit` (sort once, cumulative weight per group)
+def weighted_quantiles(unit, dist, weight, quantiles=PERCENTILES):
+    df = pd.DataFrame({'unit': unit, 'dist': dist, 'weight': weight}).dropna(subset=['dist'])
+    df = df.sort_values(['unit', 'dist'], kind='mergesort')
+    grouped = df.groupby('unit', sort=False)['weight']
+    fraction = grouped.cumsum() / grouped.transform('sum')
+    result = {}
+    for q in quantiles:
+        reached = (fraction >= q).to_numpy()
+        result[q] = df['dist'][reached].groupby(df['unit'][reached]).first()
+    return pd.DataFrame(result)
+
+
+# One row per unit for one phase
+def unit_stats(communities, units, id_field, phase, mode='euclidean', population_field='population'):
+    class_field = access.access_field(phase, mode)
+    dist_field = access.DISTANCE_FIELDS[mode]
+    missing = [f for f in (class_field, dist_field) if f not in communities.columns]
+    if missing:
+        raise ValueError(f"Phase {phase} communities have no {', '.join(missing)} "
+                         f"(run {'access.py' if mode == 'euclidean' else 'network.py'} first)")
+
+    points = communities[[class_field, dist_field, 'geometry']].copy()
+    points['weight'] = (communities[population_field].fillna(0).to_numpy(dtype=float)
+                        if population_field in communities.columns else 1.0)
+    points = points.to_crs(units.crs)
+
+    # Vectorized point-in-polygon. The community index is queried with the unit polygons, so each
+    # (large) polygon is prepared once (the reverse, gpd.sjoin(points, units), is ~100x slower).
+    # A point on a shared border goes to the first unit only.
+    unit_idx, point_idx = points.sindex.query(units.geometry, predicate='intersects')
+    first = ~pd.Index(point_idx).duplicated()
+    joined = points.iloc[point_idx[first]]
+    unit = pd.Series(units[id_field].to_numpy()[unit_idx[first]], index=joined.index, name=id_field)
+    weight = joined['weight']
+    dist = joined[dist_field].astype(float)
+
+    grouped = weight.groupby(unit)
+    stats = pd.DataFrame({'communities': grouped.size(), 'population': grouped.sum()})
+    by_class = weight.groupby([unit, joined[class_field]]).sum().unstack(fill_value=0)
+    for level, column in CLASS_COLUMNS.items():
+        share = by_class[level] if level in by_class.columns else 0
+        stats[column] = (100 * share / stats['population']).round(1)
+
+    has_dist = dist.notna()
+    weighted = (dist * weight)[has_dist].groupby(unit[has_dist]).sum()
+    stats['mean_dist_m'] = (weighted / weight[has_dist].groupby(unit[has_dist]).sum()).round(1)
+    quantiles = weighted_quantiles(unit, dist, weight)
+    stats['median_dist_m'] = quantiles[0.5].round(1)
+    stats['p90_dist_m'] = quantiles[0.9].round(1)
+
+    stats.insert(0, 'phase', int(phase))
+    return stats.rename_axis(id_field).reset_index()
+
+
+# Tidy table for all phases, with the change from the previous phase per unit
+def phase_stats(phase_communities, units, id_field, mode='euclidean', population_field='population'):
+    table = pd.concat([unit_stats(communities, units, id_field, phase, mode, population_field)
+                       for phase, communities in phase_communities.items()], ignore_index=True)
+    table = table.sort_values([id_field, 'phase'], ignore_index=True)
+    delta_columns = list(CLASS_COLUMNS.values()) + ['mean_dist_m', 'median_dist_m']
+    deltas = table.groupby(id_field)[delta_columns].diff().round(1)
+    for column in delta_columns:
+        table[f'delta_{column}'] = deltas[column]
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Population-weighted access statistics per GADM unit')
+    parser.add_argument('communities', nargs='*',
+                        help='communities layer per phase (default: the project Phase 1 and Phase 2 layers)')
+    parser.add_argument('--phases', nargs='+', help='phase number of each layer (default: 1, 2, ...)')
+    parser.add_argument('--mode', default='euclidean', choices=list(access.DISTANCE_FIELDS))
+    parser.add_argument('--level', type=int, default=2, help='GADM level (default 2, districts)')
+    parser.add_argument('--units', nargs='+', help='only these GADM names or GIDs')
+    parser.add_argument('--population-field', default='population',
+                        help='community population field (missing: every community counts 1)')
+    parser.add_argument('-o', '--output', default='access_stats', help='output basename (.csv and .parquet)')
+    args = parser.parse_args()
+
+    paths = args.communities or [layers.layer_path('communities1'), layers.layer_path('communities2')]
+    phases = args.phases or [str(i + 1) for i in range(len(paths))]
+    if len(phases) != len(paths):
+        parser.error('give one --phases value per communities layer')
+
+    start = time.perf_counter()
+    units = layers.read_gadm(args.level, args.units).to_crs(access.METRIC_CRS)
+    id_field = f'GID_{args.level}'
+    # Only the fields the statistics use (GeoParquet layers skip the other columns on disk)
+    phase_communities = {
+        phase: layers.read_layer(path, cache=False, columns=[access.access_field(phase, args.mode),
+                                                             access.DISTANCE_FIELDS[args.mode],
+                                                             args.population_field])
+        for phase, path in zip(phases, paths)}
+    loaded = time.perf_counter()
+
+    table = phase_stats(phase_communities, units, id_field, args.mode, args.population_field)
+    table.insert(1, 'name', table[id_field].map(units.set_index(id_field)[f'NAME_{args.level}']))
+    computed = time.perf_counter()
+
+    table.to_csv(args.output + '.csv', index=False)
+    saved = [args.output + '.csv']
+    if layers.HAVE_PARQUET:
+        geo = units[[id_field, 'geometry']].merge(table, on=id_field)
+        gpd.GeoDataFrame(geo, geometry='geometry', crs=units.crs).to_parquet(args.output + '.parquet')
+        saved.append(args.output + '.parquet')
+    else:
+        print("pyarrow not installed: GeoParquet output skipped")
+
+    latest = table.drop_duplicates(id_field, keep='last')
+    print(latest[['name', 'phase', 'population', 'pop_poor_pct', 'delta_pop_poor_pct', 'median_dist_m']]
+          .sort_values('pop_poor_pct', ascending=False).head(15).to_string(index=False))
+    print(f"{len(units)} units, {sum(len(c) for c in phase_communities.values())} communities: "
+          f"load {loaded - start:.2f}s, stats {computed - loaded:.2f}s")
+    print(f"Saved {' and '.join(saved)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+# batch_render.py - Thematic access maps for many GADM districts in parallel
+# National layers are loaded (and classified, if needed) once in the parent process. Workers
+# are forked so they share those GeoDataFrames copy-on-write; where fork is unavailable
+# (Windows / OSGeo4W) each worker loads them once in its initializer instead of once per map.
+#
+# Examples:
+#   python batch_render.py settlements_gha.geojson --districts Mampong "Sekyere Central" --workers 4
+#   python batch_render.py settlements_gha.geojson --all-districts --out-dir ..\maps\districts
+#   python batch_render.py settlements_gha.geojson --districts Ashanti --level 1 --label-top 300
+
+import argparse
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+matplotlib.use('Agg')  # non-interactive backend, must be set before mapping imports pyplot
+
+import geopandas as gpd
+import matplotlib.pyplot as plt
+
+import access
+import layers
+import mapping
+
+# National layers shared with the workers (filled by load_national)
+NATIONAL = {}
+
+
+# National layers are read through layers.read_layer (a newer .parquet copy if there is one,
+# reprojected copies kept in .layer_cache), so repeated batches skip decoding and to_crs
+def load_national(communities_path, facilities_path, roads_path, phase, level, crs):
+    districts = layers.read_gadm(level).to_crs(crs)
+    facilities = layers.read_layer(layers.newest_copy(facilities_path), crs=crs)
+    communities = layers.read_layer(layers.newest_copy(communities_path), crs=crs)
+    roads = layers.read_layer(layers.newest_copy(roads_path), crs=crs) if roads_path else gpd.GeoDataFrame()
+
+    # Classify once, nationally, so communities near a district edge can use facilities across it
+    field = access.access_field(phase)
+    if field not in communities.columns:
+        communities = access.compute_access(communities, facilities, phase)
+
+    # Build the spatial indexes before forking so every worker inherits them
+    for gdf in (communities, facilities, roads):
+        if not gdf.empty:
+            gdf.sindex
+    NATIONAL.update(districts=districts, facilities=facilities, communities=communities,
+                    roads=roads, phase=phase, level=level)
+
+
+def _select(gdf, geom):
+    if gdf.empty:
+        return gdf
+    return gdf.iloc[gdf.sindex.query(geom, predicate='intersects')]
+
+
+def render_district(district, out_dir, dpi, label_top=0):
+    start = time.perf_counter()
+    level, phase = NATIONAL['level'], NATIONAL['phase']
+    districts = NATIONAL['districts']
+    unit = districts[(districts[f'NAME_{level}'] == district) | (districts[f'GID_{level}'] == district)]
+    if unit.empty:
+        raise ValueError(f"No GADM level {level} unit named {district!r}")
+    geom = unit.geometry.union_all()
+    name = unit[f'NAME_{level}'].iloc[0]
+
+    communities = _select(NATIONAL['communities'], geom)
+    facilities = _select(NATIONAL['facilities'], geom)
+    roads = _select(NATIONAL['roads'], geom)
+    if not roads.empty:
+        roads = roads.clip(geom)
+
+    field = access.access_field(phase)
+    poor = (communities[field] == access.POOR_ACCESS).mean() * 100 if len(communities) else 0
+    interpretation = (f"{len(communities)} communities and {len(facilities)} mapped facilities in {name}. "
+                      f"{poor:.0f}% of communities are more than 3 km from the nearest facility (poor access).")
+    layers_done = time.perf_counter()
+
+    fig = mapping.draw_thematic_map(
+        unit, communities, facilities, roads, field,
+        title=f'Phase {phase} Health Accessibility {name}',
+        interpretation=interpretation,
+        boundary_label=f'{name} Boundary',
+        label_names=[],
+        label_rank='population' if label_top else None,
+        label_limit=label_top,
+    )
+    basename = os.path.join(out_dir, f'Thematic_Map{phase}_{layers.safe_name(name)}')
+    mapping.save_map(fig, basename, dpi=dpi)
+    plt.close(fig)
+    done = time.perf_counter()
+    return name, layers_done - start, done - layers_done, basename
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render thematic access maps for many districts in parallel')
+    parser.add_argument('communities', help='national communities/settlements layer')
+    parser.add_argument('--facilities', default=layers.HOTOSM_FACILITIES, help='facilities layer (default: HOTOSM Ghana)')
+    parser.add_argument('--roads', help='national roads layer (optional)')
+    parser.add_argument('--districts', nargs='+', help='GADM district names or GIDs')
+    parser.add_argument('--all-districts', action='store_true', help='render every unit in the GADM level')
+    parser.add_argument('--level', type=int, default=2, help='GADM level (default 2, districts)')
+    parser.add_argument('--phase', default='2', help='phase number of the Acces_lvl field')
+    parser.add_argument('--crs', default='EPSG:4326', help='map CRS (default EPSG:4326, as the Mampong maps)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='processes (default: all CPUs)')
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--label-top', type=int, default=0,
+                        help='label up to N communities per map, largest population first, where they fit')
+    parser.add_argument('--out-dir', default='district_maps')
+    args = parser.parse_args()
+    if not args.districts and not args.all_districts:
+        parser.error('give --districts or --all-districts')
+
+    start = time.perf_counter()
+    national_args = (args.communities, args.facilities, args.roads, args.phase, args.level, args.crs)
+    load_national(*national_args)
+    load_time = time.perf_counter() - start
+    names = args.districts or list(NATIONAL['districts'][f'NAME_{args.level}'])
+    os.makedirs(args.out_dir, exist_ok=True)
+    print(f"Loaded national layers in {load_time:.1f}s; rendering {len(names)} maps with {args.workers} workers")
+
+    if 'fork' in mp.get_all_start_methods():
+        pool = ProcessPoolExecutor(args.workers, mp_context=mp.get_context('fork'))
+    else:
+        pool = ProcessPoolExecutor(args.workers, initializer=load_national, initargs=national_args)
+
+    failed = 0
+    with pool:
+        futures = {pool.submit(render_district, name, args.out_dir, args.dpi, args.label_top): name for name in names}
+        for future in as_completed(futures):
+            try:
+                name, select_time, render_time, basename = future.result()
+            except Exception as exc:
+                failed += 1
+                print(f"  {futures[future]}: FAILED ({exc})")
+                continue
+            print(f"  {name}: layers {select_time:.2f}s, render {render_time:.2f}s -> {basename}.png/.pdf")
+
+    print(f"Rendered {len(names) - failed} of {len(names)} maps in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
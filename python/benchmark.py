@@ -0,0 +1,282 @@
+# benchmark.py - How the load -> analyse -> render pipeline scales with district size
+# For each size a synthetic district is generated around Mampong (irregular boundary, road grid,
+# communities and Phase 1 / Phase 2 facilities at Mampong's densities) and written under the
+# project file names. Each stage group then runs in a fresh process, so its peak RSS is its own:
+#   analysis    GeoJSON load, reprojection, access classification (Phase 1 and 2), write
+#   cache       layers.load_layers building the .layer_cache copies the map scripts read
+#   thematic1 / thematic2 / comparison / webmap   the actual map scripts, run on the synthetic folder
+# The map scripts' own stages (instrument.py) are listed after their total.
+# Wall time per stage and peak RSS per group are written to a JSON results file; --baseline prints
+# the change against an earlier results file.
+#
+# Examples:
+#   python benchmark.py                                     (100, 1,000 and 10,000 communities)
+#   python benchmark.py --sizes 100 10000 1000000 --groups analysis webmap -o bench_big.json
+#   python benchmark.py --baseline benchmark_results.json
+
+import argparse
+import datetime
+import importlib
+import json
+import math
+import multiprocessing as mp
+import os
+import platform
+import runpy
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, redirect_stdout
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from pyproj import Transformer
+
+import access
+import instrument
+import layers
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MAMPONG_CENTER = (-1.40, 7.06)  # lon, lat
+KM2_PER_COMMUNITY = 1.5  # about Mampong's settlement density
+COMMUNITIES_PER_FACILITY = {1: 75, 2: 25}  # Mampong: 300 communities, 4 / 12 facilities
+ROAD_TYPES = ['primary', 'secondary', 'tertiary', 'unclassified', 'residential', 'track']
+ROAD_TYPE_SHARE = [0.05, 0.1, 0.15, 0.2, 0.3, 0.2]
+
+# Stage groups (one process each) and the map scripts they run
+SCRIPTS = {
+    'thematic1': 'Thematic Map 1.py',
+    'thematic2': 'Thematic Map2.py',
+    'comparison': 'comparison map.py',
+    'webmap': 'Webmap.py',
+}
+GROUPS = ['analysis', 'cache'] + list(SCRIPTS)
+WEBMAP_SCALABLE_FROM = 10_000  # larger districts use Webmap.py --scalable
+
+
+def peak_rss_mb():
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3  # bytes on macOS, KiB on Linux
+    if psutil is not None:
+        return psutil.Process().memory_info().peak_wset / 1e6
+    return None
+
+
+def _random_points(polygon, n, rng):
+    minx, miny, maxx, maxy = polygon.bounds
+    xs, ys = [], []
+    found = 0
+    while found < n:
+        x = rng.uniform(minx, maxx, 2 * (n - found) + 16)
+        y = rng.uniform(miny, maxy, len(x))
+        inside = shapely.contains_xy(polygon, x, y)
+        xs.append(x[inside])
+        ys.append(y[inside])
+        found += inside.sum()
+    return np.concatenate(xs)[:n], np.concatenate(ys)[:n]
+
+
+# Synthetic district with `n` communities written to `out_dir` under the project file names
+# (communities without access fields go to communities_raw.geojson). Returns feature counts.
+def make_district(n, out_dir, seed=0):
+    rng = np.random.default_rng(seed)
+    to_utm = Transformer.from_crs('EPSG:4326', access.METRIC_CRS, always_xy=True)
+    cx, cy = to_utm.transform(*MAMPONG_CENTER)
+
+    # Irregular outline with the area n communities need at Mampong's density
+    radius = math.sqrt(n * KM2_PER_COMMUNITY * 1e6 / math.pi)
+    angles = np.linspace(0, 2 * math.pi, 96, endpoint=False)
+    wobble = 1 + 0.12 * np.sin(3 * angles + rng.uniform(0, 6)) + 0.06 * np.sin(7 * angles + rng.uniform(0, 6))
+    boundary = shapely.Polygon(np.column_stack([cx + radius * wobble * np.cos(angles),
+                                                cy + radius * wobble * np.sin(angles)]))
+
+    x, y = _random_points(boundary, n, rng)
+    communities = gpd.GeoDataFrame({
+        'name': [f'Community {i + 1}' for i in range(n)],
+        'population': np.round(rng.lognormal(6.5, 1.0, n)).astype(int),
+    }, geometry=shapely.points(x, y), crs=access.METRIC_CRS)
+
+    n_fac = {phase: max(1, n // per) for phase, per in COMMUNITIES_PER_FACILITY.items()}
+    fx, fy = _random_points(boundary, max(n_fac.values()), rng)
+    facilities = {phase: gpd.GeoDataFrame({
+        'name': [f'Facility {i + 1}' for i in range(count)],
+        'amenity': 'clinic',
+    }, geometry=shapely.points(fx[:count], fy[:count]), crs=access.METRIC_CRS) for phase, count in n_fac.items()}
+
+    # Road grid, about one junction per two communities, segments kept if they touch the district
+    spacing = 2 * radius / max(2, math.sqrt(n / 2))
+    ticks_x = np.arange(cx - 1.2 * radius, cx + 1.2 * radius, spacing)
+    ticks_y = np.arange(cy - 1.2 * radius, cy + 1.2 * radius, spacing)
+    gx, gy = np.meshgrid(ticks_x, ticks_y)
+    starts = np.concatenate([np.column_stack([gx[:, :-1].ravel(), gy[:, :-1].ravel()]),
+                             np.column_stack([gx[:-1, :].ravel(), gy[:-1, :].ravel()])])
+    ends = np.concatenate([np.column_stack([gx[:, 1:].ravel(), gy[:, 1:].ravel()]),
+                           np.column_stack([gx[1:, :].ravel(), gy[1:, :].ravel()])])
+    segments = shapely.linestrings(np.stack([starts, ends], axis=1))
+    shapely.prepare(boundary)
+    segments = segments[shapely.intersects(boundary, segments)]
+    roads = gpd.GeoDataFrame({'highway': rng.choice(ROAD_TYPES, len(segments), p=ROAD_TYPE_SHARE)},
+                             geometry=segments, crs=access.METRIC_CRS)
+
+    outputs = {
+        'boundary': gpd.GeoDataFrame({'NAME_2': ['Synthetic']}, geometry=[boundary], crs=access.METRIC_CRS),
+        'facilities1': facilities[1],
+        'facilities2': facilities[2],
+        'roads': roads,
+    }
+    for name, gdf in outputs.items():
+        gdf.to_crs('EPSG:4326').to_file(os.path.join(out_dir, layers.LAYER_FILES[name]), driver='GeoJSON')
+    communities.to_crs('EPSG:4326').to_file(os.path.join(out_dir, 'communities_raw.geojson'), driver='GeoJSON')
+    return {'communities': n, 'facilities1': n_fac[1], 'facilities2': n_fac[2], 'roads': len(roads)}
+
+
+# Wall time of the block, stored as seconds[name]
+@contextmanager
+def timed(seconds, name):
+    start = time.perf_counter()
+    yield
+    seconds[name] = time.perf_counter() - start
+
+
+def _analysis(seconds):
+    with timed(seconds, 'load'):
+        communities = gpd.read_file('communities_raw.geojson')
+        facilities = {p: gpd.read_file(layers.LAYER_FILES[f'facilities{p}']) for p in (1, 2)}
+    with timed(seconds, 'reproject'):
+        communities = communities.to_crs(access.METRIC_CRS)
+        facilities = {p: f.to_crs(access.METRIC_CRS) for p, f in facilities.items()}
+    with timed(seconds, 'access'):
+        classified = {p: access.compute_access(communities, facilities[p], p) for p in (1, 2)}
+    with timed(seconds, 'write'):
+        for p, result in classified.items():
+            result.to_crs('EPSG:4326').to_file(layers.LAYER_FILES[f'communities{p}'], driver='GeoJSON')
+
+
+# One stage group in a fresh process: returns ({stage: seconds}, peak RSS MB, RSS after imports MB)
+def run_group(group, data_dir, n):
+    import matplotlib
+    matplotlib.use('Agg')
+    importlib.import_module('mapping')  # import cost is not part of the stages
+    importlib.import_module('folium')
+
+    baseline = peak_rss_mb()
+    layers.PROJECT_DIR = data_dir
+    os.chdir(data_dir)
+    seconds = {}
+    if group == 'analysis':
+        _analysis(seconds)
+    elif group == 'cache':
+        with timed(seconds, 'cache'):
+            layers.load_layers()
+    else:
+        argv = ['--scalable'] if group == 'webmap' and n >= WEBMAP_SCALABLE_FROM else []
+        sys.argv = [SCRIPTS[group]] + argv
+        with timed(seconds, group), open(os.devnull, 'w') as quiet, redirect_stdout(quiet):
+            runpy.run_path(os.path.join(SCRIPT_DIR, SCRIPTS[group]), run_name='__main__')
+        # The script's own top-level stages (instrument.py), e.g. 'load layers', 'save'
+        for entry in instrument.LAST_REPORT['stages']:
+            if ' > ' not in entry['stage'] and entry['stage'] != '(other)':
+                seconds[entry['stage']] = entry['seconds']
+    return seconds, peak_rss_mb(), baseline
+
+
+def run_size(n, groups, work_dir, seed=0):
+    data_dir = os.path.join(work_dir, f'district_{n}')
+    os.makedirs(data_dir, exist_ok=True)
+    start = time.perf_counter()
+    counts = make_district(n, data_dir, seed)
+    result = {'size': counts, 'generate_seconds': round(time.perf_counter() - start, 3), 'groups': {}}
+    print(f"{n} communities: generated {counts} in {result['generate_seconds']:.1f}s")
+
+    context = mp.get_context('spawn')
+    for group in groups:
+        try:
+            with ProcessPoolExecutor(1, mp_context=context) as pool:
+                seconds, peak, baseline = pool.submit(run_group, group, data_dir, n).result()
+        except Exception as exc:
+            # BrokenProcessPool here usually means the process ran out of memory
+            result['groups'][group] = {'error': f'{type(exc).__name__}: {exc}'}
+            print(f"  {group:<11}FAILED ({type(exc).__name__}: {exc})")
+            continue
+        result['groups'][group] = {
+            'stages': {name: round(s, 4) for name, s in seconds.items()},
+            'peak_rss_mb': None if peak is None else round(peak, 1),
+            'baseline_rss_mb': None if baseline is None else round(baseline, 1),
+        }
+        if group == 'webmap':
+            result['groups'][group]['html_mb'] = round(
+                os.path.getsize(os.path.join(data_dir, 'Interactive_Comparison_Map.html')) / 1e6, 2)
+        stage_text = ', '.join(f'{name} {s:.2f}s' for name, s in seconds.items())
+        print(f"  {group:<11}{stage_text}; peak RSS {peak or 0:.0f} MB")
+    return result
+
+
+def compare(results, baseline):
+    old = {run['size']['communities']: run for run in baseline['runs']}
+    for run in results['runs']:
+        n = run['size']['communities']
+        if n not in old:
+            continue
+        for group, entry in run['groups'].items():
+            before = old[n]['groups'].get(group)
+            if not before or 'stages' not in before or 'stages' not in entry:
+                continue
+            for stage, seconds in entry['stages'].items():
+                was = before['stages'].get(stage)
+                if was:
+                    print(f"  {n:>8} {group:<11}{stage:<12}{was:8.2f}s -> {seconds:8.2f}s ({seconds / was:5.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the map pipeline on synthetic districts')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000],
+                        help='communities per synthetic district (default: 100 1000 10000)')
+    parser.add_argument('--groups', nargs='+', choices=GROUPS, default=GROUPS, help='stage groups to run')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--work-dir', help='keep the synthetic districts and maps here (default: temporary)')
+    parser.add_argument('-o', '--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help='earlier results file to compare against')
+    args = parser.parse_args()
+    if any(g in SCRIPTS or g == 'cache' for g in args.groups) and 'analysis' not in args.groups:
+        parser.error('the map stages need the analysis group (it writes the classified communities)')
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='mampong_bench_')
+    results = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                    'cpus': os.cpu_count()},
+        'runs': [],
+    }
+    try:
+        for n in args.sizes:
+            results['runs'].append(run_size(n, args.groups, work_dir, args.seed))
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            print(f"Compared with {args.baseline}:")
+            compare(results, json.load(f))
+    print(f"Saved {args.output}")
+
+
+if __name__ == '__main__':
+    main()
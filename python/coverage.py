@@ -0,0 +1,114 @@
+# coverage.py - Multi-ring facility coverage (replaces the manual buffer-dissolve-clip in QGIS)
+# Drops facilities too far from the study boundary to matter, buffers the rest for each
+# distance threshold, dissolves them with one cascaded union (shapely.union_all), clips to
+# the boundary and writes all rings to one layer. Prints timing stats per step.
+#
+# Examples:
+#   python coverage.py Complete_Healthcare_Facilities_Phase2.geojson --boundary mampong_boundary.geojson
+#   python coverage.py ..\data_raw\hotosm_gha_health_facilities_points_shp\hotosm_gha_health_facilities_points_shp.shp ^
+#       --district Mampong --thresholds 1 3 5 10 -o ..\output\mampong_rings.shp --legacy-dir ..\output
+
+import argparse
+import os
+import time
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+import access
+import layers
+
+DEFAULT_THRESHOLDS_KM = [1, 3]  # same as output/health_access_1km / _3km
+QUAD_SEGS = 16  # buffer smoothness (points per quarter circle)
+
+
+# Rings between consecutive thresholds, clipped to `boundary`.
+# Returns (GeoDataFrame in the metric CRS, {step: seconds})
+def coverage_rings(facilities, boundary, thresholds_km=DEFAULT_THRESHOLDS_KM, crs=access.METRIC_CRS):
+    timings = {}
+    start = time.perf_counter()
+    fx, fy = access.metric_xy(facilities, crs)
+    points = shapely.points(fx[~np.isnan(fx)], fy[~np.isnan(fy)])
+    area = shapely.union_all(np.asarray(boundary.to_crs(crs).geometry.values))
+    thresholds = sorted(float(t) for t in thresholds_km)
+    timings['prepare'] = time.perf_counter() - start
+
+    # Facilities further than the largest ring from the boundary cannot cover any of it
+    start = time.perf_counter()
+    shapely.prepare(area)
+    points = points[shapely.dwithin(points, area, thresholds[-1] * 1000)]
+    timings['prefilter'] = time.perf_counter() - start
+
+    rows = []
+    previous = None
+    for km in thresholds:
+        step = f'{km:g}km'
+        start = time.perf_counter()
+        buffers = shapely.buffer(points, km * 1000, quad_segs=QUAD_SEGS)
+        timings[f'buffer {step}'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        covered = shapely.union_all(buffers)
+        timings[f'union {step}'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        covered = shapely.intersection(covered, area)
+        ring = covered if previous is None else shapely.difference(covered, previous)
+        timings[f'clip {step}'] = time.perf_counter() - start
+
+        lower = 0 if previous is None else rows[-1]['max_km']
+        rows.append({'ring': f'{lower:g}-{km:g} km', 'min_km': lower, 'max_km': km,
+                     'area_km2': round(shapely.area(ring) / 1e6, 3), 'geometry': ring})
+        previous = covered
+
+    return gpd.GeoDataFrame(rows, geometry='geometry', crs=crs), timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Multi-ring facility coverage clipped to a boundary')
+    parser.add_argument('facilities', help='facilities layer (points or polygons)')
+    parser.add_argument('--boundary', help='boundary layer to clip to (default: GADM --district)')
+    parser.add_argument('--district', nargs='+', help='GADM unit name(s) or GID(s) to clip to')
+    parser.add_argument('--level', type=int, default=2, help='GADM level for --district (default 2)')
+    parser.add_argument('--thresholds', type=float, nargs='+', default=DEFAULT_THRESHOLDS_KM,
+                        help='ring distances in km (default: 1 3)')
+    parser.add_argument('-o', '--output', default=os.path.join('..', 'output', 'health_access_rings.parquet'),
+                        help='rings layer, all thresholds in one file')
+    parser.add_argument('--compat', nargs='+', choices=layers.COMPAT_FORMATS, default=[],
+                        help='also write these formats under the output name, e.g. geojson shp')
+    parser.add_argument('--legacy-dir', help='also write cumulative health_access_<n>km_clipped.shp here')
+    args = parser.parse_args()
+    if not args.boundary and not args.district:
+        parser.error('give --boundary or --district')
+
+    start = time.perf_counter()
+    facilities = layers.read_layer(args.facilities, cache=False)
+    if args.boundary:
+        boundary = layers.read_layer(args.boundary, cache=False)
+    else:
+        boundary = layers.read_gadm(args.level, args.district)
+    load_time = time.perf_counter() - start
+
+    rings, timings = coverage_rings(facilities, boundary, args.thresholds)
+
+    start = time.perf_counter()
+    layers.write_layer(rings, args.output, args.compat)
+    if args.legacy_dir:
+        for i, km in enumerate(rings['max_km']):
+            cumulative = gpd.GeoDataFrame({'max_km': [km]},
+                                          geometry=[shapely.union_all(rings.geometry.values[:i + 1])],
+                                          crs=rings.crs)
+            cumulative.to_file(os.path.join(args.legacy_dir, f'health_access_{km:g}km_clipped.shp'))
+    write_time = time.perf_counter() - start
+
+    print(rings.drop(columns='geometry').to_string(index=False))
+    print(f"{'load':<16}{load_time:8.3f}s")
+    for step, seconds in timings.items():
+        print(f"{step:<16}{seconds:8.3f}s")
+    print(f"{'write':<16}{write_time:8.3f}s")
+    print(f"Saved {args.output}")
+
+
+if __name__ == '__main__':
+    main()
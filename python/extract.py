@@ -0,0 +1,115 @@
+# extract.py - Per-district extracts of the national input layers
+# Only features intersecting the study area are read: GDAL applies the district outline as a
+# spatial filter (bounding box first, through the shapefile .qix index when one exists, then the
+# exact geometry), so the rest of the national file is never parsed into geometries. With several
+# districts each national layer is read once for all of them and split with one STRtree query.
+# Each district gets a folder with its boundary plus one small file per layer. The boundary, and any
+# layer named after a project layer (layers.LAYER_FILES, e.g. roads=...), are written under the
+# project file name, so the folder can be used as MAMPONG_DIR (layers.py) by the map scripts once
+# access.py has written the communities layers there. Other layers become <name>.geojson, input for
+# the analysis scripts (access.py, coverage.py --boundary, ...).
+#
+# Examples:
+#   python extract.py --district Mampong --layer settlements=settlements_gha.geojson roads=gha_roads.shp
+#   python extract.py --district Mampong "Sekyere Central" --buffer-km 5 --out-dir ..\extracts
+
+import argparse
+import os
+import time
+
+import geopandas as gpd
+import pyogrio
+
+import access
+import layers
+
+DEFAULT_LAYERS = {'facilities': layers.HOTOSM_FACILITIES}
+
+
+# District outlines, grown by `buffer_km` (so facilities just across the border still count)
+def study_areas(units, buffer_km=0):
+    if not buffer_km:
+        return units.geometry
+    return units.geometry.to_crs(access.METRIC_CRS).buffer(buffer_km * 1000).to_crs(units.crs)
+
+
+# Features of `path` intersecting any of `areas` (GeoSeries); only `columns` if given
+def read_extract(path, areas, columns=None):
+    crs = pyogrio.read_info(path)['crs']
+    mask = (areas.to_crs(crs) if crs else areas).union_all()
+    return gpd.read_file(path, mask=mask, columns=columns)
+
+
+# {area position: features intersecting it}, one STRtree query for all areas
+def split_by_area(gdf, areas):
+    if gdf.empty:
+        return {i: gdf for i in range(len(areas))}
+    area_idx, feature_idx = gdf.sindex.query(areas.to_crs(gdf.crs), predicate='intersects')
+    return {i: gdf.iloc[feature_idx[area_idx == i]] for i in range(len(areas))}
+
+
+# Coordinates rounded to ~0.1 m (GeoJSON has no other size knob)
+def write_extract(gdf, path):
+    precision = 6 if gdf.crs is None or gdf.crs.is_geographic else 1
+    gdf.to_file(path, driver='GeoJSON', COORDINATE_PRECISION=precision)
+
+
+# File name of layer `name` in a district folder
+def extract_name(name):
+    return layers.LAYER_FILES.get(name, f'{name}.geojson')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Extract national layers to per-district study areas')
+    parser.add_argument('--district', nargs='+', required=True, help='GADM unit name(s) or GID(s)')
+    parser.add_argument('--level', type=int, default=2, help='GADM level (default 2, districts)')
+    parser.add_argument('--layer', nargs='+', default=[], metavar='NAME=PATH',
+                        help='national layers to extract (default: facilities=HOTOSM Ghana)')
+    parser.add_argument('--columns', nargs='+', help='attribute columns to keep (default: all)')
+    parser.add_argument('--buffer-km', type=float, default=0, help='grow each district by this distance')
+    parser.add_argument('--out-dir', default='extracts')
+    args = parser.parse_args()
+
+    sources = dict(DEFAULT_LAYERS)
+    for item in args.layer:
+        name, sep, path = item.partition('=')
+        if not sep:
+            parser.error(f'--layer expects NAME=PATH, got {item!r}')
+        sources[name] = path
+
+    start = time.perf_counter()
+    units = layers.read_gadm(args.level, args.district)
+    areas = study_areas(units, args.buffer_km)
+    names = list(units[f'NAME_{args.level}'])
+    print(f"GADM level {args.level}: {len(units)} unit(s) in {time.perf_counter() - start:.2f}s")
+
+    folders = [os.path.join(args.out_dir, layers.safe_name(name)) for name in names]
+    for folder, i in zip(folders, range(len(units))):
+        os.makedirs(folder, exist_ok=True)
+        write_extract(units.iloc[[i]], os.path.join(folder, extract_name('boundary')))
+
+    for layer, path in sources.items():
+        start = time.perf_counter()
+        columns = [c for c in args.columns if c in pyogrio.read_info(path)['fields']] if args.columns else None
+        gdf = read_extract(path, areas, columns)
+        read_time = time.perf_counter() - start
+        total = pyogrio.read_info(path, force_feature_count=True)['features']
+
+        start = time.perf_counter()
+        parts = split_by_area(gdf, areas)
+        for i, folder in enumerate(folders):
+            write_extract(parts[i], os.path.join(folder, extract_name(layer)))
+        counts = ', '.join(f'{names[i]} {len(parts[i])}' for i in range(len(names)))
+        print(f"{layer}: read {len(gdf)} of {total} features in {read_time:.2f}s, "
+              f"split/write {time.perf_counter() - start:.2f}s ({counts})")
+
+    print(f"Saved extracts to {', '.join(folders)}")
+    missing = [name for name in layers.LAYER_FILES if name not in layers.OPTIONAL_LAYERS
+               and name != 'boundary' and name not in sources]
+    if missing:
+        print(f"For the map scripts, add {', '.join(layers.LAYER_FILES[name] for name in missing)} "
+              f"(e.g. with access.py) and run them with MAMPONG_DIR set to the district folder")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# fca.py - Enhanced two-step floating catchment area (E2SFCA) accessibility score
+# Unlike Acces_lvl (distance to the nearest facility only), the score accounts for facility
+# capacity and for how many people compete for it:
+#   step 1  each facility's supply / distance-weighted population within its catchment
+#   step 2  each community sums the ratios of the facilities within reach, distance-weighted
+# Facility-community distances (straight line, or along roads.geojson with --roads) are built once
+# as a sparse matrix W, and both steps are sparse matrix-vector products (W @ population, W.T @ ratio).
+# Writes E2SFCA<phase> (capacity per 1,000 population) and the Acces_fca<phase> class, so the map
+# scripts can show it: python "Thematic Map2.py" fca / python Webmap.py fca
+#
+# Examples:
+#   python fca.py communities_distance_phase2.geojson Complete_Healthcare_Facilities_Phase2.geojson --phase 2 ^
+#       -o communities_distance_phase2.geojson
+#   python fca.py settlements_gha.geojson ..\data_raw\hotosm_gha_health_facilities_points_shp\hotosm_gha_health_facilities_points_shp.shp ^
+#       --roads roads_gha.geojson --capacity-field capacity_p -o settlements_fca.geojson
+
+import argparse
+import time
+
+import numpy as np
+
+import access
+import layers
+import network
+
+# Distance zones (upper bound in metres, weight): the Gaussian-decay zone weights of E2SFCA,
+# with the zones aligned to the 1 km / 3 km access classes
+ZONES = [(1000, 1.0), (2000, 0.68), (3000, 0.22)]
+SCORE_SCALE = 1000  # score is capacity per 1,000 population
+
+# Class of a score relative to the population-weighted mean score (the area's overall
+# supply-to-population ratio): at least the mean is Good, at least half of it Moderate
+SCORE_CLASSES = [(1.0, 'Good Access'), (0.5, 'Moderate Access')]
+
+
+def score_field(phase):
+    return f'E2SFCA{phase}'
+
+
+# Distance matrix -> zone weight matrix (same sparsity, pairs beyond the last zone dropped)
+def zone_weights(dist, zones=ZONES):
+    limits = np.array([limit for limit, _ in zones], dtype=float)
+    weights = np.append(np.array([w for _, w in zones], dtype=float), 0.0)
+    result = dist.copy()
+    result.data = weights[np.searchsorted(limits, dist.data, side='left')]
+    result.eliminate_zeros()
+    return result
+
+
+# E2SFCA score for every column of W (facilities x communities)
+def e2sfca(weights, supply, demand):
+    served = weights @ demand  # step 1: weighted population in each catchment
+    ratio = np.divide(supply, served, out=np.zeros(len(supply)), where=served > 0)
+    return weights.T @ ratio  # step 2
+
+
+def classify_score(score, demand, classes=SCORE_CLASSES):
+    reference = np.average(score, weights=demand) if demand.sum() > 0 else 0
+    labels = np.full(len(score), access.POOR_ACCESS, dtype=object)
+    for share, label in reversed(classes):
+        labels[(score > 0) & (score >= share * reference)] = label
+    return labels
+
+
+# Add E2SFCA<phase> and Acces_fca<phase> to a copy of `communities`
+def compute_fca(communities, facilities, phase, population_field='population', capacity_field=None,
+                graph=None, zones=ZONES):
+    cutoff = zones[-1][0]
+    if graph is None:
+        dist = access.distance_matrix(facilities, communities, cutoff)
+    else:
+        dist = network.facility_distances(graph, communities, facilities, cutoff)
+    weights = zone_weights(dist, zones)
+
+    if population_field in communities.columns:
+        demand = communities[population_field].fillna(0).to_numpy(dtype=float)
+    else:
+        demand = np.ones(len(communities))
+    if capacity_field:
+        capacity = facilities[capacity_field].astype(float)
+        # Facilities without a capacity count as a typical one
+        supply = capacity.fillna(capacity.median() if capacity.notna().any() else 1).to_numpy()
+    else:
+        supply = np.ones(len(facilities))
+
+    score = e2sfca(weights, supply, demand) * SCORE_SCALE
+    result = communities.copy()
+    result[score_field(phase)] = np.round(score, 4)
+    result[access.access_field(phase, 'fca')] = classify_score(score, demand)
+    return result, weights.nnz
+
+
+def main():
+    parser = argparse.ArgumentParser(description='E2SFCA supply-demand accessibility score per community')
+    parser.add_argument('communities', help='communities layer')
+    parser.add_argument('facilities', help='facilities layer')
+    parser.add_argument('--phase', default='2', help='phase number used in the field names')
+    parser.add_argument('--population-field', default='population',
+                        help='community population field (missing: every community counts 1)')
+    parser.add_argument('--capacity-field', help='facility capacity field (default: every facility counts 1)')
+    parser.add_argument('--roads', help='roads layer: measure catchments along roads instead of straight lines')
+    parser.add_argument('-o', '--output', required=True, help='output layer')
+    parser.add_argument('--compat', nargs='+', choices=layers.COMPAT_FORMATS, default=[],
+                        help='also write these formats under the output name, e.g. geojson shp')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    communities = layers.read_layer(args.communities, cache=False)
+    facilities = layers.read_layer(args.facilities, cache=False)
+    graph = network.load_graph(args.roads) if args.roads else None
+    loaded = time.perf_counter()
+
+    result, pairs = compute_fca(communities, facilities, args.phase, args.population_field,
+                                args.capacity_field, graph)
+    done = time.perf_counter()
+
+    layers.write_layer(result, args.output, args.compat)
+    field = access.access_field(args.phase, 'fca')
+    score = result[score_field(args.phase)]
+    print(f"{len(facilities)} facilities x {len(communities)} communities, {pairs} pairs within "
+          f"{ZONES[-1][0]} m {'by road' if graph else 'straight line'}: load {loaded - start:.2f}s, "
+          f"score {done - loaded:.2f}s")
+    print(f"{score_field(args.phase)}: mean {score.mean():.3f}, max {score.max():.3f} per 1,000 population; "
+          f"{(score == 0).sum()} communities with no facility in reach")
+    print(f"{field} counts:", result[field].value_counts().to_dict())
+    print(f"Saved {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+# geojson_stream.py - Read GeoJSON one feature at a time
+# A FeatureCollection is decoded feature by feature from a buffered reader (json.JSONDecoder.raw_decode),
+# so memory stays at the size of the largest feature instead of the whole file. Line-delimited
+# GeoJSON (GeoJSONSeq / .geojsonl, one feature per line) is read line by line.
+# Features without usable coordinates are skipped (same checks as the web map), and geometries
+# are reprojected to WGS84 if the file declares another CRS.
+# GeoParquet (.parquet) and GDAL formats such as FlatGeobuf (.fgb) are read as Arrow record batches
+# instead, with only the requested property columns, and yield the same features.
+#
+# Convert a large layer to GeoJSONSeq (e.g. for other streaming tools):
+#   python geojson_stream.py settlements_gha.geojson settlements_gha.geojsonl
+
+import argparse
+import json
+import os
+from itertools import compress
+
+import numpy as np
+import shapely
+from pyproj import CRS, Transformer
+from shapely.geometry import mapping, shape
+
+try:
+    import pyarrow.parquet as pq
+    from pyogrio.raw import open_arrow
+except ImportError:  # GeoJSON streaming needs neither
+    pq = open_arrow = None
+
+SEQ_EXTENSIONS = ('.geojsonl', '.geojsons', '.geojsonseq', '.jsonl', '.ndjson')
+TABLE_EXTENSIONS = ('.parquet', '.fgb', '.gpkg', '.shp')  # read as Arrow batches
+BATCH_SIZE = 65536  # rows per Arrow batch
+GEOMETRY_TYPE_IDS = {'Point': 0, 'LineString': 1, 'LinearRing': 2, 'Polygon': 3, 'MultiPoint': 4,
+                     'MultiLineString': 5, 'MultiPolygon': 6, 'GeometryCollection': 7}
+CHUNK_SIZE = 1 << 16  # characters read per refill
+RS = '\x1e'  # RFC 8142 record separator
+WGS84 = CRS.from_epsg(4326)
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\r\n'
+
+
+# Same test Webmap.py always used before drawing a feature
+def valid_geometry(geom):
+    if not geom or not geom.get('coordinates'):
+        return False
+    if geom['type'] == 'Point':
+        return len(geom['coordinates']) >= 2
+    return True
+
+
+class _Reader:
+    # Buffered text reader that decodes one JSON value at a time
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size=CHUNK_SIZE):
+        if self.pos > CHUNK_SIZE:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        chunk = self.f.read(size)
+        self.eof = not chunk
+        self.buf += chunk
+        return not self.eof
+
+    # Next non-whitespace character (not consumed), '' at end of file
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Invalid GeoJSON: expected {char!r} near character {self.pos}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # Incomplete value: read at least as much again as is pending before decoding from
+                # its start again, so a feature larger than a chunk costs linear, not quadratic, time
+                if self._fill(max(CHUNK_SIZE, len(self.buf) - self.pos)):
+                    continue
+                raise
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+# Yields ('crs', value) for the header crs member, then ('feature', feature) for each feature
+def _iter_collection(f):
+    reader = _Reader(f)
+    reader.expect('{')
+    while reader.peek() not in ('}', ''):
+        key = reader.value()
+        reader.expect(':')
+        if key == 'features':
+            reader.expect('[')
+            while reader.peek() != ']':
+                yield 'feature', reader.value()
+                if reader.peek() == ',':
+                    reader.pos += 1
+            reader.pos += 1
+        elif key == 'crs':
+            yield 'crs', reader.value()
+        else:
+            reader.value()
+        if reader.peek() == ',':
+            reader.pos += 1
+
+
+def _iter_seq(f):
+    for line in f:
+        line = line.strip(RS + _WHITESPACE)
+        if line:
+            yield 'feature', json.loads(line)
+
+
+def _transformer(crs_member):
+    name = (crs_member or {}).get('properties', {}).get('name')
+    if not name:
+        return None
+    crs = CRS.from_user_input(name)
+    if crs.equals(WGS84, ignore_axis_order=True):
+        return None
+    return Transformer.from_crs(crs, WGS84, always_xy=True)
+
+
+def _reproject(geom, transformer):
+    geometry = shapely.transform(shape(geom), lambda xy: np.column_stack(transformer.transform(xy[:, 0], xy[:, 1])))
+    return mapping(geometry)
+
+
+# Features of Arrow record batches with a WKB geometry column, reprojected to WGS84 per batch
+def _iter_batches(batches, geometry, crs, geom_types=None):
+    transformer = None
+    if crs is not None:
+        source = CRS.from_json_dict(crs) if isinstance(crs, dict) else CRS.from_user_input(crs)
+        if not source.equals(WGS84, ignore_axis_order=True):
+            transformer = Transformer.from_crs(source, WGS84, always_xy=True)
+    type_ids = [GEOMETRY_TYPE_IDS[t] for t in geom_types] if geom_types else None
+    for batch in batches:
+        geoms = shapely.from_wkb(batch.column(geometry).to_numpy(zero_copy_only=False))
+        keep = ~shapely.is_missing(geoms) & ~shapely.is_empty(geoms)
+        if type_ids is not None:
+            keep &= np.isin(shapely.get_type_id(geoms), type_ids)
+        if transformer is not None:
+            geoms[keep] = shapely.transform(
+                geoms[keep], lambda xy: np.column_stack(transformer.transform(xy[:, 0], xy[:, 1])))
+        rows = batch.select([name for name in batch.schema.names if name != geometry]).to_pylist()
+        for geom, props in zip(geoms[keep], compress(rows, keep)):
+            yield {'type': 'Feature', 'properties': props, 'geometry': mapping(geom)}
+
+
+# Features of a GeoParquet file (pyarrow) or any GDAL format (pyogrio), reading only the
+# requested property columns
+def _iter_table(path, properties=None, geom_types=None):
+    if path.lower().endswith('.parquet'):
+        parquet = pq.ParquetFile(path)
+        schema = parquet.schema_arrow
+        geo = json.loads(schema.metadata[b'geo'])
+        geometry = geo['primary_column']
+        crs = geo['columns'][geometry].get('crs', 'OGC:CRS84')  # GeoParquet: no crs key means lon/lat
+        columns = None if properties is None else [c for c in properties if c in schema.names] + [geometry]
+        yield from _iter_batches(parquet.iter_batches(BATCH_SIZE, columns=columns), geometry, crs, geom_types)
+        return
+    with open_arrow(path, columns=properties, batch_size=BATCH_SIZE, use_pyarrow=True) as (meta, reader):
+        yield from _iter_batches(reader, meta['geometry_name'] or 'wkb_geometry', meta['crs'], geom_types)
+
+
+# Features of a GeoJSON / GeoJSONSeq file with valid geometry, in WGS84.
+# properties: keep only these keys (missing ones are left out); geom_types: e.g. ('Point',)
+def iter_features(path, properties=None, geom_types=None):
+    if path.lower().endswith(TABLE_EXTENSIONS):
+        yield from _iter_table(path, properties, geom_types)
+        return
+    seq = path.lower().endswith(SEQ_EXTENSIONS)
+    transformer = None
+    with open(path, encoding='utf-8') as f:
+        for kind, item in (_iter_seq(f) if seq else _iter_collection(f)):
+            if kind == 'crs':
+                transformer = _transformer(item)
+                continue
+            geom = item.get('geometry')
+            if not valid_geometry(geom) or (geom_types and geom['type'] not in geom_types):
+                continue
+            if transformer is not None:
+                geom = _reproject(geom, transformer)
+            props = item.get('properties') or {}
+            if properties is not None:
+                props = {key: props[key] for key in properties if key in props}
+            yield {'type': 'Feature', 'properties': props, 'geometry': geom}
+
+
+# Features of `path`, or nothing if it is missing (for optional layers such as roads)
+def iter_layer(path, properties=None, geom_types=None):
+    if not os.path.exists(path):
+        return iter(())
+    return iter_features(path, properties, geom_types)
+
+
+def write_seq(features, path):
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        for feature in features:
+            f.write(json.dumps(feature, ensure_ascii=False, separators=(',', ':')))
+            f.write('\n')
+            count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream a GeoJSON layer to line-delimited GeoJSONSeq (WGS84)')
+    parser.add_argument('source', help='GeoJSON FeatureCollection or GeoJSONSeq file')
+    parser.add_argument('output', help='GeoJSONSeq file to write (.geojsonl)')
+    args = parser.parse_args()
+    count = write_seq(iter_features(args.source), args.output)
+    print(f"Wrote {count} features to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
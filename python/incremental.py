@@ -0,0 +1,216 @@
+# incremental.py - Update access classes from a facility diff instead of recomputing everything
+# Only communities whose nearest facility can change are touched:
+#   - added facility: communities whose current HubDist circle contains it (found through an
+#     STRtree over the circles' bounding boxes, then an exact distance check)
+#   - removed facility: communities whose HubDist matches the distance to it (it was their
+#     nearest), which are re-queried against the updated facility set
+# Writes the new Acces_lvl<phase> plus a change log of communities that switched class.
+# --check N compares the update with a full access.compute_access on N random diffs of the inputs.
+#
+# Example (Phase 2 -> Phase 3 with newly digitized CHPS compounds):
+#   python incremental.py communities_distance_phase2.geojson Complete_Healthcare_Facilities_Phase2.geojson ^
+#       --added new_chps.geojson --phase-from 2 --phase-to 3 ^
+#       -o communities_distance_phase3.geojson --facilities-out Healthcare_Facilities_Phase3.geojson
+#   python incremental.py communities_distance_phase2.geojson Complete_Healthcare_Facilities_Phase2.geojson --check 20
+
+import argparse
+import time
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from scipy.spatial import cKDTree
+
+import access
+import layers
+
+MATCH_TOLERANCE = 1.0  # metres; a removed point this close to a facility/radius is treated as the same one
+
+
+# Current facilities minus `removed` (matched by location) plus `added`
+def apply_facility_diff(facilities, added=None, removed=None, tolerance=MATCH_TOLERANCE):
+    updated = facilities
+    if removed is not None and len(removed):
+        fx, fy = access.metric_xy(facilities)
+        rx, ry = access.metric_xy(removed)
+        dist, _ = cKDTree(np.column_stack([rx, ry])).query(np.column_stack([fx, fy]))
+        updated = facilities[dist > tolerance]
+    if added is not None and len(added):
+        updated = pd.concat([updated, added.to_crs(facilities.crs)], ignore_index=True)
+    return gpd.GeoDataFrame(updated, crs=facilities.crs)
+
+
+# Candidate (community, point, distance) pairs where the point lies inside the community's
+# current nearest-distance circle, using an STRtree over the circles' bounding boxes
+def _within_radius(tree, cx, cy, radius, points):
+    px, py = access.metric_xy(points)
+    ok = ~np.isnan(px)
+    point_idx, com_idx = tree.query(shapely.points(px[ok], py[ok]))
+    point_idx = np.flatnonzero(ok)[point_idx]
+    dist = np.hypot(cx[com_idx] - px[point_idx], cy[com_idx] - py[point_idx])
+    inside = dist <= radius[com_idx] + MATCH_TOLERANCE
+    return com_idx[inside], point_idx[inside], dist[inside]
+
+
+# Returns (updated communities, change log of communities that switched class,
+#          updated facilities, number of communities re-evaluated)
+def update_access(communities, facilities, added=None, removed=None, phase_from=2, phase_to=3,
+                  name_field='name'):
+    old_field = access.access_field(phase_from)
+    new_field = access.access_field(phase_to)
+    updated_facilities = apply_facility_diff(facilities, added, removed)
+
+    cx, cy = access.metric_xy(communities)
+    radius = communities['HubDist'].to_numpy(dtype=float)
+    hub_name = communities['HubName'].to_numpy(dtype=object).copy()
+    hub_dist = radius.copy()
+
+    # Communities with no previous match (NaN HubDist) are always recomputed. Boxes are padded by
+    # the match tolerance: HubDist is rounded, and a removed hub almost straight north/south/east/west
+    # of a community would otherwise fall just outside its box
+    has_radius = ~np.isnan(radius) & ~np.isnan(cx)
+    boxes = np.full(len(cx), None, dtype=object)
+    r = radius[has_radius] + MATCH_TOLERANCE
+    boxes[has_radius] = shapely.box(cx[has_radius] - r, cy[has_radius] - r,
+                                    cx[has_radius] + r, cy[has_radius] + r)
+    tree = shapely.STRtree(boxes)
+
+    recompute = ~has_radius & ~np.isnan(cx)
+    if removed is not None and len(removed):
+        com_idx, _, dist = _within_radius(tree, cx, cy, radius, removed)
+        lost_nearest = np.abs(dist - radius[com_idx]) <= MATCH_TOLERANCE
+        recompute[com_idx[lost_nearest]] = True
+
+    closer = np.zeros(len(cx), dtype=bool)
+    if added is not None and len(added):
+        com_idx, fac_idx, dist = _within_radius(tree, cx, cy, radius, added)
+        keep = (dist < radius[com_idx]) & ~recompute[com_idx]
+        com_idx, fac_idx, dist = com_idx[keep], fac_idx[keep], dist[keep]
+        # Closest added facility per community: sort by distance, keep first occurrence
+        order = np.lexsort((dist, com_idx))
+        com_idx, fac_idx, dist = com_idx[order], fac_idx[order], dist[order]
+        first = np.ones(len(com_idx), dtype=bool)
+        first[1:] = com_idx[1:] != com_idx[:-1]
+        com_idx, fac_idx, dist = com_idx[first], fac_idx[first], dist[first]
+        hub_name[com_idx] = access.hub_names(added, fac_idx, name_field)
+        hub_dist[com_idx] = dist
+        closer[com_idx] = True
+
+    rows = np.flatnonzero(recompute)
+    if len(rows):
+        nearest, dist = access.nearest_facility(communities.iloc[rows], updated_facilities)
+        hub_name[rows] = access.hub_names(updated_facilities, nearest, name_field)
+        hub_dist[rows] = dist
+
+    touched = recompute | closer
+    result = communities.copy()
+    old_class = communities[old_field].to_numpy(dtype=object)
+    new_class = old_class.copy()
+    new_class[touched] = access.classify_distance(hub_dist[touched])
+    result['HubName'] = hub_name
+    result['HubDist'] = np.round(hub_dist, 1)
+    result[new_field] = new_class
+
+    switched = np.flatnonzero(new_class != old_class)
+    changes = pd.DataFrame({
+        'name': communities['name'].to_numpy()[switched] if 'name' in communities.columns else switched,
+        'old_class': old_class[switched],
+        'new_class': new_class[switched],
+        'old_HubName': communities['HubName'].to_numpy(dtype=object)[switched],
+        'new_HubName': hub_name[switched],
+        'old_HubDist': radius[switched],
+        'new_HubDist': np.round(hub_dist[switched], 1),
+    })
+    return result, changes, updated_facilities, int(touched.sum())
+
+
+# Differences between update_access and a full recompute over `runs` random diffs (some existing
+# facilities removed, as many random points added within the communities' extent). Returns
+# [(run, communities whose HubDist or class differ)] for the runs that disagree.
+def check_against_full(communities, facilities, runs=20, seed=0, phase=2, name_field='name'):
+    rng = np.random.default_rng(seed)
+    base = access.compute_access(communities, facilities, phase, name_field)
+    cx, cy = access.metric_xy(base)
+    ok = ~np.isnan(cx)
+    failures = []
+    for run in range(runs):
+        n_removed = int(rng.integers(1, max(2, len(facilities) // 5) + 1))
+        removed = facilities.iloc[rng.choice(len(facilities), min(n_removed, len(facilities)), replace=False)]
+        n_added = int(rng.integers(0, n_removed + 1))
+        added = gpd.GeoDataFrame(
+            {name_field: [f'added {i}' for i in range(n_added)]},
+            geometry=gpd.points_from_xy(rng.uniform(cx[ok].min(), cx[ok].max(), n_added),
+                                        rng.uniform(cy[ok].min(), cy[ok].max(), n_added)),
+            crs=access.METRIC_CRS).to_crs(facilities.crs)
+
+        result, _, updated_facilities, _ = update_access(base, facilities, added, removed, phase, phase, name_field)
+        full = access.compute_access(base, updated_facilities, phase, name_field)
+        field = access.access_field(phase)
+        dist, full_dist = result['HubDist'].to_numpy(dtype=float), full['HubDist'].to_numpy(dtype=float)
+        differ = ((np.abs(dist - full_dist) > 0.1) | (np.isnan(dist) != np.isnan(full_dist))
+                  | (result[field].to_numpy(dtype=object) != full[field].to_numpy(dtype=object)))
+        if differ.any():
+            failures.append((run, np.flatnonzero(differ)))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Incremental access update from added/removed facilities')
+    parser.add_argument('communities', help='communities layer with HubName/HubDist (from access.py)')
+    parser.add_argument('facilities', help='current facilities layer (before the diff)')
+    parser.add_argument('--added', help='layer of newly added facility points')
+    parser.add_argument('--removed', help='layer of removed facility points (matched by location)')
+    parser.add_argument('--phase-from', default='2', help='phase of the existing Acces_lvl field')
+    parser.add_argument('--phase-to', default='3', help='phase of the Acces_lvl field to write')
+    parser.add_argument('--name-field', default='name', help='facility field copied into HubName')
+    parser.add_argument('-o', '--output', help='updated communities layer')
+    parser.add_argument('--changes', help='CSV change log (default: <output>_changes.csv)')
+    parser.add_argument('--facilities-out', help='write the updated facility layer here')
+    parser.add_argument('--compat', nargs='+', choices=layers.COMPAT_FORMATS, default=[],
+                        help='also write these formats under the output name, e.g. geojson shp')
+    parser.add_argument('--check', type=int, metavar='N',
+                        help='compare with a full recompute on N random diffs instead of writing anything')
+    parser.add_argument('--seed', type=int, default=0, help='random seed for --check')
+    args = parser.parse_args()
+    if args.check is None and not args.output:
+        parser.error('-o/--output is required (unless --check is given)')
+
+    start = time.perf_counter()
+    communities = layers.read_layer(args.communities, cache=False)
+    facilities = layers.read_layer(args.facilities, cache=False)
+
+    if args.check is not None:
+        failures = check_against_full(communities, facilities, args.check, args.seed, args.phase_from,
+                                      args.name_field)
+        for run, rows in failures:
+            print(f"Run {run}: {len(rows)} communities differ from a full recompute, e.g. rows {rows[:5].tolist()}")
+        print(f"{args.check - len(failures)} of {args.check} random diffs match a full recompute")
+        if failures:
+            raise SystemExit(1)
+        return
+    added = layers.read_layer(args.added, cache=False) if args.added else None
+    removed = layers.read_layer(args.removed, cache=False) if args.removed else None
+    loaded = time.perf_counter()
+
+    result, changes, updated_facilities, touched = update_access(
+        communities, facilities, added, removed, args.phase_from, args.phase_to, args.name_field)
+    updated = time.perf_counter()
+
+    layers.write_layer(result, args.output, args.compat)
+    changes_path = args.changes or args.output.rsplit('.', 1)[0] + '_changes.csv'
+    changes.to_csv(changes_path, index=False)
+    if args.facilities_out:
+        layers.write_layer(updated_facilities, args.facilities_out, args.compat)
+
+    print(f"Facilities: {len(facilities)} -> {len(updated_facilities)} "
+          f"(+{0 if added is None else len(added)} / -{0 if removed is None else len(removed)})")
+    print(f"Re-evaluated {touched} of {len(result)} communities in {updated - loaded:.3f}s "
+          f"(load {loaded - start:.2f}s); {len(changes)} switched class")
+    if len(changes):
+        print(changes.groupby(['old_class', 'new_class']).size().to_string())
+    print(f"Saved {args.output} and {changes_path}")
+
+
+if __name__ == '__main__':
+    main()
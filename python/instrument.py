@@ -0,0 +1,135 @@
+# instrument.py - Stage timings for the map scripts, with optional cProfile / tracemalloc
+# Code marks its stages with `with instrument.stage('read'):` or `@instrument.timed('load layers')`.
+# Stages nest ("load layers > read") and repeated stages add up. Nothing is recorded unless the
+# running script called instrument.start_run(); instrument.finish_run() then prints one table per
+# run and returns the report as a dict.
+# Switches are environment variables, so the scripts keep their own arguments:
+#   MAMPONG_REPORT=runs.jsonl   append every run's report to this file (one JSON object per line)
+#   MAMPONG_PROFILE=1           cProfile the run, print the top functions and save <script>.prof
+#                               (or give a file name instead of 1)
+#   MAMPONG_TRACEMALLOC=1       also record the peak Python memory of each stage
+
+import cProfile
+import datetime
+import functools
+import json
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+PROFILE_TOP = 15  # functions listed from the cProfile stats
+
+_run = None
+LAST_REPORT = None  # report of the most recently finished run (used by benchmark.py)
+
+
+class _Run:
+    def __init__(self, name):
+        self.name = name
+        self.started = datetime.datetime.now().isoformat(timespec='seconds')
+        self.start = time.perf_counter()
+        self.stages = {}  # stage path -> {'seconds', 'calls'[, 'peak_mb']}, in first-seen order
+        self.stack = []  # [path, peak bytes] of the open stages
+        self.trace = bool(os.environ.get('MAMPONG_TRACEMALLOC'))
+        self.profile_path = os.environ.get('MAMPONG_PROFILE')
+        if self.profile_path == '1':
+            self.profile_path = os.path.splitext(name)[0].replace(' ', '_') + '.prof'
+        self.profiler = cProfile.Profile() if self.profile_path else None
+
+
+def start_run(name=None):
+    global _run
+    _run = _Run(name or os.path.basename(sys.argv[0]))
+    if _run.trace and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if _run.profiler:
+        _run.profiler.enable()
+    return _run
+
+
+@contextmanager
+def stage(name):
+    run = _run
+    if run is None:
+        yield
+        return
+    path = f'{run.stack[-1][0]} > {name}' if run.stack else name
+    if run.trace:
+        # The parent's peak so far is kept before the counter is reset for this stage
+        if run.stack:
+            run.stack[-1][1] = max(run.stack[-1][1], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+    entry = run.stages.setdefault(path, {'seconds': 0.0, 'calls': 0})  # parents listed before children
+    frame = [path, 0]
+    run.stack.append(frame)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        run.stack.pop()
+        entry['seconds'] += seconds
+        entry['calls'] += 1
+        if run.trace:
+            peak = max(frame[1], tracemalloc.get_traced_memory()[1])
+            entry['peak_mb'] = max(entry.get('peak_mb', 0), peak / 1e6)
+            if run.stack:
+                run.stack[-1][1] = max(run.stack[-1][1], peak)
+
+
+# Decorator form of stage()
+def timed(name):
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _print_report(report):
+    print(f"Stage timings for {report['script']} (total {report['total_seconds']:.2f}s):")
+    for entry in report['stages']:
+        depth = entry['stage'].count(' > ')
+        label = '  ' * depth + entry['stage'].rsplit(' > ', 1)[-1]
+        peak = f"  peak {entry['peak_mb']:8.1f} MB" if 'peak_mb' in entry else ''
+        print(f"  {label:<34}{entry['seconds']:8.3f}s {entry['calls']:>4}x{peak}")
+
+
+def finish_run(show=True):
+    global _run, LAST_REPORT
+    run = _run
+    if run is None:
+        return None
+    _run = None
+    total = time.perf_counter() - run.start
+    if run.profiler:
+        run.profiler.disable()
+    if run.trace:
+        tracemalloc.stop()
+
+    stages = [{'stage': path, 'seconds': round(entry['seconds'], 4), 'calls': entry['calls'],
+               **({'peak_mb': round(entry['peak_mb'], 1)} if 'peak_mb' in entry else {})}
+              for path, entry in run.stages.items()]
+    staged = sum(entry['seconds'] for path, entry in run.stages.items() if ' > ' not in path)
+    stages.append({'stage': '(other)', 'seconds': round(max(total - staged, 0), 4), 'calls': 1})
+    report = {'script': run.name, 'argv': sys.argv[1:], 'started': run.started,
+              'total_seconds': round(total, 4), 'stages': stages}
+
+    if show:
+        _print_report(report)
+    if run.profiler:
+        run.profiler.dump_stats(run.profile_path)
+        if show:
+            pstats.Stats(run.profiler).sort_stats('cumulative').print_stats(PROFILE_TOP)
+            print(f"Profile saved to {run.profile_path}")
+    report_path = os.environ.get('MAMPONG_REPORT')
+    if report_path:
+        with open(report_path, 'a') as f:
+            f.write(json.dumps(report) + '\n')
+    LAST_REPORT = report
+    return report
@@ -0,0 +1,197 @@
+# labels.py - Community name labels for the static maps
+# Labels are chosen by rank, de-overlapped and drawn as two collections (white boxes + text outlines)
+# instead of one ax.annotate per name, so labelling thousands of settlements stays cheap:
+#   rank    names given explicitly (mapping.SELECTED_NAMES) are always drawn; further labels come from
+#           a rank field (e.g. population, largest first), up to a limit
+#   place   a label's box is tested only against the boxes already kept in the grid cells it covers
+#           (cells as large as the largest box), so each test is O(1) and the pass is O(n); this
+#           runs when the figure is drawn, on the final layout (after tight_layout, at the save dpi)
+#   anchor  polygon communities are anchored at a centroid taken in access.METRIC_CRS, not in degrees
+#
+# Example:
+#   artists = labels.draw_labels(ax, communities, names=mapping.SELECTED_NAMES, rank_field='population', limit=200)
+
+import functools
+
+import numpy as np
+import shapely
+from matplotlib.artist import Artist
+from matplotlib.collections import PathCollection
+from matplotlib.font_manager import FontProperties
+from matplotlib.path import Path
+from matplotlib.textpath import TextPath, TextToPath
+from matplotlib.transforms import Affine2D, Bbox
+
+import access
+
+LABEL_SIZE = 10
+LABEL_OFFSET = (5, 5)  # points from the anchor to the start of the text baseline
+LABEL_PAD = 2  # points of box around the text
+
+_text_to_path = TextToPath()
+
+
+def _font(size):
+    return FontProperties(size=size, weight='bold')
+
+
+# Label anchors (n, 2) in the layer's CRS; non-point centroids are computed in a projected CRS
+def anchor_points(gdf):
+    geoms = np.asarray(gdf.geometry.values)
+    if len(geoms) == 0:
+        return np.empty((0, 2))
+    points = shapely.get_type_id(geoms) == 0
+    if points.all() or gdf.crs is None or not gdf.crs.is_geographic:
+        return shapely.get_coordinates(shapely.centroid(geoms))
+    centroids = gdf.geometry.to_crs(access.METRIC_CRS).centroid.to_crs(gdf.crs)
+    return shapely.get_coordinates(centroids.values)
+
+
+# Candidate labels in drawing priority: explicit names first, then by descending rank_field
+# (missing ranks last), at most `limit` ranked ones. Returns (rows, pinned mask).
+def rank_labels(communities, names=(), rank_field=None, limit=None):
+    named = communities['name'].isin(names).to_numpy() if len(names) else np.zeros(len(communities), bool)
+    order = list(np.flatnonzero(named))
+    if rank_field and rank_field in communities.columns:
+        rank = communities[rank_field].to_numpy(dtype=float)
+        rest = np.flatnonzero(~named & communities['name'].notna().to_numpy())
+        rest = rest[np.argsort(-np.nan_to_num(rank[rest], nan=-np.inf), kind='stable')]
+        order += list(rest if limit is None else rest[:limit * 4])  # spare candidates for overlaps
+    rows = communities.iloc[order]
+    return rows, np.arange(len(order)) < named.sum()
+
+
+@functools.lru_cache(maxsize=4096)
+def _char_extent(char, size):
+    return _text_to_path.get_text_width_height_descent(char, _font(size), ismath=False)
+
+
+# Box of each label in points, relative to its anchor: (n, 4) x0, y0, x1, y1. Widths are summed
+# per-character advances (no kerning, a point or so wider at most), so no string is laid out
+def label_boxes(texts, size=LABEL_SIZE, offset=LABEL_OFFSET, pad=LABEL_PAD):
+    boxes = np.empty((len(texts), 4))
+    for i, text in enumerate(texts):
+        extents = [_char_extent(char, size) for char in text] or [(0, 0, 0)]
+        width = sum(e[0] for e in extents)
+        descent = max(e[2] for e in extents)
+        height = max(e[1] - e[2] for e in extents) + descent
+        boxes[i] = (offset[0] - pad, offset[1] - descent - pad,
+                    offset[0] + width + pad, offset[1] + height - descent + pad)
+    return boxes
+
+
+# Keep mask for labels in priority order: pinned ones always, the others only if their box
+# (display units) overlaps no kept box. Boxes are registered in a uniform grid; at most `limit`
+# unpinned labels are kept.
+def place_labels(boxes, pinned, limit=None):
+    keep = np.zeros(len(boxes), bool)
+    if len(boxes) == 0:
+        return keep
+    cell = max(np.max(boxes[:, 2] - boxes[:, 0]), np.max(boxes[:, 3] - boxes[:, 1]), 1e-9)
+    cells = np.floor(boxes / cell).astype(np.int64)
+    grid = {}
+    kept = 0
+    for i, (x0, y0, x1, y1) in enumerate(boxes):
+        cx0, cy0, cx1, cy1 = cells[i]
+        covered = [(cx, cy) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)]
+        if not pinned[i]:
+            if limit is not None and kept >= limit:
+                break
+            clash = False
+            for key in covered:
+                for j in grid.get(key, ()):
+                    bx0, by0, bx1, by1 = boxes[j]
+                    if x0 < bx1 and bx0 < x1 and y0 < by1 and by0 < y1:
+                        clash = True
+                        break
+                if clash:
+                    break
+            if clash:
+                continue
+            kept += 1
+        keep[i] = True
+        for key in covered:
+            grid.setdefault(key, []).append(i)
+    return keep
+
+
+@functools.lru_cache(maxsize=4096)
+def _text_path(text, size, offset):
+    return TextPath(offset, text, prop=_font(size))
+
+
+# Ranked labels of one axes. Which ones fit is decided in draw(), from the axes transform the
+# figure is actually drawn with, so a later tight_layout or another save dpi cannot make kept
+# labels overlap; the placement is reused while that transform is unchanged. As with ax.annotate,
+# labels whose anchor is outside the axes are dropped and the others are drawn whole (not cut at
+# the axes edge); their extent counts in the tight bounding box.
+class LabelLayer(Artist):
+    def __init__(self, texts, anchors, pinned, limit=None, box_alpha=0.8, size=LABEL_SIZE, zorder=5):
+        super().__init__()
+        self.texts = texts
+        self.anchors = anchors
+        self.pinned = pinned
+        self.limit = limit
+        self.box_alpha = box_alpha
+        self.size = size
+        self.boxes = label_boxes(texts, size)
+        self.set_zorder(zorder)
+        self.set_clip_on(False)  # else add_artist clips it to the axes patch
+        self._placed = None  # (transform key, collections, kept boxes in display units)
+
+    # Box and text collections for the labels that fit at the current transform, and their boxes
+    def _placement(self, ax):
+        key = (*ax.transData.transform([(0, 0), (1, 1)]).ravel(), *ax.bbox.bounds, ax.figure.dpi)
+        if self._placed is not None and self._placed[0] == key:
+            return self._placed[1:]
+        anchors_px = ax.transData.transform(self.anchors)
+        boxes_px = self.boxes * (ax.figure.dpi / 72) + np.tile(anchors_px, 2)
+        x0, y0, x1, y1 = ax.bbox.extents
+        inside = ((anchors_px >= (x0, y0)) & (anchors_px <= (x1, y1))).all(axis=1)  # NaN: outside
+        keep = np.zeros(len(self.texts), bool)
+        keep[inside] = place_labels(boxes_px[inside], self.pinned[inside], self.limit)
+
+        # Paths in points around each anchor, scaled with the dpi the figure is drawn at
+        points_to_pixels = Affine2D().scale(1 / 72) + ax.figure.dpi_scale_trans
+        kept = np.flatnonzero(keep)
+        box_paths = [Path.unit_rectangle().transformed(
+            Affine2D().scale(x1 - x0, y1 - y0).translate(x0, y0)) for x0, y0, x1, y1 in self.boxes[kept]]
+        text_paths = [_text_path(self.texts[i], self.size, LABEL_OFFSET) for i in kept]
+        collections = []
+        for paths, facecolor, alpha in ((box_paths, 'white', self.box_alpha), (text_paths, 'black', 1)):
+            collection = PathCollection(paths, offsets=self.anchors[kept], offset_transform=ax.transData,
+                                        facecolors=facecolor, edgecolors='none', alpha=alpha)
+            collection.set_transform(points_to_pixels)
+            collection.set_figure(ax.figure)
+            collections.append(collection)
+        self._placed = (key, collections, boxes_px[kept])
+        return self._placed[1:]
+
+    # Union of the kept label boxes in display units (empty if none is kept)
+    def get_window_extent(self, renderer=None):
+        if not self.get_visible() or not len(self.texts):
+            return Bbox.null()
+        _, boxes = self._placement(self.axes)
+        if not len(boxes):
+            return Bbox.null()
+        return Bbox([boxes[:, :2].min(axis=0), boxes[:, 2:].max(axis=0)])
+
+    def draw(self, renderer):
+        if not self.get_visible() or not len(self.texts):
+            return
+        collections, _ = self._placement(self.axes)
+        for collection in collections:
+            collection.draw(renderer)
+        self.stale = False
+
+
+# Labels for `communities` added to `ax` as one LabelLayer; returns it (in a list) for removal
+def draw_labels(ax, communities, names=(), rank_field=None, limit=None, box_alpha=0.8,
+                size=LABEL_SIZE, zorder=5):
+    rows, pinned = rank_labels(communities, names, rank_field, limit)
+    if rows.empty:
+        return []
+    layer = LabelLayer([str(name) for name in rows['name']], anchor_points(rows), pinned, limit,
+                       box_alpha, size, zorder)
+    ax.add_artist(layer)
+    return [layer]
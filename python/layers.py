@@ -0,0 +1,233 @@
+# layers.py - Shared layer loader for the Mampong map scripts
+# Each layer is read once, reprojected once and kept as GeoParquet in .layer_cache (next to it),
+# so later runs skip GeoJSON parsing and to_crs entirely.
+# Processed layers can be written as GeoParquet (compact, columnar: only the columns a script asks
+# for are read) or FlatGeobuf (packed Hilbert R-tree, so bbox reads skip the rest of the file),
+# with GeoJSON / shapefile copies as an optional compatibility output (write_layer).
+
+import hashlib
+import json
+import os
+import re
+
+import geopandas as gpd
+from pyproj import CRS
+
+import instrument
+
+try:
+    import pyarrow.parquet as pq  # needed for GeoParquet (cache and processed layers)
+    HAVE_PARQUET = True
+except ImportError:
+    pq = None
+    HAVE_PARQUET = False
+
+# python_webmap folder the map scripts run in; set MAMPONG_DIR to run them on another data set
+PROJECT_DIR = os.environ.get(
+    'MAMPONG_DIR',
+    r"E:\QGIS Tutorial for Beginners & Intermediates\GIS\Healthcare_Accessibility_Mampong\python_webmap")
+
+CACHE_DIR = '.layer_cache'
+
+# Project layers (adjust filenames if different)
+LAYER_FILES = {
+    'boundary': 'mampong_boundary.geojson',
+    'communities1': 'communities distance phase1.geojson',
+    'facilities1': 'health facilities Centeroids.geojson',
+    'communities2': 'communities_distance_phase2.geojson',
+    'facilities2': 'Complete_Healthcare_Facilities_Phase2.geojson',
+    'communities3': 'communities_distance_phase3.geojson',  # Phase 3 proposed (siting.py)
+    'facilities3': 'Healthcare_Facilities_Phase3.geojson',
+    'roads': 'roads.geojson',
+}
+
+# Layers the scripts can run without (an empty GeoDataFrame is returned instead)
+OPTIONAL_LAYERS = {'roads', 'communities3', 'facilities3'}
+
+# Processed copy of a project layer: same name with this extension, read instead of the GeoJSON
+# when it is at least as new (see layer_path)
+PROCESSED_EXT = '.parquet'
+
+# Compatibility copies write_layer can add next to a processed layer (--compat in the scripts)
+COMPAT_FORMATS = ['geojson', 'shp', 'fgb', 'gpkg']
+
+# GADM 4.1 Ghana boundaries (level 0 country, 1 regions, 2 districts), relative to python_webmap
+GADM_DIR = os.path.join('..', 'data_raw', 'gadm41_GHA_shp')
+
+# HOTOSM Ghana health facilities (national points), relative to python_webmap
+HOTOSM_FACILITIES = os.path.join('..', 'data_raw', 'hotosm_gha_health_facilities_points_shp',
+                                 'hotosm_gha_health_facilities_points_shp.shp')
+
+
+# File-name-safe version of a district name
+def safe_name(name):
+    return re.sub(r'[^A-Za-z0-9_-]+', '_', str(name)).strip('_')
+
+
+def processed_path(name, folder=''):
+    return os.path.join(folder, os.path.splitext(LAYER_FILES[name])[0] + PROCESSED_EXT)
+
+
+# File to read for `path` (any layer file): its GeoParquet copy under the same name if that is at
+# least as new (or `path` is gone), else `path` itself
+def newest_copy(path):
+    processed = os.path.splitext(path)[0] + PROCESSED_EXT
+    if processed != path and os.path.exists(processed) and (
+            not os.path.exists(path) or os.path.getmtime(processed) >= os.path.getmtime(path)):
+        return processed
+    return path
+
+
+# File to read for project layer `name` (see newest_copy)
+def layer_path(name, folder=''):
+    return newest_copy(os.path.join(folder, LAYER_FILES[name]))
+
+
+# Write a layer in the format given by its extension: .parquet (GeoParquet, with bbox columns so
+# bbox reads skip row groups), .fgb (FlatGeobuf with its packed R-tree), or anything GDAL writes
+# (.geojson, .shp, .gpkg). compat: extra copies under the same name, e.g. ['geojson', 'shp'];
+# they are written first so `path` stays the newest file (see layer_path)
+def write_layer(gdf, path, compat=()):
+    written = []
+    for fmt in compat or ():
+        copy = f"{os.path.splitext(path)[0]}.{fmt.lstrip('.')}"
+        if copy != path:
+            written += write_layer(gdf, copy)
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.parquet':
+        gdf.to_parquet(path, write_covering_bbox=True)
+    elif ext == '.fgb':
+        gdf.to_file(path, driver='FlatGeobuf', SPATIAL_INDEX='YES')
+    else:
+        gdf.to_file(path)
+    return written + [path]
+
+
+# Geometry column plus those of `columns` present in a GeoParquet file (None: all)
+def _parquet_columns(path, columns):
+    if columns is None:
+        return None
+    schema = pq.read_schema(path)
+    geometry = json.loads(schema.metadata[b'geo'])['primary_column']
+    return [c for c in columns if c in schema.names and c != geometry] + [geometry]
+
+
+# One layer file as is; GeoParquet through pyarrow, every other format through GDAL.
+# columns: attribute columns to read (None: all; missing ones are skipped); bbox in the file's CRS
+def read_source(path, columns=None, bbox=None):
+    if path.lower().endswith('.parquet'):
+        return gpd.read_parquet(path, columns=_parquet_columns(path, columns), bbox=bbox)
+    return gpd.read_file(path, columns=columns, bbox=bbox)
+
+
+# Attribute and geometry column names of a layer file, read from the GeoParquet schema or from
+# the first feature, without loading the layer
+def layer_columns(path):
+    if path.lower().endswith('.parquet'):
+        return pq.read_schema(path).names
+    return list(gpd.read_file(path, rows=1).columns)
+
+
+def crs_key(crs):
+    return CRS.from_user_input(crs).to_string() if crs is not None else 'native'
+
+
+# Short file-name part for a CRS: its authority code (EPSG_32630), or custom_<hash> for a CRS with
+# none (e.g. an ESRI .prj, whose WKT has quotes and brackets and would not fit in a file name)
+def crs_tag(crs):
+    if crs is None:
+        return 'native'
+    authority = CRS.from_user_input(crs).to_authority()
+    if authority:
+        return '_'.join(authority)
+    return 'custom_' + hashlib.sha1(crs_key(crs).encode('utf-8')).hexdigest()[:8]
+
+
+# Cache key: source path + size + mtime + target CRS (+ any extra parameters), so an
+# edited file or a new CRS never picks up a stale copy
+def cache_path(path, crs, ext='.parquet', extra=''):
+    st = os.stat(path)
+    key = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}|{crs_key(crs)}|{extra}"
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(os.path.dirname(path), CACHE_DIR, f"{stem}.{crs_tag(crs)}-{digest}{ext}")
+
+
+def prune_cache(current):
+    # Drop older copies of the same layer/CRS pair left behind by earlier edits of the source
+    stem, ext = os.path.splitext(os.path.basename(current))
+    stem = stem.rsplit('-', 1)[0]
+    folder = os.path.dirname(current)
+    for name in os.listdir(folder):
+        base, name_ext = os.path.splitext(name)
+        if name_ext == ext and base.rsplit('-', 1)[0] == stem and os.path.join(folder, name) != current:
+            try:
+                os.remove(os.path.join(folder, name))
+            except OSError:
+                pass
+
+
+# Layer `path` in `crs` (None: as stored). GeoParquet sources are read directly; other formats
+# go through the reprojected .layer_cache copy, which is always complete so any column subset
+# can be read from it. columns: as read_source; bbox (in the file's CRS) reads bypass the cache.
+def read_layer(path, crs=None, cache=True, columns=None, bbox=None):
+    cache = cache and HAVE_PARQUET and bbox is None and not path.lower().endswith('.parquet')
+    if cache:
+        cached = cache_path(path, crs)
+        if os.path.exists(cached):
+            with instrument.stage('read cache'):
+                return gpd.read_parquet(cached, columns=_parquet_columns(cached, columns))
+
+    with instrument.stage('read'):
+        gdf = read_source(path, None if cache else columns, bbox)
+    if crs is not None and gdf.crs is not None and not gdf.crs.equals(crs):
+        with instrument.stage('reproject'):
+            gdf = gdf.to_crs(crs)
+
+    if cache:
+        with instrument.stage('write cache'):
+            os.makedirs(os.path.dirname(cached), exist_ok=True)
+            tmp_path = f'{cached}.{os.getpid()}.tmp'  # concurrent builds may write the same layer
+            gdf.to_parquet(tmp_path)
+            os.replace(tmp_path, cached)
+            prune_cache(cached)
+        if columns is not None:
+            gdf = gdf[[c for c in columns if c in gdf.columns and c != gdf.geometry.name] + [gdf.geometry.name]]
+    return gdf
+
+
+# Load project layers by name, all projected to the boundary CRS (or to `crs` if given).
+# columns: {layer name: attribute columns to load}, e.g. mapping.map_columns(); others load whole.
+# folder: where the layers are (default: the working directory, i.e. PROJECT_DIR in the map scripts)
+@instrument.timed('load layers')
+def load_layers(names=None, crs=None, cache=True, columns=None, folder=''):
+    names = list(names or LAYER_FILES)
+    columns = columns or {}
+    boundary = read_layer(layer_path('boundary', folder), crs=crs, cache=cache)
+    target_crs = crs if crs is not None else boundary.crs
+
+    loaded = {}
+    for name in names:
+        if name == 'boundary':
+            loaded[name] = boundary
+            continue
+        path = layer_path(name, folder)
+        if name in OPTIONAL_LAYERS and not os.path.exists(path):
+            loaded[name] = gpd.GeoDataFrame()
+            continue
+        loaded[name] = read_layer(path, crs=target_crs, cache=cache, columns=columns.get(name))
+    return loaded
+
+
+# GADM units at `level`, optionally only those whose NAME_<level> or GID_<level> is in `names`.
+# The attribute filter runs inside GDAL, so unmatched features are never parsed.
+def read_gadm(level=2, names=None, gadm_dir=GADM_DIR):
+    path = os.path.join(gadm_dir, f'gadm41_GHA_{level}.shp')
+    if not names:
+        return gpd.read_file(path)
+    quoted = ', '.join("'" + str(n).replace("'", "''") + "'" for n in names)
+    where = f"NAME_{level} IN ({quoted}) OR GID_{level} IN ({quoted})"
+    units = gpd.read_file(path, where=where)
+    if units.empty:
+        raise ValueError(f"No GADM level {level} unit matches {list(names)}")
+    return units
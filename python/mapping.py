@@ -0,0 +1,420 @@
+# mapping.py - Map composition shared by the thematic, comparison and batch scripts
+# The static base (boundary, roads, north arrow, scale bar, info box) is built once per figure
+# from line arrays prepared once per session (BaseLayers); only the community/facility
+# collections, labels, title and legend are swapped per phase.
+
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import matplotlib.image as mimage
+import matplotlib.patches as mpatches
+import matplotlib.pyplot as plt
+import numpy as np
+import shapely
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.lines import Line2D
+from matplotlib_scalebar.scalebar import ScaleBar
+
+import access
+import instrument
+import labels
+import layers
+
+# Communities labelled on the Mampong maps
+SELECTED_NAMES = ['Mampong', 'Daaho', 'Kofiase', 'Anyinasu', 'Asaam', 'Kyeremfaso', 'Ninting', 'Jamasi', 'Agona', 'Banko', 'Nsuta', 'Sekyere Kwamang', 'Abaasua', 'Wiamoase', 'Nyame Bekyere', 'Krobo']
+
+INFO_TEXT = "Author: Lawrence Kofi Amoako\nDate: December 2025\nData Sources: QuickOSM, GADM"
+
+# Heavy layers (roads with more vertices, or more community points, than this) go into the PDF
+# as one image at the save dpi instead of vector paths; text, legend, north arrow and scale bar
+# always stay vector, and PNG output is unaffected. Below the threshold a vector PDF is smaller
+# (markers are stored once and reused), so rasterize=None picks per layer; True / False force it.
+RASTER_MIN_VERTICES = 100_000
+
+
+def _rasterize(rasterize, vertices):
+    return vertices > RASTER_MIN_VERTICES if rasterize is None else rasterize
+
+
+# Standard colors
+ACCESS_COLORS = {
+    'Good Access': 'green',
+    'Moderate Access': 'yellow',
+    'Poor Access': 'red'
+}
+
+# Per-phase map text and facility symbol (add an entry, plus its layers in layers.py, for a new phase)
+PHASE_MAPS = {
+    1: {
+        'layers': ('communities1', 'facilities1'),
+        'title': 'Phase 1 Health Accessibility Mampong (4 Captured Facilities Only)',
+        'panel_title': 'Phase 1: \n(4 Captured Facilities)',
+        'interpretation': (
+            "Phase 1 analysis based on 4 captured facilities only. "
+            "Large areas show poor access especially in rural and peri-urban communities, "
+            "highlighting significant gaps in coverage."
+        ),
+        'facility_size': 180,
+        'facility_width': 4,
+    },
+    2: {
+        'layers': ('communities2', 'facilities2'),
+        'title': 'Phase 2 Health Accessibility Mampong With Additional Facilities Added',
+        'panel_title': 'Phase 2: With Additional Private & CHPS Facilities',
+        'interpretation': (
+            "Phase 2 incorporates additional private clinics and CHPS compounds into the analysis. "
+            "While some communities near these new facilities show modest improvement in accessibility, "
+            "poor access remains dominant across most of the municipality, particularly in rural and peri urbans areas. "
+            "This highlights the need for further targeted interventions to achieve equitable healthcare coverage."
+        ),
+        'facility_size': 100,
+        'facility_width': 2,
+    },
+    3: {
+        'layers': ('communities3', 'facilities3'),
+        'title': 'Phase 3 Health Accessibility Mampong (Proposed New Facilities)',
+        'panel_title': 'Phase 3: Proposed New Facilities',
+        'interpretation': (
+            "Phase 3 adds the proposed facility sites chosen by siting.py to the Phase 2 facilities. "
+            "Sites are placed where they bring the most currently underserved population within reach, "
+            "showing how far targeted new facilities could reduce poor access across the municipality."
+        ),
+        'facility_size': 100,
+        'facility_width': 2,
+    },
+}
+
+
+# Columns the static maps need per layer (layers.load_layers(columns=...)): community names and
+# access classes, geometry only for facilities and roads
+def map_columns(phases, access_mode='euclidean', extra=()):
+    columns = {'roads': []}
+    for phase in phases:
+        communities, facilities = PHASE_MAPS[phase]['layers']
+        columns[communities] = ['name', access.access_field(phase, access_mode), *extra]
+        columns[facilities] = []
+    return columns
+
+
+# Phases whose layers exist in `folder` and whose communities layer has the access field of
+# `access_mode` (access.has_access_field)
+def available_phases(access_mode='euclidean', folder=''):
+    phases = []
+    for phase, style in PHASE_MAPS.items():
+        communities, facilities = style['layers']
+        if os.path.exists(layers.layer_path(facilities, folder)) and \
+                access.has_access_field(communities, phase, access_mode, folder):
+            phases.append(phase)
+    return phases
+
+
+COMPARISON_TITLE = ('Healthcare Accessibility in Mampong Municipality: Phase 1 vs Phase 2 Comparison\n'
+                    '(Phase 1: 4 Captured Facilities)                     (Phase 2: With Additional Private & CHPS Facilities)')
+COMPARISON_CAPTION = (
+    "Left: Phase 1 shows widespread poor access with only 4 captured facilities. "
+    "Right: Phase 2 includes additional private clinics and CHPS compounds, resulting in modest improvements. "
+    "However, rural and peri-urban towns/communities still face significant accessibility challenges."
+)
+
+
+# Color per access level found in the data (anything unrecognised is gray)
+def access_colors(levels):
+    colors = {}
+    for val in levels:
+        if 'good' in str(val).lower():
+            colors[val] = 'green'
+        elif 'moderate' in str(val).lower():
+            colors[val] = 'yellow'
+        elif 'poor' in str(val).lower():
+            colors[val] = 'red'
+        else:
+            colors[val] = 'gray'
+    return colors
+
+
+# Every (Multi)LineString / polygon ring of `geoms` as an (n, 2) vertex array
+def line_arrays(geoms):
+    lines = shapely.get_parts(np.asarray(geoms))
+    coords, index = shapely.get_coordinates(lines, return_index=True)
+    breaks = np.flatnonzero(np.diff(index)) + 1
+    return np.split(coords, breaks) if len(coords) else []
+
+
+# Boundary and road vertex arrays, prepared once and drawn into any number of axes
+class BaseLayers:
+    @instrument.timed('prepare base layers')
+    def __init__(self, boundary, roads):
+        self.boundary_lines = line_arrays(boundary.geometry.boundary.values)
+        self.road_lines = [] if roads.empty else line_arrays(roads.geometry.values)
+        all_xy = np.concatenate(self.boundary_lines + self.road_lines)
+        self.extent = np.array([all_xy.min(axis=0), all_xy.max(axis=0)])
+        # Same aspect rule as GeoDataFrame.plot: stretch latitude for geographic CRSs
+        if boundary.crs is not None and boundary.crs.is_geographic:
+            self.aspect = 1 / np.cos(np.radians(self.extent[:, 1].mean()))
+        else:
+            self.aspect = 'equal'
+
+    def draw(self, ax, rasterize=None):
+        if self.road_lines:
+            with instrument.stage('plot roads'):
+                vertices = sum(len(line) for line in self.road_lines)
+                ax.add_collection(LineCollection(self.road_lines, colors='gray', linewidths=0.8, alpha=0.7,
+                                                 rasterized=_rasterize(rasterize, vertices)))
+        with instrument.stage('plot boundary'):
+            ax.add_collection(LineCollection(self.boundary_lines, colors='black', linewidths=2))
+        ax.set_aspect(self.aspect)
+        ax.autoscale_view()
+
+    # Forget the data limits of removed phase artists so each phase is framed like a fresh plot
+    def reset_limits(self, ax):
+        ax.ignore_existing_data_limits = True
+        ax.update_datalim(self.extent)
+        ax.autoscale_view()
+
+
+# Community points by access level, facility crosses and name labels; returns the artists so the
+# caller can remove them when swapping phases. label_names are always labelled; with label_rank
+# (e.g. 'population') up to label_limit more communities are, largest first, where they fit (labels.py)
+def draw_phase(ax, communities, facilities, access_field, colors=None, facility_size=100,
+               facility_width=2, point_size=40, point_alpha=0.8, point_edge=None,
+               label_names=SELECTED_NAMES, label_alpha=0.8, label_rank=None, label_limit=None,
+               rasterize=None):
+    artists = []
+    if not facilities.empty:
+        with instrument.stage('plot facilities'):
+            fxy = shapely.get_coordinates(shapely.centroid(np.asarray(facilities.geometry.values)))
+            artists.append(ax.scatter(fxy[:, 0], fxy[:, 1], s=facility_size, c='red', marker='+',
+                                      linewidths=facility_width, zorder=3))
+
+    levels = communities[access_field].unique()
+    colors = colors or access_colors(levels)
+    rasterize = _rasterize(rasterize, len(communities))
+    for level, color in colors.items():
+        with instrument.stage('filter by access level'):
+            subset = communities[communities[access_field] == level]
+            if subset.empty:
+                continue
+            xy = shapely.get_coordinates(shapely.centroid(np.asarray(subset.geometry.values)))
+        with instrument.stage('plot communities'):
+            edge = {} if point_edge is None else {'edgecolors': point_edge, 'linewidths': 0.5}
+            artists.append(ax.scatter(xy[:, 0], xy[:, 1], s=point_size, c=color, alpha=point_alpha,
+                                      zorder=4, rasterized=rasterize, **edge))
+
+    with instrument.stage('annotate'):
+        artists += labels.draw_labels(ax, communities, label_names, label_rank, label_limit, box_alpha=label_alpha)
+    return artists
+
+
+def legend_elements(facility_width=2, boundary_label='Mampong Boundary'):
+    return [
+        Line2D([0], [0], color='gray', lw=1, label='Roads'),
+        mpatches.Patch(color='green', label='Good Access'),
+        mpatches.Patch(color='yellow', label='Moderate Access'),
+        mpatches.Patch(color='red', label='Poor Access'),
+        Line2D([0], [0], marker='o', color='w', markerfacecolor='black', markersize=8, label='Communities'),
+        Line2D([0], [0], marker='+', color='red', lw=facility_width, markersize=facility_width * 2 + 8, label='Healthcare Facilities'),
+        mpatches.Patch(facecolor='none', edgecolor='black', label=boundary_label)
+    ]
+
+
+# Single-phase 12x12 in thematic map; call show_phase() for each phase and save() after each
+class ThematicMap:
+    @instrument.timed('figure setup')
+    def __init__(self, base, boundary_label='Mampong Boundary', rasterize=None):
+        self.base = base
+        self.boundary_label = boundary_label
+        self.rasterize = rasterize
+        self.fig, self.ax = plt.subplots(figsize=(12, 12))
+        ax = self.ax
+        base.draw(ax, rasterize)
+
+        # North arrow
+        ax.annotate('N', xy=(0.95, 0.95), xycoords='axes fraction', fontsize=14, ha='center', va='center')
+        ax.arrow(0.95, 0.92, 0, 0.03, head_width=0.015, head_length=0.03, fc='black', ec='black', transform=ax.transAxes)
+
+        # Scale bar (under the map)
+        ax.add_artist(ScaleBar(1, location='lower center', box_alpha=0.8, length_fraction=0.2))
+
+        # Author, date, sources (bottom left)
+        ax.text(0.02, 0.02, INFO_TEXT, transform=ax.transAxes, fontsize=9, va='bottom',
+                bbox=dict(facecolor='white', alpha=0.9, edgecolor='black', boxstyle='round,pad=0.5'))
+        ax.set_axis_off()
+        self._phase_artists = []
+
+    @instrument.timed('draw phase')
+    def show_phase(self, communities, facilities, access_field, title, interpretation,
+                   facility_size=100, facility_width=2, label_names=SELECTED_NAMES, label_rank=None,
+                   label_limit=None):
+        for artist in self._phase_artists:
+            artist.remove()
+        ax = self.ax
+        self.base.reset_limits(ax)
+        self._phase_artists = draw_phase(ax, communities, facilities, access_field,
+                                         facility_size=facility_size, facility_width=facility_width,
+                                         label_names=label_names, label_rank=label_rank,
+                                         label_limit=label_limit, rasterize=self.rasterize)
+        ax.set_title(title, fontsize=16, pad=30)
+
+        # Legend (upper left - red plus (+) for facilities); replaces the previous phase's legend
+        ax.legend(handles=legend_elements(facility_width, self.boundary_label), loc='upper left',
+                  fontsize=10, title='Legend', framealpha=0.9)
+
+        # Short map interpretation (centered under map)
+        self._phase_artists.append(self.fig.text(
+            0.5, 0.04, interpretation, ha='center', va='center', fontsize=10, wrap=True,
+            bbox=dict(facecolor='white', alpha=0.95, edgecolor='gray', boxstyle='round,pad=1')))
+
+        # Clean layout
+        with instrument.stage('layout'):
+            self.fig.tight_layout(rect=[0, 0.07, 1, 0.95])
+        return self
+
+    @instrument.timed('save')
+    def save(self, basename, dpi=300):
+        save_map(self.fig, basename, dpi=dpi)
+
+    def close(self):
+        plt.close(self.fig)
+
+
+# Side-by-side Phase 1 / Phase 2 figure sharing one BaseLayers
+class ComparisonMap:
+    @instrument.timed('figure setup')
+    def __init__(self, base, title=COMPARISON_TITLE, caption=COMPARISON_CAPTION, panels=2,
+                 rasterize=None):
+        self.base = base
+        self.rasterize = rasterize
+        self.fig = plt.figure(figsize=(10 * panels, 10))
+        gs = self.fig.add_gridspec(1, panels, wspace=0.1, hspace=0)
+        self.axes = [self.fig.add_subplot(gs[0, i]) for i in range(panels)]
+        for ax in self.axes:
+            base.draw(ax, rasterize)
+            ax.set_axis_off()
+        self._phase_artists = [[] for _ in self.axes]
+
+        fig = self.fig
+        fig.suptitle(title, fontsize=18, fontweight='bold', y=1.02)
+
+        # Shared legend
+        fig.legend(handles=legend_elements(facility_width=3), loc='lower center', ncol=7, fontsize=11,
+                   frameon=True, fancybox=True, shadow=True, bbox_to_anchor=(0.5, 0.02))
+
+        # Author, date, sources
+        fig.text(0.01, 0.01, INFO_TEXT.replace('\n', ' | '), fontsize=10, ha='left', va='bottom',
+                 bbox=dict(facecolor='white', alpha=0.9, edgecolor='gray'))
+
+        # Caption
+        fig.text(0.5, 0.08, caption, ha='center', va='center', fontsize=11, wrap=True,
+                 bbox=dict(facecolor='white', alpha=0.95, edgecolor='gray', boxstyle='round,pad=1'))
+
+    @instrument.timed('draw phase')
+    def show_phase(self, panel, communities, facilities, access_field, title, label_names=SELECTED_NAMES,
+                   label_rank=None, label_limit=None):
+        for artist in self._phase_artists[panel]:
+            artist.remove()
+        ax = self.axes[panel]
+        self.base.reset_limits(ax)
+        self._phase_artists[panel] = draw_phase(
+            ax, communities, facilities, access_field, colors=ACCESS_COLORS,
+            facility_size=140, facility_width=3, point_size=45, point_alpha=0.9, point_edge='black',
+            label_names=label_names, label_alpha=0.85, label_rank=label_rank, label_limit=label_limit,
+            rasterize=self.rasterize)
+        ax.set_title(title, fontsize=16, fontweight='bold', pad=20)
+        return self
+
+    @instrument.timed('save')
+    def save(self, basename, dpi=300):
+        with instrument.stage('layout'):
+            self.fig.tight_layout(rect=[0, 0.12, 1, 0.95])
+        save_map(self.fig, basename, dpi=dpi)
+
+    def close(self):
+        plt.close(self.fig)
+
+
+# One-shot thematic map (used by batch_render.py for one district per figure)
+def draw_thematic_map(boundary, communities, facilities, roads, access_field, title, interpretation,
+                      facility_size=100, facility_width=2, boundary_label='Mampong Boundary',
+                      label_names=SELECTED_NAMES, label_rank=None, label_limit=None,
+                      rasterize=None):
+    thematic = ThematicMap(BaseLayers(boundary, roads), boundary_label=boundary_label, rasterize=rasterize)
+    thematic.show_phase(communities, facilities, access_field, title, interpretation,
+                        facility_size=facility_size, facility_width=facility_width, label_names=label_names,
+                        label_rank=label_rank, label_limit=label_limit)
+    return thematic.fig
+
+
+# Project layers for `phases` (boundary, roads and each phase's communities/facilities), only the
+# columns the maps show
+def load_phase_layers(phases, access_mode='euclidean'):
+    names = ['boundary', 'roads', *(name for phase in phases for name in PHASE_MAPS[phase]['layers'])]
+    return layers.load_layers(names, columns=map_columns(phases, access_mode))
+
+
+# Thematic map of one project phase saved as <out>.png/.pdf (default Thematic_Map<phase>).
+# data: layers from load_phase_layers (loaded here if None); thematic: a ThematicMap to draw into
+# and keep open for the next phase (a new one is made and closed if None). Returns the layers.
+def build_thematic(phase, access_mode='euclidean', out=None, dpi=300, data=None, thematic=None):
+    style = PHASE_MAPS[phase]
+    data = data if data is not None else load_phase_layers([phase], access_mode)
+    communities, facilities = (data[name] for name in style['layers'])
+    figure = thematic or ThematicMap(BaseLayers(data['boundary'], data['roads']))
+    figure.show_phase(communities, facilities, access.access_field(phase, access_mode),
+                      style['title'], style['interpretation'],
+                      facility_size=style['facility_size'], facility_width=style['facility_width'])
+    figure.save(out or f'Thematic_Map{phase}', dpi=dpi)
+    if thematic is None:
+        figure.close()
+    return data
+
+
+# Side-by-side map of two project phases saved as <out>.png/.pdf. data as in build_thematic;
+# base: BaseLayers already prepared from data (made here if None). Returns the layers.
+def build_comparison(phases=(1, 2), access_mode='euclidean', out='Comparison_Map', dpi=300, data=None,
+                     base=None):
+    data = data if data is not None else load_phase_layers(phases, access_mode)
+    comparison = ComparisonMap(base or BaseLayers(data['boundary'], data['roads']), panels=len(phases))
+    for panel, phase in enumerate(phases):
+        communities, facilities = (data[name] for name in PHASE_MAPS[phase]['layers'])
+        comparison.show_phase(panel, communities, facilities, access.access_field(phase, access_mode),
+                              PHASE_MAPS[phase]['panel_title'])
+    comparison.save(out, dpi=dpi)
+    comparison.close()
+    return data
+
+
+# Save PNG and PDF next to each other, e.g. save_map(fig, 'Thematic_Map1')
+# The tight bounding box is measured once from a layout pass that draws nothing. The PNG pixels
+# then come from a single Agg render into that box (also covering drawing outside the figure, e.g.
+# a title above it), and are compressed on a second thread while the PDF is drawn into the same box.
+def save_map(fig, basename, dpi=300, pad_inches=0.1):
+    canvas, figure_dpi = fig.canvas, fig.dpi
+    try:
+        with instrument.stage('measure'):
+            fig.dpi = dpi
+            fig.draw_without_rendering()
+            bbox = fig.get_tightbbox(FigureCanvasAgg(fig).get_renderer()).padded(pad_inches)
+    finally:
+        fig.dpi = figure_dpi
+        fig.set_canvas(canvas)
+
+    with instrument.stage('render'):
+        raw = io.BytesIO()
+        fig.savefig(raw, format='rgba', dpi=dpi, bbox_inches=bbox)
+        width, height = int(bbox.width * dpi), int(bbox.height * dpi)  # Agg truncates the canvas size
+        pixels = np.frombuffer(raw.getbuffer(), np.uint8)
+        pixels = pixels.reshape(height, width, 4) if pixels.size == width * height * 4 else None
+
+    with ThreadPoolExecutor(1) as pool:
+        if pixels is not None:
+            png = pool.submit(mimage.imsave, f'{basename}.png', pixels, dpi=dpi)
+        else:
+            with instrument.stage('savefig png'):
+                fig.savefig(f'{basename}.png', dpi=dpi, bbox_inches=bbox)
+        with instrument.stage('savefig pdf'):
+            fig.savefig(f'{basename}.pdf', dpi=dpi, bbox_inches=bbox)
+        if pixels is not None:
+            with instrument.stage('write png'):
+                png.result()
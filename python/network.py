@@ -0,0 +1,305 @@
+# network.py - Road-network accessibility (travel distance/time along roads.geojson)
+# The roads layer is turned into a CSR graph once and cached as .npz in .layer_cache.
+# A single Dijkstra from a virtual source joined to all facilities then gives every
+# community its network distance/time in one pass. Writes Net_dist (m), Net_time (min), Net_hub and
+# Acces_net<phase>, a drop-in alternative to Acces_lvl<phase> for the map scripts.
+#
+# Example:
+#   python network.py roads.geojson "communities_distance_phase2.geojson" ^
+#       Complete_Healthcare_Facilities_Phase2.geojson --phase 2 -o communities_distance_phase2.geojson
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import shapely
+from scipy.sparse import coo_matrix, csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+
+import access
+import layers
+
+# Typical speeds (km/h) by OSM highway class; anything else uses DEFAULT_SPEED
+ROAD_SPEEDS = {
+    'motorway': 80, 'trunk': 70, 'primary': 60, 'secondary': 50, 'tertiary': 40,
+    'unclassified': 30, 'residential': 25, 'living_street': 15, 'service': 20,
+    'track': 15, 'path': 5, 'footway': 5, 'pedestrian': 5, 'steps': 3,
+}
+DEFAULT_SPEED = 30
+WALK_SPEED = 5  # used for the off-road leg from a community/facility to the nearest road node
+SNAP_TOLERANCE = 1.0  # metres; vertices closer than this become the same graph node
+MAX_DENSE = 20_000_000  # largest dense Dijkstra result (facilities x nodes) held at once
+
+
+class RoadGraph:
+    def __init__(self, indptr, indices, length, minutes, node_xy, crs):
+        self.node_xy = node_xy
+        self.crs = crs
+        n = len(node_xy)
+        self.length = csr_matrix((length, indices, indptr), shape=(n, n))
+        self.minutes = csr_matrix((minutes, indices, indptr), shape=(n, n))
+        self._tree = None
+
+    @property
+    def tree(self):
+        if self._tree is None:
+            self._tree = cKDTree(self.node_xy)
+        return self._tree
+
+    def save(self, path):
+        np.savez_compressed(path, indptr=self.length.indptr, indices=self.length.indices,
+                            length=self.length.data, minutes=self.minutes.data,
+                            node_xy=self.node_xy, crs=np.array(self.crs))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as npz:
+            return cls(npz['indptr'], npz['indices'], npz['length'], npz['minutes'],
+                       npz['node_xy'], str(npz['crs']))
+
+
+# Build the routable graph: every consecutive vertex pair of every road is an edge in both
+# directions (oneway tags are ignored), parallel edges keep the fastest one
+def build_graph(roads, crs=access.METRIC_CRS, speeds=ROAD_SPEEDS, tolerance=SNAP_TOLERANCE):
+    roads = roads[roads.geometry.notna()].to_crs(crs).explode(index_parts=False)
+    lines = np.asarray(roads.geometry.values)
+    if 'highway' in roads.columns:
+        kmh = roads['highway'].map(speeds).fillna(DEFAULT_SPEED).to_numpy(dtype=float)
+    else:
+        kmh = np.full(len(lines), float(DEFAULT_SPEED))
+
+    coords, line_idx = shapely.get_coordinates(lines, return_index=True)
+    keys = np.round(coords / tolerance).astype(np.int64)
+    keys, node_of, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+    node_of = node_of.ravel()
+    # Node position = mean of the vertices snapped into it
+    node_xy = np.zeros((len(keys), 2))
+    np.add.at(node_xy, node_of, coords)
+    node_xy /= counts[:, None]
+
+    same_line = line_idx[1:] == line_idx[:-1]
+    u = node_of[:-1][same_line]
+    v = node_of[1:][same_line]
+    seg_len = np.hypot(*(coords[1:][same_line] - coords[:-1][same_line]).T)
+    seg_min = seg_len / (kmh[line_idx[1:][same_line]] * 1000 / 60)
+
+    keep = u != v
+    u, v, seg_len, seg_min = u[keep], v[keep], seg_len[keep], seg_min[keep]
+    u, v = np.concatenate([u, v]), np.concatenate([v, u])
+    seg_len, seg_min = np.concatenate([seg_len, seg_len]), np.concatenate([seg_min, seg_min])
+
+    order = np.lexsort((seg_min, v, u))
+    u, v, seg_len, seg_min = u[order], v[order], seg_len[order], seg_min[order]
+    first = np.ones(len(u), dtype=bool)
+    first[1:] = (u[1:] != u[:-1]) | (v[1:] != v[:-1])
+    u, v, seg_len, seg_min = u[first], v[first], seg_len[first], seg_min[first]
+
+    indptr = np.zeros(len(node_xy) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(u, minlength=len(node_xy)), out=indptr[1:])
+    return RoadGraph(indptr, v.astype(np.int32), seg_len, seg_min, node_xy, crs)
+
+
+# Load the graph for a roads file (or its newer .parquet copy) from .layer_cache, building and
+# saving it on first use from the cached, reprojected roads layer
+def load_graph(roads_path, crs=access.METRIC_CRS, speeds=ROAD_SPEEDS):
+    roads_path = layers.newest_copy(roads_path)
+    extra = json.dumps([speeds, DEFAULT_SPEED, SNAP_TOLERANCE], sort_keys=True)
+    cached = layers.cache_path(roads_path, crs, ext='.npz', extra=extra)
+    if os.path.exists(cached):
+        return RoadGraph.load(cached)
+
+    graph = build_graph(layers.read_layer(roads_path, crs=crs, columns=['highway']), crs=crs, speeds=speeds)
+    os.makedirs(os.path.dirname(cached), exist_ok=True)
+    tmp_path = f'{cached}.{os.getpid()}.tmp'  # concurrent builds may write the same graph
+    with open(tmp_path, 'wb') as f:  # a file object, so numpy does not append .npz to the name
+        graph.save(f)
+    os.replace(tmp_path, cached)
+    layers.prune_cache(cached)
+    return graph
+
+
+# Sum a second edge weight along the shortest-path tree (pred from dijkstra) by pointer
+# jumping, so distance and time describe the same route without another Dijkstra pass
+def path_totals(weights, pred):
+    total = np.zeros(len(pred))
+    nodes = np.flatnonzero(pred >= 0)
+    total[nodes] = np.asarray(weights[pred[nodes], nodes]).ravel()
+    ptr = np.where(pred >= 0, pred, -1)
+    active = nodes
+    while len(active):
+        up = ptr[active]
+        total[active] += total[up]
+        ptr[active] = ptr[up]
+        active = active[ptr[active] >= 0]
+    return total
+
+
+# Copy of `matrix` with one extra node (the last index) that has an edge of the given weight
+# to each of `nodes`, so a single Dijkstra from it starts every source with its own offset
+def with_super_source(matrix, nodes, weights):
+    n = matrix.shape[0]
+    indptr = np.append(matrix.indptr, matrix.indptr[-1] + len(nodes))
+    indices = np.concatenate([matrix.indices, np.asarray(nodes, dtype=matrix.indices.dtype)])
+    data = np.concatenate([matrix.data, np.asarray(weights, dtype=float)])
+    return csr_matrix((data, indices, indptr), shape=(n + 1, n + 1))
+
+
+# For every node of a shortest-path tree rooted at `root`, the node just below the root on
+# its path (pointer jumping over pred); -1 for the root itself and unreached nodes
+def branch_of(pred, root):
+    branch = np.where(pred == root, np.arange(len(pred)), -1)
+    ptr = np.where((pred >= 0) & (pred != root), pred, -1)
+    active = np.flatnonzero(ptr >= 0)
+    while len(active):
+        up = ptr[active]
+        done = ptr[up] < 0
+        branch[active[done]] = branch[up[done]]
+        ptr[active[~done]] = ptr[up[~done]]
+        active = active[~done]
+    return branch
+
+
+# Network distance (m), time (min) and nearest facility position for every community.
+# weight is 'minutes' (fastest route) or 'length' (shortest route). Each facility's off-road
+# leg is an edge from a virtual super-source to its road node, so it counts when choosing.
+def network_access(graph, communities, facilities, weight='minutes'):
+    fx, fy = access.metric_xy(facilities, graph.crs)
+    cx, cy = access.metric_xy(communities, graph.crs)
+    n_com = len(cx)
+    result_dist = np.full(n_com, np.nan)
+    result_min = np.full(n_com, np.nan)
+    result_fac = np.full(n_com, -1, dtype=np.int64)
+
+    fac_ok = np.flatnonzero(~np.isnan(fx))
+    com_ok = np.flatnonzero(~np.isnan(cx))
+    if len(fac_ok) == 0 or len(com_ok) == 0 or len(graph.node_xy) == 0:
+        return result_dist, result_min, result_fac
+
+    # Snap to road nodes; the off-road leg is walked
+    fac_snap, fac_node = graph.tree.query(np.column_stack([fx[fac_ok], fy[fac_ok]]), workers=-1)
+    com_snap, com_node = graph.tree.query(np.column_stack([cx[com_ok], cy[com_ok]]), workers=-1)
+
+    # Several facilities on one node: keep the one closest to the road
+    order = np.lexsort((fac_snap, fac_node))
+    fac_node, fac_snap, fac_pos = fac_node[order], fac_snap[order], fac_ok[order]
+    first = np.ones(len(fac_node), dtype=bool)
+    first[1:] = fac_node[1:] != fac_node[:-1]
+    source_nodes, source_snap, source_fac = fac_node[first], fac_snap[first], fac_pos[first]
+
+    walk_min = 60 / (WALK_SPEED * 1000)
+    snap_len, snap_min = source_snap, source_snap * walk_min
+    if weight == 'minutes':
+        primary = with_super_source(graph.minutes, source_nodes, snap_min)
+        secondary = with_super_source(graph.length, source_nodes, snap_len)
+    else:
+        primary = with_super_source(graph.length, source_nodes, snap_len)
+        secondary = with_super_source(graph.minutes, source_nodes, snap_min)
+    root = primary.shape[0] - 1
+    best, pred = dijkstra(primary, directed=True, indices=root, return_predecessors=True)
+    other = path_totals(secondary, pred)
+    dist_len, dist_min = (other, best) if weight == 'minutes' else (best, other)
+
+    src = branch_of(pred, root)[com_node]
+    reached = src >= 0
+    lookup = np.searchsorted(source_nodes, src[reached])
+
+    idx = com_ok[reached]
+    snap_m = com_snap[reached]
+    result_dist[idx] = dist_len[com_node[reached]] + snap_m
+    result_min[idx] = dist_min[com_node[reached]] + snap_m * walk_min
+    result_fac[idx] = source_fac[lookup]
+    return result_dist, result_min, result_fac
+
+
+# Sparse matrix (CSR, facilities x communities) of road distances in metres, snap legs included,
+# for pairs within `cutoff`. Dijkstra runs from a block of facilities at a time with limit=cutoff,
+# so the dense (block x nodes) result stays around MAX_DENSE values.
+def facility_distances(graph, communities, facilities, cutoff):
+    fx, fy = access.metric_xy(facilities, graph.crs)
+    cx, cy = access.metric_xy(communities, graph.crs)
+    shape = (len(fx), len(cx))
+    fac_ok = np.flatnonzero(~np.isnan(fx))
+    com_ok = np.flatnonzero(~np.isnan(cx))
+    if len(fac_ok) == 0 or len(com_ok) == 0 or len(graph.node_xy) == 0:
+        return csr_matrix(shape)
+
+    fac_snap, fac_node = graph.tree.query(np.column_stack([fx[fac_ok], fy[fac_ok]]), workers=-1)
+    com_snap, com_node = graph.tree.query(np.column_stack([cx[com_ok], cy[com_ok]]), workers=-1)
+
+    # Communities grouped by road node: node_ptr[n]:node_ptr[n + 1] indexes by_node
+    by_node = np.argsort(com_node, kind='stable')
+    node_ptr = np.zeros(len(graph.node_xy) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(com_node, minlength=len(graph.node_xy)), out=node_ptr[1:])
+
+    block = max(1, MAX_DENSE // len(graph.node_xy))
+    rows, cols, data = [], [], []
+    for start in range(0, len(fac_ok), block):
+        stop = min(start + block, len(fac_ok))
+        dist = dijkstra(graph.length, directed=True, indices=fac_node[start:stop], limit=cutoff)
+        dist += fac_snap[start:stop, None]
+        f, node = np.nonzero(dist <= cutoff)
+        # Expand each reached node to the communities snapped to it
+        counts = node_ptr[node + 1] - node_ptr[node]
+        f, node = np.repeat(f, counts), np.repeat(node, counts)
+        offset = np.arange(len(node)) - np.repeat(np.cumsum(counts) - counts, counts)
+        com = by_node[node_ptr[node] + offset]
+        total = dist[f, node] + com_snap[com]
+        keep = total <= cutoff
+        rows.append(fac_ok[start + f[keep]])
+        cols.append(com_ok[com[keep]])
+        data.append(total[keep])
+    return coo_matrix((np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))), shape=shape).tocsr()
+
+
+def network_field(phase):
+    return access.access_field(phase, mode='network')
+
+
+# Add Net_dist, Net_time, Net_hub and Acces_net<phase> to a copy of `communities`
+def compute_network_access(graph, communities, facilities, phase, name_field='name', weight='minutes'):
+    dist, minutes, nearest = network_access(graph, communities, facilities, weight=weight)
+
+    result = communities.copy()
+    result['Net_hub'] = access.hub_names(facilities, nearest, name_field)
+    result['Net_dist'] = np.round(dist, 1)
+    result['Net_time'] = np.round(minutes, 1)
+    result[network_field(phase)] = access.classify_distance(dist)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Road-network distance/time and access class per community')
+    parser.add_argument('roads', help='roads layer (LineStrings, optional "highway" field for speeds)')
+    parser.add_argument('communities', help='communities layer')
+    parser.add_argument('facilities', help='facilities layer')
+    parser.add_argument('--phase', default='2', help='phase number used in the Acces_net field name')
+    parser.add_argument('--name-field', default='name', help='facility field copied into Net_hub')
+    parser.add_argument('--weight', choices=['minutes', 'length'], default='minutes',
+                        help='pick the nearest facility by travel time (default) or road distance')
+    parser.add_argument('-o', '--output', required=True, help='output layer')
+    parser.add_argument('--compat', nargs='+', choices=layers.COMPAT_FORMATS, default=[],
+                        help='also write these formats under the output name, e.g. geojson shp')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    graph = load_graph(args.roads)
+    graph_ready = time.perf_counter()
+    communities = layers.read_layer(args.communities, cache=False)
+    facilities = layers.read_layer(args.facilities, cache=False)
+    result = compute_network_access(graph, communities, facilities, args.phase,
+                                    name_field=args.name_field, weight=args.weight)
+    done = time.perf_counter()
+
+    layers.write_layer(result, args.output, args.compat)
+    field = network_field(args.phase)
+    print(f"Graph: {len(graph.node_xy)} nodes, {graph.length.nnz} edges ({graph_ready - start:.2f}s)")
+    print(f"{len(result)} communities routed in {done - graph_ready:.2f}s")
+    print(f"{field} counts:", result[field].value_counts().to_dict())
+    print(f"Saved {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+# pipeline.py - Build the thematic maps, the comparison map and the web map in one headless run
+# Each target's inputs (project layers, the code that draws it) are hashed by content and stored
+# with its parameters in <out-dir>/.pipeline_state.json. On the next run only targets whose inputs
+# or parameters changed, or whose outputs are missing, are rebuilt (make-style), and those run
+# concurrently, one process each. Editing one Phase 2 facility rebuilds Thematic_Map2, the
+# comparison map and the web map; Thematic_Map1 is left alone.
+# File hashes are kept with the file's size and mtime, so unchanged files are not read again.
+#
+# Examples:
+#   python pipeline.py                                       (everything, in layers.PROJECT_DIR)
+#   python pipeline.py --data-dir D:\mampong\python_webmap --out-dir D:\mampong\maps network
+#   python pipeline.py thematic2 webmap --scalable -j 2
+#   python pipeline.py -n                                    (list what is out of date, build nothing)
+
+import argparse
+import hashlib
+import io
+import json
+import multiprocessing as mp
+import os
+import runpy
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+
+import matplotlib
+matplotlib.use('Agg')
+
+import access
+import layers
+import mapping
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE = '.pipeline_state.json'
+
+# Code each kind of target is drawn by: an edit here rebuilds the target too
+MAP_CODE = ['mapping.py', 'labels.py', 'layers.py', 'access.py', 'instrument.py']
+WEBMAP_CODE = ['Webmap.py', 'geojson_stream.py', 'layers.py', 'access.py', 'instrument.py', 'serve.py']
+
+WEBMAP_OUTPUT = 'Interactive_Comparison_Map.html'
+
+
+# Targets available in data_dir: name -> {'layers', 'code', 'outputs', 'params'}
+def pipeline_targets(data_dir, access_mode='euclidean', dpi=300, scalable=False):
+    phases = mapping.available_phases(access_mode, data_dir)
+    targets = {}
+    for phase in phases:
+        targets[f'thematic{phase}'] = {
+            'layers': ['boundary', 'roads', *mapping.PHASE_MAPS[phase]['layers']],
+            'code': MAP_CODE,
+            'outputs': [f'Thematic_Map{phase}.png', f'Thematic_Map{phase}.pdf'],
+            'params': {'phase': phase, 'access_mode': access_mode, 'dpi': dpi},
+        }
+    if 1 in phases and 2 in phases:
+        phase_layers = [*mapping.PHASE_MAPS[1]['layers'], *mapping.PHASE_MAPS[2]['layers']]
+        targets['comparison'] = {
+            'layers': ['boundary', 'roads', *phase_layers],
+            'code': MAP_CODE,
+            'outputs': ['Comparison_Map.png', 'Comparison_Map.pdf'],
+            'params': {'access_mode': access_mode, 'dpi': dpi},
+        }
+        targets['webmap'] = {
+            'layers': ['boundary', 'roads', *phase_layers],
+            'code': WEBMAP_CODE,
+            'outputs': [WEBMAP_OUTPUT],
+            'params': {'access_mode': access_mode, 'scalable': scalable},
+        }
+    return targets
+
+
+# SHA-256 of a file's content, reused from `known` while its size and mtime are unchanged
+def file_digest(path, known):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return 'missing'
+    key = os.path.abspath(path)
+    entry = known.get(key)
+    if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+        return entry[2]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    known[key] = [st.st_size, st.st_mtime_ns, digest.hexdigest()]
+    return known[key][2]
+
+
+# Everything a target's outputs depend on, as {input name: digest}
+def target_inputs(target, data_dir, known):
+    inputs = {name: file_digest(layers.layer_path(name, data_dir), known) for name in target['layers']}
+    inputs.update({name: file_digest(os.path.join(SCRIPT_DIR, name), known) for name in target['code']})
+    inputs['params'] = hashlib.sha256(json.dumps(target['params'], sort_keys=True).encode()).hexdigest()
+    return inputs
+
+
+# Why `name` has to be rebuilt (empty list: up to date)
+def stale_reasons(name, target, inputs, state, out_dir):
+    built = state['targets'].get(name)
+    if built is None:
+        return ['never built']
+    reasons = [f'{key} changed' for key, digest in inputs.items() if built.get(key) != digest]
+    reasons += [f'{output} missing' for output in target['outputs']
+                if not os.path.exists(os.path.join(out_dir, output))]
+    return reasons
+
+
+def load_state(out_dir):
+    try:
+        with open(os.path.join(out_dir, STATE_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'files': {}, 'targets': {}}
+
+
+def save_state(state, out_dir):
+    path = os.path.join(out_dir, STATE_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=1)
+    os.replace(path + '.tmp', path)
+
+
+def _build_webmap(out_dir, access_mode, scalable):
+    sys.argv = ['Webmap.py', access_mode, '-o', os.path.join(out_dir, WEBMAP_OUTPUT)]
+    if scalable:
+        sys.argv.append('--scalable')
+    runpy.run_path(os.path.join(SCRIPT_DIR, 'Webmap.py'), run_name='__main__')
+
+
+# One target in its own process: returns (seconds, captured output)
+def build_target(name, params, data_dir, out_dir):
+    layers.PROJECT_DIR = data_dir
+    os.chdir(data_dir)
+    start = time.perf_counter()
+    log = io.StringIO()
+    with redirect_stdout(log):
+        if name.startswith('thematic'):
+            mapping.build_thematic(params['phase'], params['access_mode'],
+                                   os.path.join(out_dir, f"Thematic_Map{params['phase']}"), params['dpi'])
+        elif name == 'comparison':
+            mapping.build_comparison((1, 2), params['access_mode'], os.path.join(out_dir, 'Comparison_Map'),
+                                     params['dpi'])
+        else:
+            _build_webmap(out_dir, params['access_mode'], params['scalable'])
+    return time.perf_counter() - start, log.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild the out-of-date maps')
+    parser.add_argument('targets', nargs='*',
+                        help='targets to consider (thematic1, thematic2, ..., comparison, webmap; '
+                             'default all); an access mode given here sets --mode')
+    parser.add_argument('--mode', default='euclidean', choices=list(access.ACCESS_MODES),
+                        help="straight-line 'euclidean' (default), road 'network' or 'fca' access")
+    parser.add_argument('--data-dir', default=layers.PROJECT_DIR, help='folder with the project layers')
+    parser.add_argument('--out-dir', help='folder for the maps (default: --data-dir)')
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--scalable', action='store_true', help='compact web map for large feature counts')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='targets built at once')
+    parser.add_argument('-f', '--force', action='store_true', help='rebuild even if up to date')
+    parser.add_argument('-n', '--dry-run', action='store_true', help='only list what would be rebuilt')
+    parser.add_argument('-v', '--verbose', action='store_true', help="print each target's own output")
+    args = parser.parse_args()
+
+    # Same positional access mode as the map scripts, e.g. python pipeline.py network
+    modes = [t for t in args.targets if t in access.ACCESS_MODES]
+    if modes:
+        args.mode = modes[-1]
+    data_dir = os.path.abspath(args.data_dir)
+    out_dir = os.path.abspath(args.out_dir or data_dir)
+    os.makedirs(out_dir, exist_ok=True)
+
+    targets = pipeline_targets(data_dir, args.mode, args.dpi, args.scalable)
+    wanted = [t for t in args.targets if t not in access.ACCESS_MODES] or list(targets)
+    unknown = [t for t in wanted if t not in targets]
+    if unknown:
+        parser.error(f"unknown or unavailable target(s) {unknown}; available in {data_dir}: {list(targets)}")
+
+    state = load_state(out_dir)
+    todo = {}
+    for name in wanted:
+        inputs = target_inputs(targets[name], data_dir, state['files'])
+        reasons = ['forced'] if args.force else stale_reasons(name, targets[name], inputs, state, out_dir)
+        if reasons:
+            todo[name] = inputs
+            print(f"{name:<12} out of date: {', '.join(reasons)}")
+        else:
+            print(f"{name:<12} up to date")
+    if args.dry_run or not todo:
+        save_state(state, out_dir)  # keeps the file hashes for the next run
+        return
+
+    start = time.perf_counter()
+    failed = []
+    context = mp.get_context('spawn')
+    with ProcessPoolExecutor(max(1, min(args.jobs, len(todo))), mp_context=context) as pool:
+        futures = {pool.submit(build_target, name, targets[name]['params'], data_dir, out_dir): name
+                   for name in todo}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                seconds, log = future.result()
+            except Exception as exc:
+                failed.append(name)
+                print(f"{name:<12} FAILED ({type(exc).__name__}: {exc})")
+                continue
+            if args.verbose:
+                print(log, end='')
+            print(f"{name:<12} built in {seconds:.1f}s: {', '.join(targets[name]['outputs'])}")
+            # Recorded as soon as it is built, so an interrupted run keeps what finished
+            state['targets'][name] = todo[name]
+            save_state(state, out_dir)
+
+    print(f"{len(todo) - len(failed)} of {len(todo)} targets built in {time.perf_counter() - start:.1f}s "
+          f"({len(wanted) - len(todo)} up to date), outputs in {out_dir}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
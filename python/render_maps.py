@@ -0,0 +1,44 @@
+# render_maps.py - All thematic maps plus the comparison map in one render session
+# Layers are loaded once and the base layers (boundary, roads) prepared once; one thematic
+# figure is reused for every phase in mapping.PHASE_MAPS by swapping only its community and
+# facility layers. Run in OSGeo4W Shell after cd to python_webmap folder:
+#   python render_maps.py            (straight-line access)
+#   python render_maps.py network    (road-network access from network.py)
+
+import os
+import sys
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+
+import instrument
+import layers
+import mapping
+
+os.chdir(layers.PROJECT_DIR)
+instrument.start_run()  # stage timings, printed at the end (see instrument.py)
+
+access_mode = sys.argv[1] if len(sys.argv) > 1 else 'euclidean'
+
+# Load every phase whose layers exist and carry the mode's access field, reprojected to the
+# boundary CRS (cached by layers.py)
+phases = mapping.available_phases(access_mode)
+data = mapping.load_phase_layers(phases, access_mode)
+base = mapping.BaseLayers(data['boundary'], data['roads'])
+
+# One thematic figure, phase layers swapped in turn
+thematic = mapping.ThematicMap(base)
+for phase in phases:
+    start = time.perf_counter()
+    mapping.build_thematic(phase, access_mode, data=data, thematic=thematic)
+    print(f"Thematic_Map{phase} generated in {time.perf_counter() - start:.1f}s")
+thematic.close()
+
+# Side-by-side comparison of the first two phases
+if len(phases) >= 2:
+    start = time.perf_counter()
+    mapping.build_comparison(phases[:2], access_mode, data=data, base=base)
+    print(f"Comparison_Map generated in {time.perf_counter() - start:.1f}s")
+
+instrument.finish_run()
@@ -0,0 +1,731 @@
+# serve.py - Local live map server: layers fetched per viewport, nearest-facility queries on click
+# The processed layers are loaded once (WGS84 for the map, access.METRIC_CRS for distances) and kept
+# in memory with their spatial indexes; a browser page built with folium asks only for what it shows:
+#   /                                   the live map (phase overlays, access mode and class limits)
+#   /tiles/<layer>/<z>/<x>/<y>.geojson  one 256 px XYZ tile of boundary, roads, communities<p> or
+#                                       facilities<p>: lines clipped and simplified to ~1 px, points
+#                                       thinned to one per POINT_CELL_PX cell; kept in an LRU cache
+#                                       ?mode=network&classes=1000,3000 re-classifies communities
+#   /nearest?lat=..&lon=..&phase=2      nearest facility, straight-line access class and the nearest
+#                                       community's class for a clicked point (KD-tree, ~1 ms)
+#   /stats                              layer counts and tile cache hits
+# Runs without internet: Leaflet and its plugins come from --assets if downloaded there once with
+# --fetch-assets, and when the OpenStreetMap tiles fail the page switches to /basemap/<z>/<x>/<y>.png
+# from --basemap-dir (an XYZ folder, e.g. QGIS "Generate XYZ tiles (Directory)"), or a plain
+# background if there is none. Layer files are watched and reloaded when they change.
+# Webmap.py --server URL writes the usual folium page with the same live layers instead of embedding.
+# Requests are served by asyncio (standard library only); tiles are built on its thread pool.
+#
+# Examples:
+#   python serve.py                                  (layers.PROJECT_DIR, http://127.0.0.1:8765)
+#   python serve.py --data-dir D:\mampong\python_webmap --port 8000 --basemap-dir ..\basemap_tiles
+#   python serve.py --fetch-assets                   (once, online: Leaflet etc. into web_assets)
+
+import argparse
+import asyncio
+import functools
+import gzip
+import json
+import math
+import mimetypes
+import os
+import re
+import time
+import urllib.request
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urljoin, urlsplit
+
+import folium
+import numpy as np
+import shapely
+from jinja2 import Template
+from pyproj import Transformer
+from scipy.spatial import cKDTree
+
+import access
+import instrument
+import layers
+
+MAP_CRS = 'EPSG:4326'
+TILE_SIZE = 256
+MAX_ZOOM = 22
+POINT_CELL_PX = 4  # at most one point per 4 x 4 px of a tile
+COORD_DIGITS = 5  # ~1 m, as in Webmap.py
+TILE_CACHE_SIZE = 2048  # tiles kept per loaded data set
+WATCH_SECONDS = 2  # how often layer files are checked for changes
+ASSETS_DIR = 'web_assets'
+
+# Overlay names, as in Webmap.py
+PHASE_NAMES = {1: 'Phase 1: Health Facilities Only (4 Captured)',
+               2: 'Phase 2: With Private & CHPS Facilities',
+               3: 'Phase 3: Proposed New Facilities'}
+
+COLOR_MAP = {'Good Access': 'green', 'Moderate Access': 'yellow', 'Poor Access': 'red'}
+
+# Community attributes kept in memory: the access fields of every mode and the distances behind them
+COMMUNITY_COLUMNS = ['name', *access.DISTANCE_FIELDS.values()]
+
+
+class TileError(ValueError):
+    pass
+
+
+# Lon/lat bounds (west, south, east, north) of XYZ tile z/x/y
+def tile_bounds(z, x, y):
+    n = 2 ** z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+    return x / n * 360 - 180, lat(y + 1), (x + 1) / n * 360 - 180, lat(y)
+
+
+# Pixel position of lon/lat arrays inside XYZ tile z/x/y (0..TILE_SIZE)
+def tile_pixels(z, x, y, lon, lat):
+    n = 2 ** z
+    px = ((lon + 180) / 360 * n - x) * TILE_SIZE
+    sin = np.sin(np.radians(lat))
+    py = ((0.5 - np.log((1 + sin) / (1 - sin)) / (4 * math.pi)) * n - y) * TILE_SIZE
+    return px, py
+
+
+# Class limits from '1000,3000' (metres, ascending) paired with the labels of access.ACCESS_CLASSES
+def parse_classes(text):
+    if not text:
+        return tuple(access.ACCESS_CLASSES)
+    try:
+        limits = [float(value) for value in text.split(',')]
+    except ValueError:
+        raise TileError(f'classes must be numbers in metres, got {text!r}')
+    if len(limits) != len(access.ACCESS_CLASSES) or limits != sorted(limits):
+        raise TileError(f'classes needs {len(access.ACCESS_CLASSES)} ascending limits, got {text!r}')
+    return tuple(zip(limits, (label for _, label in access.ACCESS_CLASSES)))
+
+
+def _feature_collection(features):
+    return ('{"type":"FeatureCollection","features":[' + ','.join(features) + ']}').encode()
+
+
+def _round(geoms):
+    return shapely.transform(geoms, lambda coords: np.round(coords, COORD_DIGITS))
+
+
+# Access modes each phase's communities can be shown in: straight-line distances are recomputed
+# from the facilities, every other mode needs the phase's field (access.has_access_field)
+def phase_modes(phases, folder=''):
+    return {p: ['euclidean', *(mode for mode in access.ACCESS_MODES if mode != 'euclidean' and
+                               access.has_access_field(f'communities{p}', p, mode, folder))]
+            for p in phases}
+
+
+# Processed layers of one data folder with everything needed to answer tiles and clicks
+class LiveData:
+    def __init__(self, folder, cache_size=TILE_CACHE_SIZE):
+        self.folder = folder
+        self.phases = [p for p in (1, 2, 3) if all(os.path.exists(layers.layer_path(f'{kind}{p}', folder))
+                                                   for kind in ('communities', 'facilities'))]
+        self.modes = phase_modes(self.phases, folder)
+        names = ['boundary', 'roads', *(f'{kind}{p}' for p in self.phases for kind in ('communities', 'facilities'))]
+        self.files = {name: layers.layer_path(name, folder) for name in names}
+        self.signature = self.file_signature()
+
+        columns = {'roads': []}
+        for p in self.phases:
+            columns[f'communities{p}'] = [*COMMUNITY_COLUMNS, *(access.access_field(p, m) for m in access.ACCESS_MODES)]
+            columns[f'facilities{p}'] = ['name']
+        loaded = layers.load_layers(names, crs=MAP_CRS, columns=columns, folder=folder)
+        self.to_metric = Transformer.from_crs(MAP_CRS, access.METRIC_CRS, always_xy=True)
+
+        with instrument.stage('index'):
+            self.lines = {}
+            boundary = loaded['boundary'].geometry.values
+            self.lines['boundary'] = self._line_index(shapely.boundary(np.asarray(boundary)))
+            self.lines['roads'] = self._line_index(np.asarray(loaded['roads'].geometry.values)
+                                                   if len(loaded['roads']) else np.empty(0, object))
+            self.bounds = shapely.total_bounds(np.asarray(boundary))
+            self.points = {}
+            for p in self.phases:
+                self.points[f'facilities{p}'] = self._point_index(loaded[f'facilities{p}'])
+                self.points[f'communities{p}'] = self._point_index(loaded[f'communities{p}'])
+                self._add_access(p, loaded[f'communities{p}'])
+
+        # Tiles are pure functions of their arguments and the loaded data, so they are memoized
+        # per LiveData: a reload starts with an empty cache
+        self.tile = functools.lru_cache(maxsize=cache_size)(self._tile)
+
+    def file_signature(self):
+        return {name: os.stat(path).st_mtime_ns if os.path.exists(path) else None
+                for name, path in self.files.items()}
+
+    @staticmethod
+    def _line_index(geoms):
+        geoms = geoms[~shapely.is_empty(geoms) & ~shapely.is_missing(geoms)]
+        return {'geoms': geoms, 'tree': shapely.STRtree(geoms)}
+
+    @staticmethod
+    def _point_index(gdf):
+        geoms = shapely.centroid(np.asarray(gdf.geometry.values))
+        lon, lat = shapely.get_x(geoms), shapely.get_y(geoms)
+        ok = ~(np.isnan(lon) | np.isnan(lat))
+        names = gdf['name'].to_numpy(dtype=object) if 'name' in gdf.columns else np.full(len(gdf), None, object)
+        mx, my = np.full(len(gdf), np.nan), np.full(len(gdf), np.nan)
+        mx[ok], my[ok] = access.metric_xy(gdf[ok])
+        return {'lon': lon, 'lat': lat, 'ok': ok, 'names': names, 'rows': np.flatnonzero(ok),
+                'kdtree': cKDTree(np.column_stack([mx[ok], my[ok]])) if ok.any() else None}
+
+    # Straight-line distances are recomputed from the loaded facilities, so any class limits can be
+    # applied; network distances come from Net_dist (network.py); other modes keep their stored class
+    def _add_access(self, phase, communities):
+        points = self.points[f'communities{phase}']
+        facilities = self.points[f'facilities{phase}']
+        dist = {'euclidean': np.full(len(communities), np.nan)}
+        if facilities['kdtree'] is not None and points['ok'].any():
+            d, _ = facilities['kdtree'].query(points['kdtree'].data, k=1)
+            dist['euclidean'][points['rows']] = d
+        for mode, field in access.DISTANCE_FIELDS.items():
+            if mode != 'euclidean' and field in communities.columns:
+                dist[mode] = communities[field].to_numpy(dtype=float)
+        stored = {mode: communities[access.access_field(phase, mode)].to_numpy(dtype=object)
+                  for mode in access.ACCESS_MODES if access.access_field(phase, mode) in communities.columns}
+        points['dist'], points['stored'] = dist, stored
+
+    # Access class (and distance, or None) of community rows `idx` of `phase` under `mode`
+    def levels(self, phase, idx, mode, classes):
+        points = self.points[f'communities{phase}']
+        dist = points['dist'].get(mode)
+        if dist is not None:
+            return access.classify_distance(dist[idx], classes), dist[idx]
+        stored = points['stored'].get(mode)
+        if stored is None:
+            return np.full(len(idx), 'Unknown', dtype=object), None
+        return stored[idx], None
+
+    def _tile(self, layer, z, x, y, mode=None, classes=None):
+        west, south, east, north = tile_bounds(z, x, y)
+        if layer in self.lines:
+            # Clipped a pixel outside the tile so strokes meet across tile edges
+            index = self.lines[layer]
+            pixel = (east - west) / TILE_SIZE
+            window = (west - pixel, south - pixel, east + pixel, north + pixel)
+            geoms = index['geoms'][index['tree'].query(shapely.box(*window))]
+            geoms = shapely.simplify(shapely.clip_by_rect(geoms, *window), pixel)
+            geoms = _round(geoms[~shapely.is_empty(geoms)])
+            body = _feature_collection('{"type":"Feature","properties":{},"geometry":%s}' % g
+                                       for g in shapely.to_geojson(geoms))
+            return body, gzip.compress(body, 5)
+
+        points = self.points[layer]
+        lon, lat = points['lon'], points['lat']
+        idx = points['rows']
+        # West/north edges inclusive, east/south exclusive: a point on an edge lands in one tile only
+        inside = (lon[idx] >= west) & (lon[idx] < east) & (lat[idx] <= north) & (lat[idx] > south)
+        idx = idx[inside]
+        px, py = tile_pixels(z, x, y, lon[idx], lat[idx])
+        cells = (np.floor(py / POINT_CELL_PX) * (TILE_SIZE // POINT_CELL_PX) + np.floor(px / POINT_CELL_PX))
+        idx = idx[np.sort(np.unique(cells, return_index=True)[1])]
+
+        names = points['names'][idx]
+        if layer.startswith('communities'):
+            level, dist = self.levels(int(layer[len('communities'):]), idx, mode, classes)
+            props = [{'name': n if isinstance(n, str) else 'Community',
+                      'level': lv if isinstance(lv, str) else 'Unknown',
+                      **({'dist': round(float(d))} if dist is not None and not np.isnan(d) else {})}
+                     for n, lv, d in zip(names, level, dist if dist is not None else np.zeros(len(idx)))]
+        else:
+            props = [{'name': n if isinstance(n, str) else 'Facility'} for n in names]
+        body = _feature_collection(
+            '{"type":"Feature","properties":%s,"geometry":{"type":"Point","coordinates":[%s,%s]}}'
+            % (json.dumps(p), round(float(x_), COORD_DIGITS), round(float(y_), COORD_DIGITS))
+            for p, x_, y_ in zip(props, lon[idx], lat[idx]))
+        return body, gzip.compress(body, 5)
+
+    # Answer for a clicked point: nearest facility (name, position, metres) and the straight-line
+    # class there, plus the nearest community and its class under `mode`
+    def nearest(self, phase, lon, lat, mode='euclidean', classes=tuple(access.ACCESS_CLASSES)):
+        xy = self.to_metric.transform(lon, lat)
+        result = {'phase': phase}
+        facilities = self.points[f'facilities{phase}']
+        if facilities['kdtree'] is not None:
+            d, i = facilities['kdtree'].query(xy, k=1)
+            row = facilities['rows'][i]
+            name = facilities['names'][row]
+            result['facility'] = {'name': name if isinstance(name, str) else 'Facility',
+                                  'lon': float(facilities['lon'][row]), 'lat': float(facilities['lat'][row]),
+                                  'distance_m': round(float(d), 1)}
+            result['access'] = str(access.classify_distance([d], classes)[0])
+        communities = self.points[f'communities{phase}']
+        if mode not in self.modes[phase]:
+            result['missing'] = f'no {mode} access for phase {phase}'
+        elif communities['kdtree'] is not None:
+            d, i = communities['kdtree'].query(xy, k=1)
+            row = communities['rows'][i]
+            level, dist = self.levels(phase, np.array([row]), mode, classes)
+            name = communities['names'][row]
+            result['community'] = {'name': name if isinstance(name, str) else 'Community',
+                                   'level': level[0] if isinstance(level[0], str) else 'Unknown',
+                                   'distance_m': round(float(d), 1)}
+            if dist is not None and not np.isnan(dist[0]):
+                result['community']['facility_distance_m'] = round(float(dist[0]), 1)
+        return result
+
+    def stats(self):
+        info = self.tile.cache_info()
+        return {'folder': self.folder, 'phases': self.phases, 'modes': self.modes,
+                'bounds': [float(v) for v in self.bounds],
+                'features': {**{name: len(index['geoms']) for name, index in self.lines.items()},
+                             **{name: int(points['ok'].sum()) for name, points in self.points.items()}},
+                'tile_cache': {'hits': info.hits, 'misses': info.misses, 'size': info.currsize,
+                               'maxsize': info.maxsize}}
+
+
+# Grid layers that fetch one GeoJSON tile per map tile (Leaflet decides which tiles the viewport
+# needs and unloads the rest), with the phase overlays, the access mode / class limits control
+# and nearest-facility popups on click
+class LiveLayers(folium.MacroElement):
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this._parent.get_name() }};
+            var config = {{ this.config|tojson }};
+            var settings = {mode: config.mode, classes: config.classes.slice()};
+            var renderer = L.canvas({padding: 0.5});
+
+            var GeoJSONTiles = L.GridLayer.extend({
+                initialize: function (layer, geojson, options) {
+                    L.GridLayer.prototype.initialize.call(this, options);
+                    this._layer = layer;
+                    this._geojson = geojson;
+                    this._features = L.layerGroup();
+                    this.on('tileunload', function (e) {
+                        e.tile._unloaded = true;
+                        if (e.tile._features) { this._features.removeLayer(e.tile._features); }
+                    });
+                },
+                onAdd: function (map) {
+                    this._features.addTo(map);
+                    L.GridLayer.prototype.onAdd.call(this, map);
+                },
+                onRemove: function (map) {
+                    L.GridLayer.prototype.onRemove.call(this, map);
+                    this._features.clearLayers();
+                    map.removeLayer(this._features);
+                },
+                createTile: function (coords, done) {
+                    var tile = document.createElement('div');
+                    var self = this;
+                    if (this._modes && this._modes.indexOf(settings.mode) < 0) {  // phase lacks this mode
+                        setTimeout(function () { done(null, tile); }, 0);
+                        return tile;
+                    }
+                    var url = config.url + '/tiles/' + this._layer + '/' + coords.z + '/' + coords.x + '/' +
+                              coords.y + '.geojson?mode=' + settings.mode + '&classes=' + settings.classes.join(',');
+                    fetch(url).then(function (r) {
+                        if (!r.ok) { throw new Error(url + ': ' + r.status); }
+                        return r.json();
+                    }).then(function (data) {
+                        if (!tile._unloaded) {  // not scrolled away or redrawn meanwhile
+                            tile._features = L.geoJSON(data, self._geojson);
+                            self._features.addLayer(tile._features);
+                        }
+                        done(null, tile);
+                    }, function (err) { done(err, tile); });
+                    return tile;
+                }
+            });
+            var tileOptions = {maxNativeZoom: config.max_zoom};
+
+            function communityStyle(feature, latlng) {
+                return L.circleMarker(latlng, {renderer: renderer, radius: map.getZoom() < 12 ? 4 : 7,
+                    color: 'black', weight: 1, fillColor: config.colors[feature.properties.level] || 'gray',
+                    fillOpacity: 0.8, bubblingMouseEvents: false});
+            }
+            function communityPopup(feature, layer) {
+                var p = feature.properties;
+                layer.bindPopup(p.name + '<br>' + p.level + (p.dist !== undefined ? ' (' + p.dist + ' m)' : ''));
+            }
+            function facilityMarker(feature, latlng) {
+                var icon = L.AwesomeMarkers ?
+                    L.AwesomeMarkers.icon({icon: 'plus', prefix: 'fa', markerColor: 'red', iconColor: 'white'}) :
+                    new L.Icon.Default();
+                return L.marker(latlng, {icon: icon}).bindPopup(feature.properties.name);
+            }
+
+            new GeoJSONTiles('roads', {interactive: false, style: {color: 'gray', weight: 1}},
+                             tileOptions).addTo(map);
+            new GeoJSONTiles('boundary', {interactive: false, style: {color: 'black', weight: 2}},
+                             tileOptions).addTo(map);
+
+            var communityLayers = [], overlays = {}, shown = [];
+            config.phases.forEach(function (phase) {
+                var communities = new GeoJSONTiles('communities' + phase.phase,
+                    {pointToLayer: communityStyle, onEachFeature: communityPopup}, tileOptions);
+                var facilities = new GeoJSONTiles('facilities' + phase.phase, {pointToLayer: facilityMarker},
+                                                  tileOptions);
+                communities._modes = phase.modes;
+                var group = L.layerGroup([communities, facilities]);
+                group._phase = phase.phase;
+                communityLayers.push(communities);
+                overlays[phase.name] = group;
+                if (phase.show) { group.addTo(map); }
+            });
+            L.control.layers(null, overlays, {collapsed: false}).addTo(map);
+
+            var panel = L.control({position: 'topright'});
+            panel.onAdd = function () {
+                var div = L.DomUtil.create('div', 'leaflet-bar');
+                div.style.background = 'white';
+                div.style.padding = '6px';
+                div.innerHTML = 'Access <select>' + config.modes.map(function (m) {
+                        return '<option' + (m === settings.mode ? ' selected' : '') + '>' + m + '</option>';
+                    }).join('') + '</select>' + config.labels.map(function (label, i) {
+                        return '<br>' + label + ' &le; <input type="number" min="0" step="100" style="width:6em" value="' +
+                               settings.classes[i] + '"> m';
+                    }).join('') + '<div style="color:#a00"></div>';
+                var note = div.lastChild;
+                function showMissing() {
+                    var missing = config.phases.filter(function (phase) {
+                        return phase.modes.indexOf(settings.mode) < 0;
+                    }).map(function (phase) { return phase.name; });
+                    note.innerHTML = missing.length ? 'No ' + settings.mode + ' access in:<br>' + missing.join('<br>') : '';
+                }
+                showMissing();
+                L.DomEvent.disableClickPropagation(div);
+                L.DomEvent.on(div, 'change', function () {
+                    var limits = Array.prototype.map.call(div.querySelectorAll('input'), function (input) {
+                        return Number(input.value);
+                    });
+                    if (limits.some(function (v, i) { return isNaN(v) || (i && v < limits[i - 1]); })) { return; }
+                    settings.mode = div.querySelector('select').value;
+                    settings.classes = limits;
+                    showMissing();
+                    communityLayers.forEach(function (layer) { layer.redraw(); });
+                });
+                return div;
+            };
+            panel.addTo(map);
+
+            // Nearest facility for a clicked point, in the latest phase shown
+            var link = L.layerGroup().addTo(map);
+            map.on('click', function (e) {
+                if (!config.phases.length) { return; }
+                var phase = config.phases[0].phase;
+                Object.keys(overlays).forEach(function (name) {
+                    if (map.hasLayer(overlays[name])) { phase = overlays[name]._phase; }
+                });
+                fetch(config.url + '/nearest?lat=' + e.latlng.lat + '&lon=' + e.latlng.lng + '&phase=' + phase +
+                      '&mode=' + settings.mode + '&classes=' + settings.classes.join(','))
+                    .then(function (r) { return r.json(); })
+                    .then(function (d) {
+                        link.clearLayers();
+                        if (d.error || !d.facility) { return; }
+                        var html = '<b>Phase ' + d.phase + '</b><br>Nearest facility: ' + d.facility.name +
+                                   ' (' + Math.round(d.facility.distance_m) + ' m)<br>Straight-line access: ' + d.access;
+                        if (d.missing) {
+                            html += '<br>' + d.missing;
+                        } else if (d.community) {
+                            html += '<br>Nearest community: ' + d.community.name + ', ' + d.community.level +
+                                    ' (' + settings.mode + ')';
+                        }
+                        L.polyline([e.latlng, [d.facility.lat, d.facility.lon]],
+                                   {color: 'red', weight: 2, dashArray: '4 4', interactive: false}).addTo(link);
+                        L.popup().setLatLng(e.latlng).setContent(html).openOn(map);
+                    });
+            });
+        })();
+        {% endmacro %}
+    """)
+
+    # modes: {phase: access modes its communities have} (phase_modes); None: all
+    def __init__(self, url, phases, access_mode='euclidean', shown=(1,), modes=None):
+        super().__init__()
+        self._name = 'LiveLayers'
+        modes = modes or {}
+        self.config = {
+            'url': url.rstrip('/'),
+            'phases': [{'phase': p, 'name': PHASE_NAMES.get(p, f'Phase {p}'), 'show': p in shown,
+                        'modes': modes.get(p, list(access.ACCESS_MODES))} for p in phases],
+            'mode': access_mode,
+            'modes': list(access.ACCESS_MODES),
+            'classes': [limit for limit, _ in access.ACCESS_CLASSES],
+            'labels': [label for _, label in access.ACCESS_CLASSES],
+            'colors': COLOR_MAP,
+            'max_zoom': 18,
+        }
+
+
+# Swaps the OpenStreetMap tiles for the server's /basemap tiles (or a plain background) when the
+# browser is offline or the tiles keep failing
+class OfflineBasemap(folium.MacroElement):
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this._parent.get_name() }};
+            var online = null;
+            map.eachLayer(function (layer) { if (!online && layer instanceof L.TileLayer) { online = layer; } });
+            if (!online) { return; }
+            var errors = 0, local = false;
+            function useLocal() {
+                if (local) { return; }
+                local = true;
+                map.removeLayer(online);
+                map.getContainer().style.background = '#f2efe9';
+                L.tileLayer({{ this.url|tojson }} + '/basemap/{z}/{x}/{y}.png',
+                            {maxZoom: 19, attribution: 'Local basemap'}).addTo(map).bringToBack();
+            }
+            if (navigator.onLine === false) { useLocal(); }
+            online.on('tileerror', function () { if (++errors >= 3) { useLocal(); } });
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, url):
+        super().__init__()
+        self._name = 'OfflineBasemap'
+        self.url = url.rstrip('/')
+
+
+# Point the map's Leaflet / plugin scripts and styles at copies under assets_dir (see fetch_assets),
+# served as <url>/static/...; anything not downloaded stays on its CDN
+def use_local_assets(m, url, assets_dir=ASSETS_DIR):
+    if not assets_dir:
+        return
+    for attr in ('default_js', 'default_css'):
+        links = []
+        for name, link in getattr(m, attr):
+            local = os.path.join(assets_dir, name, os.path.basename(urlsplit(link).path))
+            links.append((name, f"{url.rstrip('/')}/static/{name}/{os.path.basename(local)}"
+                          if os.path.exists(local) else link))
+        setattr(m, attr, links)
+
+
+# Download folium's scripts and styles, and the fonts/images the styles refer to, into assets_dir
+def fetch_assets(assets_dir=ASSETS_DIR):
+    for name, link in [*folium.Map.default_js, *folium.Map.default_css]:
+        path = os.path.join(assets_dir, name, os.path.basename(urlsplit(link).path))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with urllib.request.urlopen(link, timeout=30) as response:
+            content = response.read()
+        with open(path, 'wb') as f:
+            f.write(content)
+        print(f"{link} -> {path}")
+        if not path.endswith('.css'):
+            continue
+        for ref in set(re.findall(r'url\(\s*["\']?([^"\')?#]+)', content.decode('utf-8', 'replace'))):
+            if ref.startswith(('data:', 'http:', 'https:', '//')):
+                continue
+            target = os.path.normpath(os.path.join(os.path.dirname(path), ref))
+            if not os.path.abspath(target).startswith(os.path.abspath(assets_dir)):
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            try:
+                urllib.request.urlretrieve(urljoin(link, ref), target)
+            except OSError as exc:
+                print(f"  skipped {ref}: {exc}")
+
+
+# The live map page for `data` (layer URLs relative to the server it is served from)
+def live_page(data, access_mode='euclidean', assets_dir=ASSETS_DIR):
+    west, south, east, north = data.bounds
+    m = folium.Map(location=[(south + north) / 2, (west + east) / 2], zoom_start=11, tiles="OpenStreetMap")
+    use_local_assets(m, '', assets_dir)
+    m.add_child(OfflineBasemap(''))
+    m.add_child(LiveLayers('', data.phases, access_mode, shown=data.phases[:1], modes=data.modes))
+    m.fit_bounds([[south, west], [north, east]])
+    m.get_root().html.add_child(folium.Element(
+        '<h3 align="center" style="font-size:22px; font-weight:bold"><b>Healthcare Accessibility in Mampong '
+        'Municipality</b></h3><p align="center">Live map: layers load per view; click anywhere for the nearest '
+        'facility</p>'))
+    return m.get_root().render().encode()
+
+
+# Files under `root` only (no .. out of it)
+def _safe_file(root, relative):
+    if not root:
+        return None
+    path = os.path.normpath(os.path.join(root, unquote(relative)))
+    if not os.path.abspath(path).startswith(os.path.abspath(root) + os.sep) or not os.path.isfile(path):
+        return None
+    return path
+
+
+def _error(status, message):
+    return status, 'application/json', json.dumps({'error': message}).encode(), {}
+
+
+# asyncio server holding the loaded data; tiles are built on the default thread pool so one slow
+# tile does not hold up the other requests. A reload swaps self.data, and each request keeps the
+# LiveData it started with
+class LiveServer:
+    def __init__(self, folder, args):
+        self.args = args
+        self.data = LiveData(folder, args.cache_size)
+        self.page = live_page(self.data, args.mode, args.assets)
+
+    # (status, content type, body, extra headers) for a GET of `target`
+    async def respond(self, target, headers):
+        parts = urlsplit(target)
+        path = parts.path
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        data = self.data
+        if path in ('/', '/index.html'):
+            return 200, 'text/html; charset=utf-8', self.page, {}
+        if path == '/stats':
+            return 200, 'application/json', json.dumps(data.stats()).encode(), {'Cache-Control': 'no-store'}
+
+        match = re.fullmatch(r'/tiles/(\w+)/(\d+)/(\d+)/(\d+)\.geojson', path)
+        if match:
+            layer, (z, x, y) = match.group(1), map(int, match.groups()[1:])
+            if layer not in data.lines and layer not in data.points:
+                return _error(404, f'no layer {layer}')
+            if z > MAX_ZOOM or x >= 2 ** z or y >= 2 ** z:
+                return _error(400, f'no tile {z}/{x}/{y}')
+            mode = classes = None
+            if layer.startswith('communities'):  # the only layer whose tiles depend on them
+                mode = query.get('mode', self.args.mode)
+                if mode not in access.ACCESS_MODES:
+                    return _error(400, f'unknown mode {mode}')
+                classes = parse_classes(query.get('classes'))
+                phase = int(layer[len('communities'):])
+                if mode not in data.modes[phase]:
+                    return _error(404, f'{layer} has no {access.access_field(phase, mode)}; run '
+                                       f'{"network.py" if mode == "network" else "fca.py"} on phase {phase}')
+            body, compressed = await asyncio.get_running_loop().run_in_executor(
+                None, data.tile, layer, z, x, y, mode, classes)
+            if 'gzip' in headers.get('accept-encoding', ''):
+                return 200, 'application/geo+json', compressed, {'Content-Encoding': 'gzip'}
+            return 200, 'application/geo+json', body, {}
+
+        if path == '/nearest':
+            if not data.phases:
+                return _error(404, f'no phase layers loaded from {data.folder}')
+            try:
+                lon, lat, phase = float(query['lon']), float(query['lat']), int(query.get('phase', data.phases[0]))
+            except (KeyError, ValueError):
+                raise TileError('nearest needs lat, lon and optionally phase')
+            if phase not in data.phases:
+                raise TileError(f'no phase {phase}, available: {data.phases}')
+            mode = query.get('mode', self.args.mode)
+            if mode not in access.ACCESS_MODES:
+                raise TileError(f'unknown mode {mode}')
+            start = time.perf_counter()
+            result = data.nearest(phase, lon, lat, mode, parse_classes(query.get('classes')))
+            result['ms'] = round((time.perf_counter() - start) * 1000, 2)
+            return 200, 'application/json', json.dumps(result).encode(), {'Cache-Control': 'no-store'}
+
+        for prefix, root in (('/static/', self.args.assets), ('/basemap/', self.args.basemap_dir)):
+            if path.startswith(prefix):
+                file = _safe_file(root, path[len(prefix):])
+                if file is None:
+                    return 404, 'text/plain', b'not found', {}
+                with open(file, 'rb') as f:
+                    body = f.read()
+                return (200, mimetypes.guess_type(file)[0] or 'application/octet-stream', body,
+                        {'Cache-Control': 'max-age=86400'})
+        return 404, 'text/plain', b'not found', {}
+
+    # One connection: HTTP/1.1 GET/HEAD requests, kept alive until the client closes it
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                start = time.perf_counter()
+                parts = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                if headers.get('content-length', '0').isdigit():
+                    await reader.readexactly(int(headers.get('content-length', '0')))  # unused body
+
+                if len(parts) != 3:
+                    method, target, version = 'GET', request_line.decode('latin-1').strip(), 'HTTP/1.0'
+                    status, ctype, body, extra = 400, 'text/plain', b'bad request', {}
+                else:
+                    method, target, version = parts
+                    if method not in ('GET', 'HEAD'):
+                        status, ctype, body, extra = 405, 'text/plain', b'only GET', {'Allow': 'GET, HEAD'}
+                    else:
+                        try:
+                            status, ctype, body, extra = await self.respond(target, headers)
+                        except TileError as exc:
+                            status, ctype, body, extra = _error(400, str(exc))
+                        except Exception as exc:
+                            print(f"{target} failed: {type(exc).__name__}: {exc}")
+                            status, ctype, body, extra = 500, 'text/plain', b'server error', {}
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                head = [f'HTTP/1.1 {status} {HTTPStatus(status).phrase}', f'Content-Type: {ctype}',
+                        f'Content-Length: {len(body)}', 'Access-Control-Allow-Origin: *',
+                        f'Connection: {"keep-alive" if keep_alive else "close"}',
+                        *(f'{key}: {value}' for key, value in extra.items())]
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + (body if method == 'GET' else b''))
+                await writer.drain()
+                if self.args.verbose:
+                    print(f"{method} {target} {status} {len(body)} B {(time.perf_counter() - start) * 1000:.1f} ms")
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass  # client went away, or a line over the stream limit
+        finally:
+            writer.close()
+
+    # Reload the layers (off the event loop) when any of their files changes
+    async def watch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(WATCH_SECONDS)
+            if self.data.file_signature() == self.data.signature:
+                continue
+            start = time.perf_counter()
+            try:
+                data = await loop.run_in_executor(None, LiveData, self.data.folder, self.args.cache_size)
+            except Exception as exc:  # half-written file: keep serving the old data, retry next time
+                print(f"Reload failed ({type(exc).__name__}: {exc}), keeping the loaded layers")
+                continue
+            self.page = live_page(data, self.args.mode, self.args.assets)
+            self.data = data
+            print(f"Layers changed, reloaded in {time.perf_counter() - start:.1f}s")
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Serving {self.data.folder} on http://{host}:{port}/ (Ctrl+C to stop)")
+        async with server:
+            await asyncio.gather(server.serve_forever(), self.watch())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local live map server (tiles and nearest-facility queries)')
+    parser.add_argument('--data-dir', default=layers.PROJECT_DIR, help='folder with the project layers')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--mode', default='euclidean', choices=list(access.ACCESS_MODES),
+                        help='access mode the page starts with (changeable in the page)')
+    parser.add_argument('--cache-size', type=int, default=TILE_CACHE_SIZE, help='tiles kept in memory')
+    parser.add_argument('--assets', default=ASSETS_DIR, help='folder with offline copies of Leaflet etc.')
+    parser.add_argument('--fetch-assets', action='store_true', help='download them into --assets and exit')
+    parser.add_argument('--basemap-dir', help='XYZ tile folder (<z>/<x>/<y>.png) used when offline')
+    parser.add_argument('-v', '--verbose', action='store_true', help='log every request')
+    args = parser.parse_args()
+
+    data_dir = os.path.abspath(args.data_dir)
+    os.chdir(data_dir)
+    if args.fetch_assets:
+        fetch_assets(args.assets)
+        return
+    args.assets = os.path.abspath(args.assets) if os.path.isdir(args.assets) else None
+    args.basemap_dir = os.path.abspath(args.basemap_dir) if args.basemap_dir else None
+
+    instrument.start_run()  # startup stage timings (see instrument.py)
+    server = LiveServer(data_dir, args)
+    instrument.finish_run()
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
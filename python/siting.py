@@ -0,0 +1,153 @@
+# siting.py - Where to add k new facilities (location-allocation)
+# Objectives, both counted on community population (or 1 per community if there is none):
+#   coverage  maximise the population within --threshold metres of a facility
+#   median    minimise total population-weighted distance to the nearest facility (p-median)
+# Candidate-community distances are precomputed once as a sparse matrix (only pairs closer than
+# the threshold / --radius), and sites are chosen by lazy greedy: both objectives are submodular,
+# so a site's gain can only shrink and stale heap entries are re-evaluated only when they reach the
+# top. Existing facilities are fixed. The chosen sites are written as the Phase 3 proposed layers
+# (facilities + re-classified communities), which render_maps.py, pipeline.py and serve.py pick up.
+# Only the straight-line class (Acces_lvl3) is recomputed; the input's road-network and E2SFCA
+# columns are dropped, so run network.py / fca.py on the Phase 3 layers for those modes.
+#
+# Examples:
+#   python siting.py --k 5                                  (Phase 2 layers, community locations as candidates)
+#   python siting.py --k 10 --objective median --radius 10000 --candidates candidate_sites.geojson
+
+import argparse
+import heapq
+import time
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+import access
+import layers
+
+
+# Objective improvement from each (candidate, community) entry given the communities' current
+# nearest distance; a candidate's gain is the sum over its row
+def _improvement(idx, dist, current, weight, objective, threshold):
+    if objective == 'coverage':
+        return weight[idx] * ((dist <= threshold) & (current[idx] > threshold))
+    return weight[idx] * np.maximum(current[idx] - dist, 0)
+
+
+def _row_gain(matrix, j, current, weight, objective, threshold):
+    start, end = matrix.indptr[j], matrix.indptr[j + 1]
+    return _improvement(matrix.indices[start:end], matrix.data[start:end], current, weight,
+                        objective, threshold).sum()
+
+
+# Chooses k rows of `matrix` by lazy greedy. `current`: distance of each community to the
+# nearest existing facility. Returns (chosen rows, gain of each, updated nearest distances)
+def lazy_greedy(matrix, current, weight, k, objective='coverage', threshold=3000):
+    current = current.copy()
+    # First round for all candidates at once: per-entry improvement summed by row
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    initial = np.bincount(rows, _improvement(matrix.indices, matrix.data, current, weight, objective, threshold),
+                          minlength=matrix.shape[0])
+    heap = [(-gain, j, 0) for j, gain in enumerate(initial)]
+    heapq.heapify(heap)
+    chosen, gains = [], []
+    evaluations = matrix.shape[0]
+    while heap and len(chosen) < k:
+        neg_gain, j, round_ = heapq.heappop(heap)
+        if round_ != len(chosen):
+            # Stale: gain computed before the last pick, re-evaluate and push back
+            gain = _row_gain(matrix, j, current, weight, objective, threshold)
+            evaluations += 1
+            heapq.heappush(heap, (-gain, j, len(chosen)))
+            continue
+        if -neg_gain <= 0:
+            break
+        chosen.append(j)
+        gains.append(-neg_gain)
+        start, end = matrix.indptr[j], matrix.indptr[j + 1]
+        idx = matrix.indices[start:end]
+        current[idx] = np.minimum(current[idx], matrix.data[start:end])
+    return np.array(chosen, dtype=int), np.array(gains), current, evaluations
+
+
+# Columns computed from the input facilities by network.py, fca.py or another phase's access.py
+# run; they do not describe the proposed facilities
+def _stale_columns(columns):
+    prefixes = (*access.ACCESS_MODES.values(), 'E2SFCA')
+    derived = {'HubName', *access.DISTANCE_FIELDS.values(), 'Net_time', 'Net_hub'}
+    return [c for c in columns if c in derived or c.startswith(prefixes)]
+
+
+# Phase `phase` proposed layers: existing + chosen facilities, communities re-classified
+def proposed_layers(communities, facilities, candidates, chosen, phase, name_field='name'):
+    sites = candidates.iloc[chosen].to_crs(facilities.crs)
+    sites = gpd.GeoDataFrame({
+        name_field: [f'Proposed site {n + 1}' for n in range(len(sites))],
+        'status': 'proposed',
+    }, geometry=sites.geometry.values, crs=facilities.crs)
+    existing = facilities.copy()
+    existing['status'] = 'existing'
+    proposed = gpd.GeoDataFrame(pd.concat([existing, sites], ignore_index=True), crs=facilities.crs)
+    communities = communities.drop(columns=_stale_columns(communities.columns))
+    return access.compute_access(communities, proposed, phase, name_field), proposed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Choose k new facility sites (max coverage or p-median)')
+    parser.add_argument('--communities', default=layers.layer_path('communities2'))
+    parser.add_argument('--facilities', default=layers.layer_path('facilities2'), help='existing facilities')
+    parser.add_argument('--candidates', help='candidate sites layer (default: every community location)')
+    parser.add_argument('--k', type=int, required=True, help='number of new facilities')
+    parser.add_argument('--objective', default='coverage', choices=['coverage', 'median'])
+    parser.add_argument('--threshold', type=float, default=3000,
+                        help='coverage distance in metres (default 3000, the Poor Access limit)')
+    parser.add_argument('--radius', type=float, default=10000,
+                        help='median: ignore candidate-community pairs further than this (metres)')
+    parser.add_argument('--population-field', default='population')
+    parser.add_argument('--name-field', default='name')
+    parser.add_argument('--phase', default='3', help='phase number of the proposed layers')
+    parser.add_argument('--communities-out', default=layers.processed_path('communities3'))
+    parser.add_argument('--facilities-out', default=layers.processed_path('facilities3'))
+    parser.add_argument('--compat', nargs='+', choices=layers.COMPAT_FORMATS, default=[],
+                        help='also write these formats under the output names, e.g. geojson shp')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    communities = layers.read_layer(args.communities, cache=False)
+    facilities = layers.read_layer(args.facilities, cache=False)
+    candidates = layers.read_layer(args.candidates, cache=False) if args.candidates else communities
+    if args.population_field in communities.columns:
+        weight = communities[args.population_field].fillna(0).to_numpy(dtype=float)
+    else:
+        weight = np.ones(len(communities))
+    _, current = access.nearest_facility(communities, facilities)
+    current = np.nan_to_num(current, nan=np.inf)
+    loaded = time.perf_counter()
+
+    radius = args.threshold if args.objective == 'coverage' else args.radius
+    matrix = access.distance_matrix(candidates, communities, radius)
+    built = time.perf_counter()
+
+    chosen, gains, after, evaluations = lazy_greedy(matrix, current, weight, args.k, args.objective, args.threshold)
+    solved = time.perf_counter()
+
+    result, proposed = proposed_layers(communities, facilities, candidates, chosen, args.phase, args.name_field)
+    layers.write_layer(result, args.communities_out, args.compat)
+    layers.write_layer(proposed, args.facilities_out, args.compat)
+
+    unit = 'population newly covered' if args.objective == 'coverage' else 'population x metres saved'
+    for n, (j, gain) in enumerate(zip(chosen, gains)):
+        print(f"  Proposed site {n + 1}: candidate {j}, {gain:,.0f} {unit}")
+    total = weight.sum()
+    print(f"Covered within {args.threshold:g} m: {weight[current <= args.threshold].sum() / total:.1%} -> "
+          f"{weight[after <= args.threshold].sum() / total:.1%} of population; weighted mean distance "
+          f"{np.average(np.minimum(current, 1e9), weights=weight):.0f} m -> "
+          f"{np.average(np.minimum(after, 1e9), weights=weight):.0f} m")
+    print(f"{len(candidates)} candidates x {len(communities)} communities, {matrix.nnz} pairs within {radius:g} m: "
+          f"load {loaded - start:.2f}s, matrix {built - loaded:.2f}s, "
+          f"lazy greedy {solved - built:.3f}s ({evaluations} gain evaluations)")
+    print(f"Saved {args.communities_out} and {args.facilities_out}")
+
+
+if __name__ == '__main__':
+    main()
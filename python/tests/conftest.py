@@ -0,0 +1,7 @@
+# conftest.py - Lets the tests import the scripts in python/ as the scripts import each other
+# Run from python/:  python -m pytest tests
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
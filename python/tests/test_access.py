@@ -0,0 +1,53 @@
+# Nearest-facility access (access.py) against a brute-force distance table on synthetic points
+
+import geopandas as gpd
+import numpy as np
+
+import access
+
+
+# Random points around Mampong in the metric CRS, a few of them missing
+def random_points(rng, n, missing=0, crs=access.METRIC_CRS):
+    geometry = list(gpd.points_from_xy(rng.uniform(690000, 700000, n), rng.uniform(780000, 790000, n)))
+    for i in rng.choice(n, missing, replace=False):
+        geometry[i] = None
+    return gpd.GeoDataFrame({'name': [f'p{i}' for i in range(n)]}, geometry=geometry, crs=crs)
+
+
+def brute_force_nearest(communities, facilities):
+    cx, cy = access.metric_xy(communities)
+    fx, fy = access.metric_xy(facilities)
+    dist = np.hypot(cx[:, None] - fx[None, :], cy[:, None] - fy[None, :])
+    dist[:, np.isnan(fx)] = np.inf
+    nearest = np.argmin(dist, axis=1)
+    best = dist[np.arange(len(cx)), nearest]
+    nearest[np.isnan(cx)] = -1
+    best[np.isnan(cx)] = np.nan
+    return nearest, best
+
+
+def test_nearest_facility_matches_brute_force():
+    rng = np.random.default_rng(0)
+    communities = random_points(rng, 300, missing=5)
+    facilities = random_points(rng, 40, missing=3)
+    nearest, dist = access.nearest_facility(communities, facilities)
+    expected_nearest, expected_dist = brute_force_nearest(communities, facilities)
+    np.testing.assert_array_equal(nearest, expected_nearest)
+    np.testing.assert_allclose(dist, expected_dist)
+
+
+def test_nearest_facility_reprojects_both_layers():
+    rng = np.random.default_rng(1)
+    communities = random_points(rng, 50)
+    facilities = random_points(rng, 10)
+    nearest, dist = access.nearest_facility(communities.to_crs('EPSG:4326'), facilities.to_crs('EPSG:4326'))
+    expected_nearest, expected_dist = brute_force_nearest(communities, facilities)
+    np.testing.assert_array_equal(nearest, expected_nearest)
+    np.testing.assert_allclose(dist, expected_dist, atol=1e-3)
+
+
+def test_classify_distance_limits():
+    dist = [0, 1000, 1000.1, 3000, 3000.1, np.nan]
+    expected = ['Good Access', 'Good Access', 'Moderate Access', 'Moderate Access', 'Poor Access', 'Poor Access']
+    assert list(access.classify_distance(dist)) == expected
+
@@ -0,0 +1,87 @@
+# E2SFCA score (fca.py): the sparse matrix-vector form against the two steps written out as loops
+
+import geopandas as gpd
+import numpy as np
+
+import access
+import fca
+
+
+def points(rng, n, missing=0):
+    geometry = list(gpd.points_from_xy(rng.uniform(690000, 700000, n), rng.uniform(780000, 790000, n)))
+    for i in rng.choice(n, missing, replace=False):
+        geometry[i] = None
+    return gpd.GeoDataFrame({'name': [f'p{i}' for i in range(n)]}, geometry=geometry, crs=access.METRIC_CRS)
+
+
+def pairwise_distance(rows, cols):
+    rx, ry = access.metric_xy(rows)
+    cx, cy = access.metric_xy(cols)
+    return np.hypot(rx[:, None] - cx[None, :], ry[:, None] - cy[None, :])
+
+
+def zone_weight(d, zones=fca.ZONES):
+    for limit, weight in zones:
+        if d <= limit:
+            return weight
+    return 0.0
+
+
+# Step 1 and step 2 of E2SFCA, one facility / community at a time
+def loop_e2sfca(dist, supply, demand):
+    n_fac, n_com = dist.shape
+    ratio = np.zeros(n_fac)
+    for j in range(n_fac):
+        served = sum(zone_weight(dist[j, i]) * demand[i] for i in range(n_com))
+        ratio[j] = supply[j] / served if served > 0 else 0.0
+    return np.array([sum(zone_weight(dist[j, i]) * ratio[j] for j in range(n_fac)) for i in range(n_com)])
+
+
+def test_distance_matrix_matches_brute_force():
+    rng = np.random.default_rng(0)
+    rows, cols = points(rng, 30, missing=2), points(rng, 80, missing=4)
+    matrix = access.distance_matrix(rows, cols, 2500).toarray()
+    dist = pairwise_distance(rows, cols)
+    within = dist <= 2500  # False for missing geometry (NaN)
+    np.testing.assert_allclose(matrix[within], dist[within])
+    assert not matrix[~within].any()
+
+
+def test_e2sfca_matches_loops():
+    rng = np.random.default_rng(1)
+    communities, facilities = points(rng, 120), points(rng, 15)
+    supply = rng.uniform(1, 10, len(facilities))
+    demand = rng.integers(0, 3000, len(communities)).astype(float)
+    dist = pairwise_distance(facilities, communities)
+
+    weights = fca.zone_weights(access.distance_matrix(facilities, communities, fca.ZONES[-1][0]))
+    np.testing.assert_allclose(weights.toarray(), np.vectorize(zone_weight)(dist))
+    np.testing.assert_allclose(fca.e2sfca(weights, supply, demand), loop_e2sfca(dist, supply, demand))
+
+
+def test_compute_fca_capacity_and_population():
+    rng = np.random.default_rng(2)
+    communities, facilities = points(rng, 100), points(rng, 10)
+    communities['population'] = rng.integers(0, 3000, len(communities)).astype(float)
+    communities.loc[5, 'population'] = np.nan  # counted as no one
+    facilities['beds'] = rng.integers(1, 50, len(facilities)).astype(float)
+    facilities.loc[2, 'beds'] = np.nan  # counted as the median facility
+
+    result, nnz = fca.compute_fca(communities, facilities, 2, capacity_field='beds')
+    supply = facilities['beds'].fillna(facilities['beds'].median()).to_numpy()
+    demand = communities['population'].fillna(0).to_numpy()
+    expected = loop_e2sfca(pairwise_distance(facilities, communities), supply, demand) * fca.SCORE_SCALE
+    np.testing.assert_allclose(result['E2SFCA2'], np.round(expected, 4), atol=1e-4)
+    assert nnz == (pairwise_distance(facilities, communities) <= fca.ZONES[-1][0]).sum()
+    assert set(result['Acces_fca2']) <= {'Good Access', 'Moderate Access', 'Poor Access'}
+
+
+def test_classify_score_relative_to_weighted_mean():
+    score = np.array([0.0, 0.4, 1.0, 2.0, 3.0])
+    demand = np.array([1.0, 1.0, 1.0, 1.0, 0.0])  # weighted mean 0.85
+    assert list(fca.classify_score(score, demand)) == [
+        'Poor Access', 'Poor Access', 'Good Access', 'Good Access', 'Good Access']
+    score = np.array([0.0, 0.5, 0.9, 2.0])
+    demand = np.ones(4)  # mean 0.85: half of it is 0.425
+    assert list(fca.classify_score(score, demand)) == [
+        'Poor Access', 'Moderate Access', 'Good Access', 'Good Access']
@@ -0,0 +1,82 @@
+# Streaming GeoJSON reader (geojson_stream.py) against json.load of the same file
+
+import json
+
+import numpy as np
+import pytest
+from pyproj import Transformer
+
+import geojson_stream
+
+
+# FeatureCollection larger than several read chunks: many small points, one line larger than a
+# chunk, and features the web map skips (no geometry, no coordinates, a point with one coordinate)
+def synthetic_collection(rng):
+    features = [{'type': 'Feature', 'properties': {'name': f'c{i}', 'pop': int(rng.integers(0, 5000)), 'note': None},
+                 'geometry': {'type': 'Point', 'coordinates': [float(rng.uniform(-1.6, -1.3)),
+                                                               float(rng.uniform(7.0, 7.2))]}}
+                for i in range(3000)]
+    line = rng.uniform(-1.6, -1.3, (geojson_stream.CHUNK_SIZE // 10, 2)).tolist()
+    features.insert(1500, {'type': 'Feature', 'properties': {'name': 'long road'},
+                           'geometry': {'type': 'LineString', 'coordinates': line}})
+    features.insert(10, {'type': 'Feature', 'properties': {'name': 'no geometry'}, 'geometry': None})
+    features.insert(20, {'type': 'Feature', 'properties': None, 'geometry': {'type': 'Point', 'coordinates': []}})
+    features.insert(30, {'type': 'Feature', 'properties': {}, 'geometry': {'type': 'Point', 'coordinates': [1.0]}})
+    return {'type': 'FeatureCollection', 'name': 'synthetic', 'features': features, 'bbox': [-1.6, 7.0, -1.3, 7.2]}
+
+
+def expected_features(collection, properties=None, geom_types=None):
+    result = []
+    for feature in collection['features']:
+        geom = feature['geometry']
+        if not geojson_stream.valid_geometry(geom) or (geom_types and geom['type'] not in geom_types):
+            continue
+        props = feature['properties'] or {}
+        if properties is not None:
+            props = {key: props[key] for key in properties if key in props}
+        result.append({'type': 'Feature', 'properties': props, 'geometry': geom})
+    return result
+
+
+@pytest.mark.parametrize('indent', [None, 2])
+def test_collection_matches_json_load(tmp_path, indent):
+    path = tmp_path / 'layer.geojson'
+    path.write_text(json.dumps(synthetic_collection(np.random.default_rng(0)), indent=indent), encoding='utf-8')
+    with open(path, encoding='utf-8') as f:
+        collection = json.load(f)
+    assert list(geojson_stream.iter_features(str(path))) == expected_features(collection)
+    assert (list(geojson_stream.iter_features(str(path), ['name', 'missing'], ('Point',)))
+            == expected_features(collection, ['name', 'missing'], ('Point',)))
+
+
+def test_seq_matches_collection(tmp_path):
+    collection = synthetic_collection(np.random.default_rng(1))
+    path = tmp_path / 'layer.geojsonl'
+    # RFC 8142 record separators and blank lines are allowed between features
+    path.write_text(''.join(geojson_stream.RS + json.dumps(f) + '\n\n' for f in collection['features']),
+                    encoding='utf-8')
+    assert list(geojson_stream.iter_features(str(path))) == expected_features(collection)
+
+    copy = tmp_path / 'copy.geojsonl'
+    assert geojson_stream.write_seq(geojson_stream.iter_features(str(path)), str(copy)) == 3001
+    assert list(geojson_stream.iter_features(str(copy))) == expected_features(collection)
+
+
+def test_declared_crs_is_reprojected_to_wgs84(tmp_path):
+    xy = [(690000.0, 780000.0), (695000.5, 785000.25)]
+    collection = {'type': 'FeatureCollection',
+                  'crs': {'type': 'name', 'properties': {'name': 'urn:ogc:def:crs:EPSG::32630'}},
+                  'features': [{'type': 'Feature', 'properties': {'name': f'p{i}'},
+                                'geometry': {'type': 'Point', 'coordinates': list(p)}} for i, p in enumerate(xy)]}
+    path = tmp_path / 'utm.geojson'
+    path.write_text(json.dumps(collection), encoding='utf-8')
+
+    to_wgs84 = Transformer.from_crs('EPSG:32630', 'EPSG:4326', always_xy=True)
+    features = list(geojson_stream.iter_features(str(path)))
+    assert [f['properties']['name'] for f in features] == ['p0', 'p1']
+    for feature, (x, y) in zip(features, xy):
+        np.testing.assert_allclose(feature['geometry']['coordinates'], to_wgs84.transform(x, y))
+
+
+def test_missing_optional_layer_is_empty(tmp_path):
+    assert list(geojson_stream.iter_layer(str(tmp_path / 'roads.geojson'))) == []
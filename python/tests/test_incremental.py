@@ -0,0 +1,51 @@
+# Incremental facility-diff updates (incremental.py) against a full access.compute_access
+
+import geopandas as gpd
+import numpy as np
+
+import access
+import incremental
+
+
+def points(x, y, prefix, crs=access.METRIC_CRS):
+    return gpd.GeoDataFrame({'name': [f'{prefix} {i}' for i in range(len(x))]},
+                            geometry=gpd.points_from_xy(np.asarray(x) + 690000, np.asarray(y) + 780000),
+                            crs=access.METRIC_CRS).to_crs(crs)
+
+
+# Same check as `python incremental.py ... --check N`, on random layers in two CRSs
+def test_random_diffs_match_full_recompute():
+    rng = np.random.default_rng(0)
+    communities = points(rng.uniform(0, 10000, 500), rng.uniform(0, 10000, 500), 'community')
+    facilities = points(rng.uniform(0, 10000, 25), rng.uniform(0, 10000, 25), 'facility', crs='EPSG:4326')
+    assert incremental.check_against_full(communities, facilities, runs=20, seed=1) == []
+
+
+# A removed hub straight north of a community, at a HubDist rounded down from its true
+# distance, must still be found (its circle's box is padded by the match tolerance)
+def test_removed_hub_on_box_edge():
+    communities = points([0], [0], 'community')
+    facilities = points([0, 4000], [1500.04, 0], 'facility')
+    base = access.compute_access(communities, facilities, 2)
+    assert base['HubDist'].tolist() == [1500.0]
+
+    result, changes, updated, touched = incremental.update_access(
+        base, facilities, removed=facilities.iloc[[0]], phase_from=2, phase_to=3)
+    assert len(updated) == 1 and touched == 1
+    assert result['HubName'].tolist() == ['facility 1']
+    assert result['HubDist'].tolist() == [4000.0]
+    assert result['Acces_lvl3'].tolist() == ['Poor Access']
+    assert changes[['old_class', 'new_class']].values.tolist() == [['Moderate Access', 'Poor Access']]
+
+
+def test_added_facility_touches_only_nearby_communities():
+    communities = points([0, 500, 8000], [0, 0, 0], 'community')
+    facilities = points([9000], [0], 'facility')
+    base = access.compute_access(communities, facilities, 2)
+
+    added = points([200], [0], 'new')
+    result, _, _, touched = incremental.update_access(base, facilities, added=added, phase_from=2, phase_to=2)
+    full = access.compute_access(base, incremental.apply_facility_diff(facilities, added), 2)
+    assert touched == 2
+    np.testing.assert_allclose(result['HubDist'], full['HubDist'])
+    assert result['Acces_lvl2'].tolist() == full['Acces_lvl2'].tolist()
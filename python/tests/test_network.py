@@ -0,0 +1,173 @@
+# Road-network access (network.py): the single super-source Dijkstra and pointer jumping against
+# one Dijkstra per facility on a small synthetic road grid
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from shapely.geometry import LineString
+
+import access
+import network
+
+X0, Y0 = 690000, 780000  # grid origin in the metric CRS
+SPACING = 200
+SIZE = 10
+WALK_MIN = 60 / (network.WALK_SPEED * 1000)  # minutes per metre off-road
+
+
+# SIZE x SIZE road grid (a vertex at every crossing) with mixed highway classes, plus one
+# road segment that is not connected to the grid. Crossings are jittered so that no two routes
+# tie in length or time and both methods must pick the same one.
+@pytest.fixture(scope='module')
+def graph():
+    rng = np.random.default_rng(0)
+    ticks = np.arange(SIZE) * SPACING
+    xy = np.stack(np.meshgrid(X0 + ticks, Y0 + ticks, indexing='ij'), axis=-1)
+    xy += rng.uniform(-SPACING / 4, SPACING / 4, xy.shape)
+    lines = [LineString(xy[:, j]) for j in range(SIZE)] + [LineString(xy[i, :]) for i in range(SIZE)]
+    lines.append(LineString([(X0 + 5000, Y0), (X0 + 5000, Y0 + 400)]))
+    highway = rng.choice(['primary', 'residential', 'track', 'footway'], len(lines))
+    roads = gpd.GeoDataFrame({'highway': highway}, geometry=lines, crs=access.METRIC_CRS)
+    return network.build_graph(roads)
+
+
+def points(x, y):
+    return gpd.GeoDataFrame({'name': [f'p{i}' for i in range(len(x))]},
+                            geometry=gpd.points_from_xy(np.asarray(x) + X0, np.asarray(y) + Y0),
+                            crs=access.METRIC_CRS)
+
+
+def random_points(rng, n):
+    extent = SIZE * SPACING
+    return points(rng.uniform(-100, extent, n), rng.uniform(-100, extent, n))
+
+
+# Sum of `weights` along the Dijkstra tree path from `node` back to the source
+def walk_path(weights, pred, node):
+    total = 0.0
+    while pred[node] >= 0:
+        total += weights[pred[node], node]
+        node = pred[node]
+    return total
+
+
+# (nearest facility, distance in m, time in min) per community from one Dijkstra per facility,
+# snap legs included; distance and time are both taken along the route chosen by `weight`
+def brute_force_access(graph, communities, facilities, weight):
+    primary, secondary = (graph.minutes, graph.length) if weight == 'minutes' else (graph.length, graph.minutes)
+    leg, other_leg = (WALK_MIN, 1.0) if weight == 'minutes' else (1.0, WALK_MIN)
+
+    fx, fy = access.metric_xy(facilities, graph.crs)
+    cx, cy = access.metric_xy(communities, graph.crs)
+    fac_snap, fac_node = graph.tree.query(np.column_stack([fx, fy]))
+    com_snap, com_node = graph.tree.query(np.column_stack([cx, cy]))
+    best, pred = dijkstra(primary, directed=True, indices=fac_node, return_predecessors=True)
+    total = fac_snap[:, None] * leg + best[:, com_node] + com_snap[None, :] * leg
+
+    nearest = np.argmin(total, axis=0)
+    value = total[nearest, np.arange(len(cx))]
+    other = np.full(len(cx), np.nan)
+    for c, f in enumerate(nearest):
+        if np.isfinite(value[c]):
+            other[c] = (fac_snap[f] * other_leg + walk_path(secondary, pred[f], com_node[c])
+                        + com_snap[c] * other_leg)
+    reached = np.isfinite(value)
+    nearest[~reached] = -1
+    value[~reached] = np.nan
+    return nearest, value, other
+
+
+@pytest.mark.parametrize('weight', ['minutes', 'length'])
+def test_network_access_matches_per_facility_dijkstra(graph, weight):
+    rng = np.random.default_rng(1)
+    communities = random_points(rng, 200)
+    # Communities next to the disconnected segment reach no facility
+    communities = gpd.GeoDataFrame(
+        pd.concat([communities, points([5010, 4990], [100, 300])], ignore_index=True),
+        crs=access.METRIC_CRS)
+    facilities = random_points(rng, 12)
+
+    dist, minutes, nearest = network.network_access(graph, communities, facilities, weight=weight)
+    expected_fac, value, other = brute_force_access(graph, communities, facilities, weight)
+    expected_dist, expected_min = (other, value) if weight == 'minutes' else (value, other)
+
+    np.testing.assert_array_equal(nearest, expected_fac)
+    np.testing.assert_allclose(dist, expected_dist, rtol=1e-9)
+    np.testing.assert_allclose(minutes, expected_min, rtol=1e-9)
+    assert (nearest[-2:] == -1).all() and np.isnan(dist[-2:]).all()
+
+
+# A facility far off the road next to the community's node loses to one on the road further
+# along (the off-road leg counts when choosing the nearest facility)
+def test_network_access_counts_facility_snap_leg():
+    road = gpd.GeoDataFrame(geometry=[LineString([(X0 + x, Y0) for x in range(0, 2001, 100)])],
+                            crs=access.METRIC_CRS)
+    graph = network.build_graph(road)
+    communities = points([0], [10])
+    facilities = points([200, 1500], [900, 5])
+
+    dist, minutes, nearest = network.network_access(graph, communities, facilities)
+    road_min = 1500 / (network.DEFAULT_SPEED * 1000 / 60)
+    assert nearest.tolist() == [1]
+    np.testing.assert_allclose(dist, [5 + 1500 + 10])
+    np.testing.assert_allclose(minutes, [road_min + (5 + 10) * WALK_MIN])
+
+
+def test_facility_distances_match_per_facility_dijkstra(graph, monkeypatch):
+    monkeypatch.setattr(network, 'MAX_DENSE', 3 * len(graph.node_xy))  # several Dijkstra blocks
+    rng = np.random.default_rng(2)
+    communities = random_points(rng, 150)
+    facilities = random_points(rng, 10)
+    cutoff = 1500
+
+    matrix = network.facility_distances(graph, communities, facilities, cutoff).toarray()
+    fx, fy = access.metric_xy(facilities, graph.crs)
+    cx, cy = access.metric_xy(communities, graph.crs)
+    fac_snap, fac_node = graph.tree.query(np.column_stack([fx, fy]))
+    com_snap, com_node = graph.tree.query(np.column_stack([cx, cy]))
+    expected = fac_snap[:, None] + dijkstra(graph.length, directed=True, indices=fac_node)[:, com_node] + com_snap
+    within = expected <= cutoff
+    np.testing.assert_allclose(matrix[within], expected[within])
+    assert not matrix[~within].any()
+
+
+# Random tree over n nodes, listed as predecessors (root: -9999 like scipy), with edge weights
+def random_tree(rng, n):
+    order = rng.permutation(n)
+    pred = np.full(n, -9999)
+    for i in range(1, n):
+        pred[order[i]] = order[rng.integers(0, i)]
+    nodes = np.flatnonzero(pred >= 0)
+    weights = csr_matrix((rng.uniform(1, 10, len(nodes)), (pred[nodes], nodes)), shape=(n, n))
+    return pred, weights, order[0]
+
+
+def test_path_totals_matches_walking_the_tree():
+    rng = np.random.default_rng(3)
+    pred, weights, _ = random_tree(rng, 300)
+    expected = [walk_path(weights, pred, node) for node in range(len(pred))]
+    np.testing.assert_allclose(network.path_totals(weights, pred), expected)
+
+
+def test_branch_of_matches_walking_the_tree():
+    rng = np.random.default_rng(4)
+    pred, _, root = random_tree(rng, 300)
+    pred[rng.choice(np.flatnonzero(pred >= 0), 5, replace=False)] = -9999  # unreached subtrees
+    expected = np.full(len(pred), -1)
+    for node in range(len(pred)):
+        path = [node]
+        while pred[path[-1]] >= 0:
+            path.append(pred[path[-1]])
+        if path[-1] == root and node != root:
+            expected[node] = path[-2]
+    np.testing.assert_array_equal(network.branch_of(pred, root), expected)
+
+
+def test_super_source_offsets_each_start():
+    matrix = csr_matrix(([5.0, 5.0], ([0, 1], [1, 0])), shape=(3, 3))
+    augmented = network.with_super_source(matrix, [0, 2], [7.0, 1.0])
+    best = dijkstra(augmented, directed=True, indices=3)
+    np.testing.assert_allclose(best, [7, 12, 1, 0])
@@ -0,0 +1,100 @@
+# Out-of-date detection in pipeline.py on a synthetic data folder: only the targets whose
+# inputs, parameters or outputs changed are rebuilt
+
+import json
+import os
+
+import pytest
+
+import layers
+import pipeline
+
+
+def write_points(path, properties):
+    features = [{'type': 'Feature', 'properties': props,
+                 'geometry': {'type': 'Point', 'coordinates': [-1.4 + i * 0.01, 7.1]}}
+                for i, props in enumerate(properties)]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'type': 'FeatureCollection', 'features': features}, f)
+
+
+# Phase 1 and 2 layers plus boundary in data_dir, no roads and no Phase 3
+@pytest.fixture
+def data_dir(tmp_path):
+    folder = tmp_path / 'data'
+    folder.mkdir()
+    with open(folder / layers.LAYER_FILES['boundary'], 'w', encoding='utf-8') as f:
+        json.dump({'type': 'FeatureCollection', 'features': [{
+            'type': 'Feature', 'properties': {'name': 'Mampong'},
+            'geometry': {'type': 'Polygon', 'coordinates': [[[-1.5, 7.0], [-1.3, 7.0], [-1.3, 7.2], [-1.5, 7.0]]]}}]}, f)
+    for phase in (1, 2):
+        write_points(folder / layers.LAYER_FILES[f'communities{phase}'],
+                     [{'name': f'c{i}', f'Acces_lvl{phase}': 'Good Access'} for i in range(3)])
+        write_points(folder / layers.LAYER_FILES[f'facilities{phase}'], [{'name': f'f{phase}'}])
+    return str(folder)
+
+
+# State after building every target, with their outputs in out_dir
+def build_all(targets, data_dir, out_dir):
+    state = {'files': {}, 'targets': {}}
+    for name, target in targets.items():
+        state['targets'][name] = pipeline.target_inputs(target, data_dir, state['files'])
+        for output in target['outputs']:
+            open(os.path.join(out_dir, output), 'w').close()
+    return state
+
+
+# {target: reasons} for the targets main() would rebuild
+def stale(targets, data_dir, out_dir, state):
+    result = {}
+    for name, target in targets.items():
+        inputs = pipeline.target_inputs(target, data_dir, state['files'])
+        reasons = pipeline.stale_reasons(name, target, inputs, state, out_dir)
+        if reasons:
+            result[name] = reasons
+    return result
+
+
+def test_targets_of_available_phases(data_dir):
+    assert sorted(pipeline.pipeline_targets(data_dir)) == ['comparison', 'thematic1', 'thematic2', 'webmap']
+    # No Acces_net field yet: no network maps
+    assert pipeline.pipeline_targets(data_dir, 'network') == {}
+
+
+def test_only_targets_of_an_edited_layer_are_stale(data_dir, tmp_path):
+    targets = pipeline.pipeline_targets(data_dir)
+    state = build_all(targets, data_dir, str(tmp_path))
+    assert stale(targets, data_dir, str(tmp_path), state) == {}
+
+    write_points(os.path.join(data_dir, layers.LAYER_FILES['facilities2']), [{'name': 'f2'}, {'name': 'new CHPS'}])
+    assert stale(targets, data_dir, str(tmp_path), state) == {
+        'thematic2': ['facilities2 changed'], 'comparison': ['facilities2 changed'], 'webmap': ['facilities2 changed']}
+
+
+def test_touched_but_unchanged_layer_is_up_to_date(data_dir, tmp_path):
+    targets = pipeline.pipeline_targets(data_dir)
+    state = build_all(targets, data_dir, str(tmp_path))
+    path = os.path.join(data_dir, layers.LAYER_FILES['communities1'])
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    assert stale(targets, data_dir, str(tmp_path), state) == {}
+
+
+def test_parameters_and_missing_outputs(data_dir, tmp_path):
+    targets = pipeline.pipeline_targets(data_dir)
+    state = build_all(targets, data_dir, str(tmp_path))
+    os.remove(tmp_path / 'Thematic_Map1.pdf')
+    assert stale(targets, data_dir, str(tmp_path), state) == {'thematic1': ['Thematic_Map1.pdf missing']}
+
+    hires = pipeline.pipeline_targets(data_dir, dpi=600)
+    assert stale(hires, data_dir, str(tmp_path), state) == {
+        'thematic1': ['params changed', 'Thematic_Map1.pdf missing'], 'thematic2': ['params changed'],
+        'comparison': ['params changed']}
+    assert pipeline.stale_reasons('thematic3', hires['thematic1'], {}, state, str(tmp_path)) == ['never built']
+
+
+def test_state_round_trip(tmp_path):
+    assert pipeline.load_state(str(tmp_path)) == {'files': {}, 'targets': {}}
+    state = {'files': {'a': [1, 2, 'digest']}, 'targets': {'thematic1': {'params': 'x'}}}
+    pipeline.save_state(state, str(tmp_path))
+    assert pipeline.load_state(str(tmp_path)) == state
@@ -0,0 +1,76 @@
+# Facility siting (siting.py): lazy greedy against plain greedy, which re-evaluates every
+# candidate in every round
+
+import geopandas as gpd
+import numpy as np
+import pytest
+
+import access
+import siting
+
+
+def points(rng, n, prefix):
+    return gpd.GeoDataFrame({'name': [f'{prefix} {i}' for i in range(n)]},
+                            geometry=gpd.points_from_xy(rng.uniform(690000, 705000, n), rng.uniform(780000, 795000, n)),
+                            crs=access.METRIC_CRS)
+
+
+def plain_greedy(matrix, current, weight, k, objective, threshold):
+    dense = np.full(matrix.shape, np.inf)
+    coo = matrix.tocoo()
+    dense[coo.row, coo.col] = coo.data
+    current = current.copy()
+    chosen, gains = [], []
+    for _ in range(k):
+        if objective == 'coverage':
+            gain = ((dense <= threshold) & (current > threshold)) @ weight
+        else:
+            gain = np.maximum(current - dense, 0) @ weight
+        j = int(np.argmax(gain))
+        if gain[j] <= 0:
+            break
+        chosen.append(j)
+        gains.append(gain[j])
+        current = np.minimum(current, dense[j])
+    return chosen, gains, current
+
+
+@pytest.mark.parametrize('objective, radius', [('coverage', 3000), ('median', 6000)])
+def test_lazy_greedy_matches_plain_greedy(objective, radius):
+    rng = np.random.default_rng(0)
+    communities = points(rng, 400, 'community')
+    candidates = points(rng, 150, 'candidate')
+    facilities = points(rng, 4, 'facility')
+    weight = rng.uniform(50, 5000, len(communities))
+    _, current = access.nearest_facility(communities, facilities)
+    matrix = access.distance_matrix(candidates, communities, radius)
+
+    chosen, gains, updated, _ = siting.lazy_greedy(matrix, current, weight, 6, objective, 3000)
+    expected_chosen, expected_gains, expected_current = plain_greedy(matrix, current, weight, 6, objective, 3000)
+    assert chosen.tolist() == expected_chosen
+    np.testing.assert_allclose(gains, expected_gains)
+    np.testing.assert_allclose(updated, expected_current)
+
+
+def test_lazy_greedy_stops_without_gain():
+    rng = np.random.default_rng(1)
+    communities = points(rng, 50, 'community')
+    candidates = points(rng, 20, 'candidate')
+    matrix = access.distance_matrix(candidates, communities, 3000)
+    current = np.zeros(len(communities))  # everyone already has a facility on the spot
+    chosen, gains, _, _ = siting.lazy_greedy(matrix, current, np.ones(len(communities)), 5, 'median')
+    assert len(chosen) == 0 and len(gains) == 0
+
+
+# Phase 3 communities keep their own columns but none derived from the Phase 2 facilities
+def test_proposed_layers_drop_stale_columns():
+    rng = np.random.default_rng(2)
+    communities = access.compute_access(points(rng, 30, 'community'), points(rng, 5, 'facility'), 2)
+    communities['population'] = 100
+    for column in ['Net_dist', 'Net_time', 'Net_hub', 'Acces_net2', 'E2SFCA2', 'Acces_fca2']:
+        communities[column] = 0
+    facilities = points(rng, 5, 'facility')
+
+    result, proposed = siting.proposed_layers(communities, facilities, communities, [0, 3], 3)
+    assert (proposed['status'] == 'proposed').sum() == 2
+    assert set(result.columns) == {'name', 'population', 'geometry', 'HubName', 'HubDist', 'Acces_lvl3'}